@@ -0,0 +1,73 @@
+"""
+Startup benchmark for ytcoll / ytanalysis
+
+Each case runs in a fresh interpreter so that nothing is cached in sys.modules.
+Startup = import + argument parsing + creating the collector / analyzer, i.e. the
+fixed cost every scheduled job pays before doing any work.
+
+usage:
+python bench_startup.py [--repeat 5] [--target 1.0]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'wordcloud', 'textblob', 'vaderSentiment',
+                 'psycopg2', 'googleapiclient.discovery', 'pandas', 'sklearn']
+
+CASES = {
+    'ytcoll': (
+        "import ytcoll\n"
+        "args = ytcoll.parse_args(['--api-key', 'x', '--channel-id', 'UC'])\n"
+        "ytcoll.YouTubeDataCollector(args.api_key, workers=args.workers)\n"
+    ),
+    'ytanalysis (no plots)': (
+        "import ytanalysis\n"
+        "args = ytanalysis.parse_args(['--skip-plots'])\n"
+        "ytanalysis.YouTubeSentimentAnalyzer()\n"
+    ),
+}
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {here!r})
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'loaded': loaded}}))
+"""
+
+
+def run_case(code):
+    """在新的解释器中运行一次"""
+    probe = PROBE.format(here=HERE, code=code, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='startup benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--target', type=float, default=1.0, help='startup budget in seconds')
+    args = parser.parse_args(argv)
+    
+    ok = True
+    for name, code in CASES.items():
+        runs = [run_case(code) for _ in range(args.repeat)]
+        median = statistics.median(r['seconds'] for r in runs)
+        passed = median < args.target
+        ok = ok and passed
+        print(f"{'✓' if passed else '✗'} {name:<24} median {median:.3f}s "
+              f"(target < {args.target:.1f}s)  heavy modules loaded: {', '.join(runs[0]['loaded']) or '-'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
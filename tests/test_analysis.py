@@ -0,0 +1,32 @@
+"""
+ytanalysis: 统计报告里观看数为0的分桶不打印 nan
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytanalysis import YouTubeSentimentAnalyzer
+
+
+def test_duration_bucket_without_views_prints_na(capsys):
+    analyzer = YouTubeSentimentAnalyzer()
+    analyzer.df_videos = pd.DataFrame({
+        'video_id': ['short', 'long'], 'channel_id': ['UC1', 'UC1'], 'title': ['a', 'b'],
+        'published_at': pd.to_datetime(['2024-01-01', '2024-01-02'], utc=True),
+        'duration_seconds': [30, 600], 'view_count': [0, 100], 'like_count': [0, 5], 'comment_count': [0, 5],
+    })
+    analyzer._add_engagement_rate()
+    stats = {}
+    analyzer._duration_statistics(stats)
+
+    out = capsys.readouterr().out
+    assert 'nan' not in out
+    assert '<1m: 1 个视频, 观看中位数 0, 互动率 N/A' in out
+    assert '互动率 10.00%' in out
+    assert stats['duration_buckets'][0]['engagement_rate'] is None
@@ -0,0 +1,84 @@
+"""
+ytapprox: 样本量, 分层抽样, 流式抽样去重, bootstrap 区间
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytapprox import approximate_report, bootstrap_means, reservoir_sample, sample_size, stratified_sample
+
+
+def _comments(n, seed=0):
+    rng = np.random.default_rng(seed)
+    compound = rng.uniform(-1, 1, n)
+    return pd.DataFrame({
+        'comment_id': [f'c{i}' for i in range(n)],
+        'video_id': np.where(np.arange(n) < n // 4, 'small', 'big'),
+        'published_at': pd.to_datetime('2024-01-01', utc=True) + pd.to_timedelta(np.arange(n) % 3, unit='D'),
+        'collected_at': pd.Timestamp('2024-02-01', tz='UTC'),
+        'vader_compound': compound,
+        'vader_sentiment': np.select([compound >= 0.05, compound <= -0.05], ['positive', 'negative'], 'neutral'),
+    })
+
+
+def test_sample_size():
+    assert sample_size(0.01) == 9604
+    assert sample_size(0.05, confidence=0.99) == 664
+    assert sample_size(0.01, population=1000) == 906
+    assert sample_size(0.01, population=10) == 10
+
+
+def test_stratified_sample_is_proportional():
+    df = _comments(4000)
+    sample = stratified_sample(df, 400, seed=1)
+    assert abs(len(sample) - 400) <= 6
+    assert sample['comment_id'].is_unique
+    assert (sample['video_id'] == 'small').mean() == pytest.approx(0.25, abs=0.02)
+    assert stratified_sample(df, 400, seed=1).equals(sample)
+    assert len(stratified_sample(df, 5000)) == 4000
+
+
+def test_reservoir_sample_ignores_chunking_and_repeated_comments():
+    df = _comments(1000)
+    whole, rows = reservoir_sample([df], 50)
+    assert rows == 1000 and len(whole) == 50
+    # 同样的评论分块读取, 并且在第二个导出里再出现一次 (collected_at 更新)
+    again = df.iloc[:300].assign(collected_at=pd.Timestamp('2024-03-01', tz='UTC'))
+    chunks = [df.iloc[i:i + 128] for i in range(0, len(df), 128)] + [again]
+    streamed, rows = reservoir_sample(chunks, 50)
+    assert rows == 1300
+    assert sorted(streamed['comment_id']) == sorted(whole['comment_id'])
+    assert streamed['comment_id'].is_unique
+    assert reservoir_sample([], 10) == (None, 0)
+
+
+def test_bootstrap_interval_contains_the_mean():
+    values = np.random.default_rng(0).normal(2.0, 1.0, size=(500, 2))
+    estimate, low, high = bootstrap_means(values, n_boot=300)
+    assert np.all(low < estimate) and np.all(estimate < high)
+    assert np.all(high - low < 0.3)
+    assert np.array_equal(bootstrap_means(values, n_boot=300)[1], low)
+    single = bootstrap_means([0.5])
+    assert single[0][0] == single[1][0] == single[2][0] == 0.5
+
+
+def test_approximate_report():
+    df = _comments(600)
+    df.loc[:9, 'vader_compound'] = np.nan
+    report = approximate_report(df, 'vader_compound', 'vader_sentiment', population=6000, n_boot=100,
+                                top=1, min_video_comments=50)
+    assert (report['population'], report['sample'], report['scored']) == (6000, 600, 590)
+    shares = report['shares']
+    assert sum(shares[s]['estimate'] for s in shares) == pytest.approx(1.0, abs=1e-3)
+    for interval in list(shares.values()) + [report['mean_compound']]:
+        assert interval['low'] <= interval['estimate'] <= interval['high']
+    assert len(report['top_videos']) == len(report['bottom_videos']) == 1
+    assert report['top_videos'][0]['comments'] >= 50
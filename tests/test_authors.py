@@ -0,0 +1,99 @@
+"""
+ytauthors: 分批加入与一次加入结果一致, 情感漂移, 回头评论者占比
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ytauthors
+from ytauthors import AuthorIndex
+
+
+def _comments():
+    """alice 60天里越来越积极, bob 在三个视频各评论一次, carol 没有得分"""
+    days = np.arange(0, 60, 6)
+    alice = pd.DataFrame({
+        'author': 'alice', 'video_id': 'v1',
+        'published_at': pd.to_datetime('2024-01-01', utc=True) + pd.to_timedelta(days, unit='D'),
+        'vader_compound': -0.5 + days / 60 + np.tile([0.05, -0.05], 5),
+    })
+    bob = pd.DataFrame({'author': 'bob', 'video_id': ['v1', 'v2', 'v3'],
+                        'published_at': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03'], utc=True),
+                        'vader_compound': [0.1, 0.2, 0.3]})
+    carol = pd.DataFrame({'author': 'carol', 'video_id': ['v2', 'v2'],
+                          'published_at': pd.to_datetime(['2024-01-05', None], utc=True),
+                          'vader_compound': np.nan})
+    df = pd.concat([alice, bob, carol], ignore_index=True)
+    df['comment_id'] = [f'c{i}' for i in range(len(df))]
+    return df
+
+
+def _by_name(index):
+    return index.profiles().set_index('name')
+
+
+def test_batches_match_a_single_update(tmp_path):
+    df = _comments()
+    whole = AuthorIndex(str(tmp_path / 'whole')).load()
+    assert whole.update(df) == len(df)
+
+    batched = AuthorIndex(str(tmp_path / 'batched')).load()
+    batched.update(df.iloc[:7])
+    # 重新加载后继续加, 重复的评论跳过
+    batched = AuthorIndex(str(tmp_path / 'batched')).load()
+    assert batched.update(df.iloc[4:]) == len(df) - 7
+    assert batched.update(df) == 0
+
+    columns = ytauthors.SUM_COLUMNS + ['first_seen', 'last_seen', 'videos']
+    pd.testing.assert_frame_equal(_by_name(batched)[columns].sort_index(), _by_name(whole)[columns].sort_index(),
+                                  check_dtype=False)
+
+
+def test_profiles_and_drift(tmp_path):
+    index = AuthorIndex(str(tmp_path / 'authors')).load()
+    index.update(_comments())
+    profiles = _by_name(index)
+
+    alice = profiles.loc['alice']
+    assert alice['drift_per_30d'] == pytest.approx(0.5, abs=0.05)
+    assert alice['drift_t'] > 5
+    assert alice['active_days'] == pytest.approx(54)
+    assert profiles.loc['bob', 'mean_compound'] == pytest.approx(0.2)
+    carol = profiles.loc['carol']
+    assert (carol['comments'], carol['scored']) == (2, 0)
+    assert np.isnan(carol['mean_compound']) and np.isnan(carol['drift_per_30d'])
+    assert carol['first_seen'] == carol['last_seen'] == pd.Timestamp('2024-01-05', tz='UTC')
+
+    rising, falling = index.sentiment_drift(k=1, min_comments=5)
+    assert rising['name'].tolist() == ['alice']
+    assert index.top_commenters(1)['name'].tolist() == ['alice']
+
+
+def test_loyal_share(tmp_path):
+    index = AuthorIndex(str(tmp_path / 'authors')).load()
+    index.update(_comments())
+    share = index.loyal_share(min_videos=2)
+    assert (share['authors'], share['loyal_authors'], share['comments'], share['loyal_comments']) == (3, 1, 15, 3)
+    assert share['loyal_share'] == 0.2
+    only_v2 = index.loyal_share(min_videos=1, video_ids=['v2'])
+    assert (only_v2['authors'], only_v2['comments']) == (2, 3)
+
+
+def test_cli_build_and_report(tmp_path, capsys):
+    path = tmp_path / 'comments.csv'
+    _comments().to_csv(path, index=False)
+    index = str(tmp_path / 'authors')
+    assert ytauthors.main(['report', index]) == 1
+    assert ytauthors.main(['build', index, str(path)]) == 0
+    assert ytauthors.main(['build', index, str(path)]) == 0
+    assert '新增 0 条评论, 共 3 个评论者' in capsys.readouterr().out
+    assert ytauthors.main(['report', index, '--top', '2']) == 0
+    assert 'alice' in capsys.readouterr().out
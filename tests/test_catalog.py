@@ -0,0 +1,115 @@
+"""
+ytcatalog: 导出名不冲突, latest 跳过没有评论文件的导出, 流水线评论文件记进manifest, prune 至少保留一个
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ytapprox
+import ytcatalog
+
+
+def _export(data_dir, comments=None):
+    """写一次频道+视频 (+评论) 导出, 返回manifest路径"""
+    timestamp = ytcatalog.new_timestamp(str(data_dir))
+    frames = {
+        'channel': pd.DataFrame({'channel_id': ['UC1'], 'collected_at': ['2024-01-01T00:00:00+00:00']}),
+        'video': pd.DataFrame({'video_id': ['v1'], 'channel_id': ['UC1'], 'published_at': ['2024-01-01T00:00:00Z']}),
+    }
+    if comments is not None:
+        frames['comment'] = comments
+    files = {}
+    for kind, df in frames.items():
+        path = os.path.join(data_dir, f'{ytcatalog.DATASETS[kind][0]}_{timestamp}.csv')
+        df.to_csv(path, index=False)
+        files[kind] = path
+    return ytcatalog.write_manifest(str(data_dir), timestamp, files, frames)
+
+
+def _comments(*ids):
+    return pd.DataFrame({'comment_id': list(ids), 'video_id': ['v1'] * len(ids), 'comment_text': ['hi'] * len(ids)})
+
+
+def test_exports_in_the_same_second_get_distinct_names(tmp_path):
+    paths = [_export(tmp_path, _comments('c1')) for _ in range(3)]
+    assert len(set(paths)) == 3
+    assert len(ytcatalog.list_manifests(str(tmp_path))) == 3
+    names = [name for name in os.listdir(tmp_path) if name.startswith('comment_data_')]
+    assert all(ytcatalog._TIMESTAMPED.match(name) for name in names)
+
+
+def test_latest_comments_skip_exports_without_comment_file(tmp_path):
+    _export(tmp_path, _comments('c1', 'c2'))
+    _export(tmp_path)  # 中断的流水线: 只有频道和视频
+
+    assert len(ytcatalog.resolve_snapshots(str(tmp_path))) == 1
+    [manifest] = ytcatalog.resolve_snapshots(str(tmp_path), kind='comment')
+    assert manifest['files']['comment']['rows'] == 2
+    chunks = list(ytapprox.csv_comment_chunks(str(tmp_path)))
+    assert sum(len(chunk) for chunk in chunks) == 2
+
+
+def test_pipeline_comment_file_is_added_to_manifest(tmp_path):
+    manifest_path = _export(tmp_path)
+    timestamp = ytcatalog.list_manifests(str(tmp_path))[0]['timestamp']
+    scored = _comments('c1', 'c2', 'c3').assign(vader_compound=[0.1, 0.2, 0.3])
+    path = os.path.join(tmp_path, f'comments_with_sentiment_{timestamp}.csv')
+    scored.to_csv(path, index=False)
+    ytcatalog.add_file(manifest_path, 'comment', path, len(scored), list(scored.columns))
+
+    [manifest] = ytcatalog.resolve_snapshots(str(tmp_path), kind='comment')
+    frames = ytcatalog.load_snapshots(str(tmp_path), [manifest])
+    assert frames['comment']['comment_id'].tolist() == ['c1', 'c2', 'c3']
+    assert len(frames['video']) == 1
+
+
+def test_parquet_comment_directory(tmp_path):
+    pytest.importorskip('pyarrow')
+    manifest_path = _export(tmp_path)
+    path = os.path.join(tmp_path, 'comments_with_sentiment_x')
+    os.makedirs(path)
+    _comments('c1').to_parquet(os.path.join(path, 'part-00001.parquet'), index=False)
+    _comments('c2', 'c3').to_parquet(os.path.join(path, 'part-00002.parquet'), index=False)
+    ytcatalog.add_file(manifest_path, 'comment', path, 3, file_format='parquet')
+
+    chunks = list(ytapprox.csv_comment_chunks(str(tmp_path)))
+    assert [len(chunk) for chunk in chunks] == [1, 2]
+    frames = ytcatalog.load_snapshots(str(tmp_path), ytcatalog.resolve_snapshots(str(tmp_path)))
+    assert sorted(frames['comment']['comment_id']) == ['c1', 'c2', 'c3']
+
+    _export(tmp_path)
+    ytcatalog.prune(str(tmp_path), keep=1)
+    assert not os.path.exists(path)
+
+
+def test_prune_keeps_at_least_one_export(tmp_path):
+    for _ in range(3):
+        _export(tmp_path, _comments('c1'))
+    with pytest.raises(ValueError):
+        ytcatalog.prune(str(tmp_path), keep=0)
+    with pytest.raises(SystemExit) as exc:
+        ytcatalog.main(['prune', str(tmp_path), '--keep', '0'])
+    assert exc.value.code == 2
+    assert len(ytcatalog.list_manifests(str(tmp_path))) == 3
+
+    ytcatalog.prune(str(tmp_path), keep=1)
+    [manifest] = ytcatalog.list_manifests(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [os.path.basename(manifest['path'])] + [entry['file'] for entry in manifest['files'].values()])
+
+
+def test_index_directory_handles_old_and_new_names(tmp_path):
+    pd.DataFrame({'video_id': ['v1'], 'collected_at': ['2024-01-01T00:00:00']}).to_csv(
+        tmp_path / 'video_data_20240101_000000.csv', index=False)
+    pd.DataFrame({'video_id': ['v2'], 'collected_at': ['2024-01-02T00:00:00+00:00']}).to_csv(
+        tmp_path / 'video_data_20240102_000000_123456.csv', index=False)
+    assert len(ytcatalog.index_directory(str(tmp_path))) == 2
+    versions = [m['schema_version'] for m in ytcatalog.list_manifests(str(tmp_path))]
+    assert versions == [1, 2]
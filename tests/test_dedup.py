@@ -0,0 +1,64 @@
+"""
+ytdedup: 近似重复聚类, 短文本/空文本不聚类; --dedup 评分按 (簇, 语言) 评一次
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytanalysis import YouTubeSentimentAnalyzer, register_scorer
+from ytdedup import minhash_clusters, normalize_text
+
+SPAM = 'check out my channel for free giveaways every single day'
+
+
+@register_scorer('test_length', prefix='len', languages=('en',), columns=('compound', 'sentiment'))
+def _length_scorer(analyzer, texts):
+    return pd.DataFrame({'compound': texts.str.len() / 100.0, 'sentiment': 'neutral'}, index=texts.index)
+
+
+def test_near_duplicates_share_a_cluster():
+    texts = [SPAM, SPAM.upper(), SPAM + '!!', 'this tutorial finally made recursion click for me', SPAM]
+    first, sizes = minhash_clusters(texts)
+    assert first.tolist() == [0, 0, 0, 3, 0]
+    assert sizes.tolist() == [4, 4, 4, 1, 4]
+
+
+def test_short_and_empty_texts_are_not_clustered():
+    texts = ['', '', '  ', 'lol', 'lol', 'love it', SPAM, SPAM]
+    first, sizes = minhash_clusters(texts)
+    assert first.tolist() == [0, 1, 2, 3, 4, 5, 6, 6]
+    assert sizes.tolist() == [1, 1, 1, 1, 1, 1, 2, 2]
+
+
+def test_only_short_texts():
+    first, sizes = minhash_clusters(['', 'ok'])
+    assert first.tolist() == [0, 1] and sizes.tolist() == [1, 1]
+    assert minhash_clusters([])[0].tolist() == []
+
+
+def test_normalize_text():
+    assert normalize_text(['  Hello\n  World ', None]).tolist() == ['hello world', '']
+
+
+def test_cluster_members_in_another_language_are_scored_separately():
+    analyzer = YouTubeSentimentAnalyzer()
+    analyzer.df_comments = pd.DataFrame({
+        'comment_id': ['a', 'b', 'c', 'd'],
+        'cleaned_text': [SPAM, SPAM + ' now', SPAM + ' ya', ''],
+    })
+    languages = pd.Series(['en', 'en', 'id', 'und'])
+    analyzer.score_deduplicated_comments(['test_length'], languages)
+
+    df = analyzer.df_comments
+    assert df['dup_cluster_id'].tolist() == ['a', 'a', 'a', 'd']
+    # b 继承 a 的得分, c 的语言评分器不支持, 不沿用英文代表的得分
+    assert df['len_compound'].iloc[0] == df['len_compound'].iloc[1] == len(SPAM) / 100.0
+    assert np.isnan(df['len_compound'].iloc[2])
+    assert np.isnan(df['len_compound'].iloc[3])
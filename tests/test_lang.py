@@ -0,0 +1,57 @@
+"""
+ytlang.detect_language: 字符 n-gram 模型, 领先不够时为 'und'
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytlang import UNDETERMINED, detect_language, detect_languages
+
+
+@pytest.mark.parametrize('text, lang', [
+    ('Buy cheap followers at spam.com', 'en'),
+    ('Die hard fan here', 'en'),
+    ('Great video, thanks for sharing!', 'en'),
+    ('Me encanta este video', 'es'),
+    ('Un video increible', 'es'),
+    ('Muito bom o vídeo, parabéns', 'pt'),
+    ('Merci beaucoup pour cette vidéo', 'fr'),
+    ('Danke für das Video', 'de'),
+    ('Grazie mille per il video', 'it'),
+    ('Dank je wel, heel mooi', 'nl'),
+    ('Keren banget videonya', 'id'),
+    ('Çok güzel bir video', 'tr'),
+    ('Cảm ơn bạn rất nhiều', 'vi'),
+    ('这个视频太好了', 'zh'),
+    ('この動画は最高です', 'ja'),
+    ('Спасибо за видео', 'ru'),
+])
+def test_detect_language(text, lang):
+    assert detect_language(text) == lang
+
+
+@pytest.mark.parametrize('text', ['ok', 'lol', 'xD', '', '   ', None, '12345'])
+def test_short_or_empty_text_is_undetermined(text):
+    assert detect_language(text) == UNDETERMINED
+
+
+def test_close_scores_are_undetermined_not_english():
+    # 没有明显领先的语言时不回退成 'en'
+    assert detect_language('Me encanta este video', min_margin=1e9) == UNDETERMINED
+
+
+def test_english_heavy_batch_is_not_tagged_portuguese():
+    texts = pd.Series(['Buy cheap followers at spam.com', 'Great video!', 'Die hard fan here', 'good video',
+                       'nice video', 'This is the best tutorial ever', 'I love this song so much',
+                       'who is watching in 2024'] * 30)
+    langs = detect_languages(texts)
+    assert langs.index.equals(texts.index)
+    assert not langs.isin(['pt', 'de', 'it']).any()
+    assert (langs == 'en').mean() > 0.8
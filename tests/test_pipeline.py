@@ -0,0 +1,118 @@
+"""
+ytpipeline.run_pipeline: 任何一个阶段出错时流水线要结束并抛出异常, 不能卡在已满的队列上
+
+python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ytpipeline
+from ytanalysis import register_scorer
+from ytrecords import CommentRecord
+
+# 阶段出错后流水线应在这个时间内结束
+TIMEOUT = 30
+
+
+class FakeCollector:
+    """每个视频 pages 页评论, 每页 page_size 条"""
+
+    def __init__(self, pages=50, page_size=20):
+        self.pages = pages
+        self.page_size = page_size
+
+    def iter_comment_pages(self, video_id, max_comments=100):
+        for page in range(self.pages):
+            yield [CommentRecord(video_id, f'{video_id}-{page}-{i}', 'author', 'great video', 1,
+                                 '2024-01-01T00:00:00Z', '2024-01-01T00:00:00Z', 0, '2024-01-01T00:00:00Z')
+                   for i in range(self.page_size)]
+
+
+class FailingSink:
+    def __init__(self):
+        self.writes = 0
+
+    def write(self, df):
+        self.writes += 1
+        raise RuntimeError('db down')
+
+    def close(self):
+        return 'failing'
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = 0
+
+    def write(self, df):
+        self.rows += len(df)
+
+    def close(self):
+        return 'list'
+
+
+@register_scorer('test_raising', languages=None)
+def _raising_scorer(analyzer, texts):
+    raise RuntimeError('scorer broke')
+
+
+@register_scorer('test_constant', languages=None)
+def _constant_scorer(analyzer, texts):
+    import pandas as pd
+    return pd.DataFrame({'neg': 0.0, 'neu': 1.0, 'pos': 0.0, 'compound': 0.0, 'sentiment': 'neutral'},
+                        index=texts.index)
+
+
+def _videos(n=4):
+    return [SimpleNamespace(video_id=f'v{i}') for i in range(n)]
+
+
+def _run(sinks, scorers, **kwargs):
+    options = dict(fetch_workers=2, score_workers=1, queue_size=2, batch_rows=10, flush_seconds=0.05,
+                   detect_language=False)
+    options.update(kwargs)
+    return asyncio.run(asyncio.wait_for(
+        ytpipeline.run_pipeline(FakeCollector(), _videos(), sinks, scorers, **options), TIMEOUT))
+
+
+def test_raising_sink_stops_pipeline():
+    sink = FailingSink()
+    with pytest.raises(RuntimeError, match='db down'):
+        _run([sink], ['test_constant'])
+    assert sink.writes == 1
+
+
+def test_raising_scorer_stops_pipeline():
+    sink = ListSink()
+    with pytest.raises(RuntimeError, match='scorer broke'):
+        _run([sink], ['test_raising'])
+    assert sink.rows == 0
+
+
+def test_pipeline_writes_every_comment():
+    sink = ListSink()
+    metrics = _run([sink], ['test_constant'])
+    assert sink.rows == metrics.written == 4 * 50 * 20
+
+
+def test_csv_sink_rejects_changed_columns(tmp_path):
+    import pandas as pd
+    sink = ytpipeline.CsvSink(str(tmp_path), 'test')
+    sink.write(pd.DataFrame({'comment_id': ['a'], 'vader_compound': [0.5]}))
+    with pytest.raises(ValueError, match='vader_compound'):
+        sink.write(pd.DataFrame({'comment_id': ['b']}))
+
+
+def test_score_page_stamps_utc():
+    from datetime import datetime, timedelta
+    records = next(FakeCollector(pages=1, page_size=3).iter_comment_pages('v0'))
+    df = ytpipeline.score_page(records, ['test_constant'], detect_language=False)
+    scored_at = datetime.fromisoformat(df['scored_at'].iloc[0])
+    assert scored_at.utcoffset() == timedelta(0)
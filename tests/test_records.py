@@ -0,0 +1,36 @@
+"""
+ytrecords: 解析后的列写数据库前要转回 psycopg2 能适配的Python对象
+
+python -m pytest tests
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytrecords import CommentRecord, frame_to_records, records_to_frame, typed_columns
+
+
+def test_frame_to_records_converts_nat_to_none():
+    df = records_to_frame([CommentRecord('v', 'c', 'author', 'text', 3, '2024-01-01T00:00:00Z', 'not a time', 0,
+                                         '2024-01-01T00:00:00+00:00')], CommentRecord)
+    [record] = frame_to_records(df, CommentRecord)
+    assert record.published_at == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert type(record.published_at) is datetime
+    assert record.updated_at is None
+    assert type(record.like_count) is int
+
+
+def test_frame_to_records_nullable_columns():
+    df = pd.DataFrame({'lang': pd.array(['en', pd.NA], dtype='string'), 'score': [0.5, float('nan')],
+                       'seconds': pd.array([60, pd.NA], dtype='Int64')})
+    assert frame_to_records(df) == [('en', 0.5, 60), (None, None, None)]
+
+
+def test_typed_columns_fills_missing_duration_seconds():
+    df = typed_columns(pd.DataFrame({'duration': ['PT1M', 'PT1H2S', None], 'duration_seconds': [60, None, None]}))
+    assert df['duration_seconds'].tolist() == [60, 3602, pd.NA]
@@ -0,0 +1,85 @@
+"""
+ytrequests: fields 掩码, 以及按传输字节数 (解压前) 和失败请求计量
+
+python -m pytest tests
+"""
+
+import gzip
+import json
+import os
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytrequests import COMMENT_FIELDS, RequestMeter, fields_mask, metered_http
+
+BODY = json.dumps({'items': [{'id': str(i), 'snippet': {'title': 'same title ' * 20}} for i in range(50)]}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = BODY
+        compress = 'gzip' in self.headers.get('accept-encoding', '')
+        if compress:
+            body = gzip.compress(body)
+        self.send_response(404 if self.path.startswith('/youtube/v3/missing') else 200)
+        self.send_header('content-type', 'application/json')
+        if compress:
+            self.send_header('content-encoding', 'gzip')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fields_mask_nests_paths():
+    assert fields_mask({'a': 'id', 'b': 'snippet/title', 'c': 'snippet/stats/views'}) == \
+        'items(id,snippet(title,stats(views)))'
+    assert COMMENT_FIELDS.startswith('nextPageToken,items(')
+
+
+def test_meter_records_transferred_bytes_before_decompression(server):
+    meter = RequestMeter()
+    http = metered_http(meter)
+    response, content = http.request(f'{server}/youtube/v3/videos?part=snippet')
+    assert response.status == 200 and content == BODY
+    stats = meter.summary()['videos']
+    assert stats['requests'] == 1 and stats['gzip_responses'] == 1
+    assert stats['bytes'] == len(gzip.compress(BODY))
+    assert stats['bytes'] < stats['decoded_bytes'] == len(BODY)
+
+
+def test_meter_counts_http_errors(server):
+    meter = RequestMeter()
+    metered_http(meter).request(f'{server}/youtube/v3/missing')
+    stats = meter.summary()['missing']
+    assert stats['errors'] == 1 and stats['exceptions'] == 0
+
+
+def test_meter_records_requests_that_raise():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    meter = RequestMeter()
+    with pytest.raises(OSError):
+        metered_http(meter, timeout=2).request(f'http://127.0.0.1:{port}/youtube/v3/commentThreads')
+    stats = meter.summary()['commentThreads']
+    assert stats['requests'] == 1 and stats['errors'] == 1 and stats['exceptions'] == 1
+    assert stats['bytes'] == 0
@@ -0,0 +1,70 @@
+"""
+ytanalysis 增量评分: 只给没有得分或 needs_rescore 的评论评分, 其它沿用数据库里的得分
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytanalysis import YouTubeSentimentAnalyzer, register_scorer
+
+scored_texts = []
+
+
+@register_scorer('test_counting', prefix='vader', primary=True, languages=None)
+def _counting_scorer(analyzer, texts):
+    scored_texts.extend(texts)
+    return pd.DataFrame({'neg': 0.0, 'neu': 0.0, 'pos': 1.0, 'compound': 0.9, 'sentiment': 'positive'},
+                        index=texts.index)
+
+
+def _analyzer():
+    analyzer = YouTubeSentimentAnalyzer()
+    analyzer.scorers['comments'] = ['test_counting']
+    analyzer.sentiment_scorer = 'test_counting'
+    analyzer.detect_language = False
+    analyzer.df_comments = pd.DataFrame({
+        'comment_id': ['a', 'b', 'c', 'd'],
+        'video_id': 'v',
+        'comment_text': ['Old and fine', 'Edited text!', 'Brand new', 'Also fine'],
+        'needs_rescore': [False, True, False, False],
+    })
+    return analyzer
+
+
+def _stored():
+    return pd.DataFrame({
+        'comment_id': ['a', 'b', 'd'], 'lang': 'en', 'compound': [-0.5, -0.5, 0.1],
+        'pos': 0.0, 'neu': 0.5, 'neg': 0.5, 'sentiment': ['negative', 'negative', 'neutral'],
+        'scored_at': pd.Timestamp('2024-01-01', tz='UTC'),
+    })
+
+
+def test_only_flagged_and_unscored_comments_are_scored():
+    del scored_texts[:]
+    analyzer = _analyzer()
+    analyzer.use_stored_scores(_stored())
+    analyzer.perform_sentiment_analysis()
+    df = analyzer.df_comments
+
+    assert sorted(scored_texts) == ['Brand new', 'Edited text!']
+    assert analyzer.rescored.tolist() == [False, True, True, False]
+    assert df['vader_compound'].tolist() == [-0.5, 0.9, 0.9, 0.1]
+    assert df['vader_sentiment'].tolist() == ['negative', 'positive', 'positive', 'neutral']
+    # 沿用得分的评论也有清理后的文本
+    assert df['cleaned_text'].notna().all()
+
+
+def test_without_sentiment_table_every_comment_is_scored():
+    del scored_texts[:]
+    analyzer = _analyzer()
+    analyzer.use_stored_scores(None)
+    analyzer.perform_sentiment_analysis()
+    assert len(scored_texts) == 4
+    assert np.all(analyzer.rescored)
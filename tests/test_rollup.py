@@ -0,0 +1,71 @@
+"""
+ytrollup: 增量汇总只加新评论, 保存后重新加载结果一致
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytrollup import RollupStore
+
+
+def _comments(ids, compound, videos, days):
+    compound = np.asarray(compound, dtype=float)
+    return pd.DataFrame({
+        'comment_id': ids,
+        'video_id': videos,
+        'published_at': [f'2024-01-{day:02d}T12:00:00Z' for day in days],
+        'vader_compound': compound,
+        'vader_pos': np.where(compound > 0, compound, 0.0),
+        'vader_neu': 0.0,
+        'vader_neg': np.where(compound < 0, -compound, 0.0),
+        'vader_sentiment': np.select([compound >= 0.05, compound <= -0.05], ['positive', 'negative'], 'neutral'),
+    })
+
+
+VIDEOS = pd.DataFrame({'video_id': ['v1', 'v2'], 'channel_id': ['UC1', 'UC2']})
+
+
+def test_update_counts_only_new_comments(tmp_path):
+    store = RollupStore(str(tmp_path / 'rollups'), bins=4).load()
+    first = _comments(['a', 'b', 'c'], [0.5, -0.5, np.nan], ['v1', 'v1', 'v2'], [1, 1, 2])
+    assert store.update(first, VIDEOS) == 3
+    assert store.update(first, VIDEOS) == 0
+
+    video = store.video_stats()
+    assert video.loc['v1', ['comments', 'scored', 'positive', 'negative']].tolist() == [2, 2, 1, 1]
+    assert video.loc['v2', ['comments', 'scored']].tolist() == [1, 0]
+    assert np.isnan(video.loc['v2', 'mean_compound'])
+    assert video.loc['v1', store.hist_columns].tolist() == [0, 1, 0, 1]
+
+    second = pd.concat([first, _comments(['d'], [1.0], ['v2'], [2])], ignore_index=True)
+    assert store.update(second, VIDEOS) == 1
+    totals = store.totals()
+    assert (totals['comments'], totals['scored']) == (4, 3)
+    assert totals['mean_compound'] == pytest.approx(1.0 / 3)
+    assert store.tables['channel'].loc['UC2', 'hist_3'] == 1
+    assert store.daily().index.tolist() == ['2024-01-01', '2024-01-02']
+
+
+def test_saved_rollups_reload_and_keep_growing(tmp_path):
+    path = str(tmp_path / 'rollups')
+    store = RollupStore(path, bins=4).load()
+    store.update(_comments(['a', 'b'], [0.2, 0.4], ['v1', 'v2'], [1, 3]), VIDEOS)
+
+    reloaded = RollupStore(path, bins=20, prefix='other').load()
+    assert (reloaded.bins, reloaded.prefix) == (4, 'vader')
+    assert sorted(reloaded.seen_ids) == ['a', 'b']
+    pd.testing.assert_frame_equal(reloaded.tables['video'], store.tables['video'], check_dtype=False)
+
+    batch = _comments(['b', 'c'], [0.4, -1.0], ['v2', 'unknown_video'], [3, 4])
+    assert reloaded.is_new(batch).tolist() == [False, True]
+    assert reloaded.update(batch, VIDEOS) == 1
+    assert reloaded.tables['channel'].loc['unknown', 'comments'] == 1
+    assert sorted(RollupStore(path).load().seen_ids) == ['a', 'b', 'c']
@@ -0,0 +1,85 @@
+"""
+ytsearch: 布尔/短语查询, 过滤和分页, 增量写段与合并
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytsearch import SearchIndex, parse_query
+
+
+def _comments():
+    return pd.DataFrame({
+        'comment_id': ['c1', 'c2', 'c3', 'c4', 'c5'],
+        'video_id': ['v1', 'v1', 'v2', 'v2', 'v2'],
+        'comment_text': ['Battery life is great', 'the life of the battery is bad, refund please',
+                         'Great battery life! Shipping was slow', 'refund refund refund', 'no comment ' + 'x' * 60],
+        'published_at': ['2024-01-01T00:00:00Z', '2024-01-02T00:00:00Z', '2024-01-03T00:00:00Z',
+                         '2024-01-04T00:00:00Z', None],
+        'vader_compound': [0.8, -0.6, 0.5, -0.2, 0.0],
+    })
+
+
+def _ids(result):
+    return [item['comment_id'] for item in result['items']]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / 'index'))
+    assert index.add(_comments(), 'vader_compound') == 5
+    return index
+
+
+def test_boolean_and_phrase_queries(index):
+    assert _ids(index.search('battery life')) == ['c3', 'c2', 'c1']
+    assert _ids(index.search('"battery life"')) == ['c3', 'c1']
+    assert _ids(index.search('"battery life" -shipping')) == ['c1']
+    assert _ids(index.search('battery NOT refund')) == ['c3', 'c1']
+    assert _ids(index.search('shipping OR refund')) == ['c4', 'c3', 'c2']
+    assert index.search('missing')['total'] == 0
+
+
+def test_filters_and_pagination(index):
+    assert _ids(index.search('battery', video_id='v1')) == ['c2', 'c1']
+    assert _ids(index.search('battery', start='2024-01-02', end='2024-01-03')) == ['c2']
+    assert _ids(index.search('battery', sentiment='negative')) == ['c2']
+    assert _ids(index.search('battery', sentiment='positive')) == ['c3', 'c1']
+    page = index.search('battery', limit=1, offset=1)
+    assert page['total'] == 3 and _ids(page) == ['c2']
+    item = index.search('comment')['items'][0]
+    assert item['published_at'] is None and item['compound'] == 0.0
+
+
+def test_add_skips_indexed_comments_and_merge_keeps_results(index):
+    more = pd.DataFrame({'comment_id': ['c1', 'c6'], 'video_id': ['v1', 'v3'],
+                         'comment_text': ['Battery life is great', 'battery died'],
+                         'published_at': ['2024-01-01T00:00:00Z', '2024-01-05T00:00:00Z']})
+    assert index.add(more) == 1
+    assert index.add(more) == 0
+    assert len(index.segments) == 2 and len(index) == 6
+    before = index.search('battery')
+    assert _ids(before) == ['c6', 'c3', 'c2', 'c1']
+
+    assert index.merge() == 2
+    assert len(index.segments) == 1 and len(index) == 6
+    after = index.search('battery')
+    assert [(i['comment_id'], i['published_at'], i['compound']) for i in after['items']] == \
+        [(i['comment_id'], i['published_at'], i['compound']) for i in before['items']]
+    # 另一个进程打开同一个索引也能看到新段
+    assert len(SearchIndex(index.path)) == 6
+
+
+def test_invalid_queries(index):
+    with pytest.raises(ValueError):
+        parse_query('-battery')
+    with pytest.raises(ValueError):
+        index.search('battery', sentiment='angry')
+    assert parse_query('"a b" c OR -d e') == [([['a', 'b'], ['c']], []), ([['e']], [['d']])]
@@ -0,0 +1,105 @@
+"""
+ytserver: 结果缓存, 参数错误和意外错误的状态码, /metrics 统计
+
+python -m pytest tests
+"""
+
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ytserver import QueryService, QueryStore, make_server
+
+
+def _store():
+    videos = pd.DataFrame({
+        'video_id': ['v1', 'v2'], 'channel_id': ['UC1', 'UC1'], 'title': ['a', 'b'],
+        'published_at': ['2024-01-01T00:00:00Z', '2024-01-02T00:00:00Z'],
+        'view_count': [100, 0], 'like_count': [10, 0], 'comment_count': [2, 1],
+    })
+    comments = pd.DataFrame({
+        'comment_id': ['c1', 'c2', 'c3'], 'video_id': ['v1', 'v1', 'v2'], 'comment_text': ['x', 'y', 'z'],
+        'published_at': ['2024-01-01T01:00:00Z', '2024-01-01T02:00:00Z', '2024-01-02T01:00:00Z'],
+        'compound': [0.5, -0.5, 0.0], 'sentiment': ['positive', 'negative', 'neutral'],
+    })
+    return QueryStore(videos, comments)
+
+
+def _json(body):
+    return json.loads(body.decode('utf-8'))
+
+
+def test_repeated_query_is_served_from_cache():
+    service = QueryService(_store())
+    first = service.handle('/videos?sort=view_count&limit=1')
+    second = service.handle('/videos?limit=1&sort=view_count')
+    assert first == second
+    assert first[0] == 200 and _json(first[1])['items'][0]['video_id'] == 'v1'
+    cache = service.metrics()['cache']
+    assert (cache['hits'], cache['misses']) == (1, 1)
+
+
+def test_query_errors_have_status_codes():
+    service = QueryService(_store())
+    assert service.handle('/videos/missing')[0] == 404
+    assert service.handle('/videos?sort=title')[0] == 400
+    assert service.handle('/channels?limit=abc')[0] == 400
+    status, body = service.handle('/videos/v1/comments?sentiment=negative')
+    assert status == 200 and [c['comment_id'] for c in _json(body)['items']] == ['c2']
+    routes = service.metrics()['routes']
+    assert routes['/videos/{id}']['errors'] == 1
+    assert routes['/videos']['errors'] == 1
+    assert routes['/videos/{id}']['server_errors'] == 0
+
+
+def test_unexpected_error_returns_500_and_is_not_cached(monkeypatch):
+    store = _store()
+    service = QueryService(store)
+    original = store.days
+
+    def broken(*args):
+        raise KeyError('day')
+
+    monkeypatch.setattr(store, 'days', broken)
+    status, body = service.handle('/days')
+    assert status == 500
+    assert 'KeyError' in _json(body)['error']
+    route = service.metrics()['routes']['/days']
+    assert (route['errors'], route['server_errors']) == (1, 1)
+
+    monkeypatch.setattr(store, 'days', original)
+    status, body = service.handle('/days')
+    assert status == 200
+    assert [day['day'] for day in _json(body)['items']] == ['2024-01-01', '2024-01-02']
+
+
+def test_http_server_serves_json_and_metrics():
+    service = QueryService(_store())
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        with urllib.request.urlopen(f'{base}/channels/UC1') as response:
+            assert response.headers['Content-Type'].startswith('application/json')
+            assert json.load(response)['videos'] == 2
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            urllib.request.urlopen(f'{base}/nothing')
+        assert exc.value.code == 404
+        assert 'unknown endpoint' in json.load(exc.value)['error']
+        with urllib.request.urlopen(f'{base}/metrics') as response:
+            metrics = json.load(response)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert metrics['routes']['/channels/{id}']['requests'] == 1
+    assert metrics['routes']['/{unknown}']['errors'] == 1
+    assert metrics['cache']['misses'] == 2
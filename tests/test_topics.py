@@ -0,0 +1,67 @@
+"""
+yttopics.TopicModel: 重复运行只训练新评论, 模型保存后再加载不变
+
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yttopics import TopicModel, topic_table
+
+WORDS = ['guitar solo amazing riff', 'recipe chicken oven spicy', 'football goal match referee',
+         'python code tutorial function', 'camera lens photo light']
+
+
+def _comments(n, start=0):
+    ids = pd.Series([f'c{i}' for i in range(start, start + n)])
+    texts = pd.Series([f'{WORDS[i % len(WORDS)]} comment{i % 7}' for i in range(start, start + n)])
+    return texts, ids
+
+
+def _snapshot(model):
+    return model.n_docs, model.doc_freq.copy(), model.kmeans.cluster_centers_.copy()
+
+
+def test_rerun_on_same_comments_leaves_model_unchanged(tmp_path):
+    path = str(tmp_path / 'topics.joblib')
+    texts, ids = _comments(240)
+    model = TopicModel(n_topics=5, n_features=2 ** 12).fit([(texts, ids)])
+    model.save(path)
+    before = _snapshot(model)
+
+    model = TopicModel.load(path).fit([(texts.iloc[:100], ids.iloc[:100]), (texts.iloc[100:], ids.iloc[100:])])
+    n_docs, doc_freq, centers = _snapshot(model)
+    assert n_docs == before[0] == 240
+    assert np.array_equal(doc_freq, before[1])
+    assert np.array_equal(centers, before[2])
+
+
+def test_only_new_comments_are_trained():
+    texts, ids = _comments(240)
+    model = TopicModel(n_topics=5, n_features=2 ** 12).fit([(texts, ids)])
+    more, more_ids = _comments(60, start=200)
+    model.partial_fit(more, more_ids)
+    assert model.n_docs == 260
+
+
+def test_duplicate_ids_in_one_chunk_count_once():
+    texts, ids = _comments(100)
+    model = TopicModel(n_topics=5, n_features=2 ** 12).fit([(pd.concat([texts, texts]), pd.concat([ids, ids]))])
+    assert model.n_docs == 100
+
+
+def test_topics_separate_unrelated_comments():
+    texts, ids = _comments(250)
+    model = TopicModel(n_topics=5, n_features=2 ** 12).fit([(texts, ids)])
+    labels = model.predict(texts)
+    # 同一组词的评论应落在同一个主题
+    groups = pd.Series(labels).groupby(np.arange(len(labels)) % len(WORDS)).nunique()
+    assert (groups == 1).all()
+    table = topic_table(model, labels)
+    assert table['comments'].sum() == 250
@@ -0,0 +1,87 @@
+"""
+yttrending: 乱序到达的评论, 第一个有效得分初始化EWMA, 告警去重
+
+python -m pytest tests
+"""
+
+import os
+import random
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yttrending import AlertFile, TrendDetector
+
+HOUR = 3600
+START = 1_700_000_000 - 1_700_000_000 % HOUR
+
+
+def _burst_comments():
+    """10小时每小时5条, 第11小时60条"""
+    times = [START + hour * HOUR + i * 60 for hour in range(10) for i in range(5)]
+    times += [START + 10 * HOUR + i * 30 for i in range(60)]
+    return times
+
+
+def _spikes(alerts):
+    return [alert for alert in alerts if alert['kind'] == 'volume_spike']
+
+
+def test_spike_found_in_publish_order():
+    detector = TrendDetector(reorder_seconds=0)
+    alerts = [a for t in _burst_comments() for a in detector.observe('v', t)]
+    assert len(_spikes(alerts)) == 1
+
+
+def test_spike_found_when_comments_arrive_out_of_order():
+    times = _burst_comments()
+    random.Random(0).shuffle(times)
+    detector = TrendDetector(reorder_seconds=24 * HOUR)
+    alerts = [a for t in times for a in detector.observe('v', t)] + detector.flush()
+    spikes = _spikes(alerts)
+    assert len(spikes) == 1
+    assert spikes[0]['event_time'].startswith(pd.Timestamp(START + 10 * HOUR, unit='s').strftime('%Y-%m-%dT%H'))
+    assert detector.late == 0
+
+
+def test_comments_older_than_window_are_late():
+    detector = TrendDetector(reorder_seconds=HOUR)
+    detector.observe('v', START + 10 * HOUR)
+    detector.observe('v', START + 12 * HOUR)
+    detector.observe('v', START)
+    detector.flush()
+    assert detector.late == 1
+    assert detector.states['v'].comments == 3
+
+
+def test_first_valid_compound_initialises_ewma():
+    detector = TrendDetector(reorder_seconds=0)
+    detector.observe('v', START, float('nan'))
+    detector.observe('v', START + 1, None)
+    detector.observe('v', START + 2, 0.8)
+    state = detector.states['v']
+    assert state.fast == state.slow == 0.8
+    assert state.scored == 1
+
+
+def test_sentiment_flip():
+    detector = TrendDetector(reorder_seconds=0, warmup_comments=10)
+    compounds = [0.8] * 100 + [-0.9] * 30
+    alerts = [a for i, c in enumerate(compounds) for a in detector.observe('v', START + i, c)]
+    flips = [alert for alert in alerts if alert['kind'] == 'sentiment_flip']
+    assert len(flips) == 1
+    assert flips[0]['value'] < 0 < flips[0]['baseline']
+
+
+def test_rerun_does_not_write_the_same_alerts_again(tmp_path):
+    for name in ('alerts.csv', 'alerts.jsonl'):
+        path = str(tmp_path / name)
+        for _ in range(2):
+            detector = TrendDetector()
+            alerts = [a for t in _burst_comments() for a in detector.observe('v', t)] + detector.flush()
+            AlertFile(path).write(alerts)
+        with open(path, encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        assert len(lines) == (2 if name.endswith('.csv') else 1)
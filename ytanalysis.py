@@ -10,66 +10,207 @@ pip install pandas numpy textblob vaderSentiment matplotlib seaborn wordcloud ps
 
 import pandas as pd
 import numpy as np
-from textblob import TextBlob
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import matplotlib.pyplot as plt
-import seaborn as sns
-from wordcloud import WordCloud
-import psycopg2
+from dotenv import load_dotenv
+import argparse
+import json
+import os
 import re
+import sys
+import time
+import traceback
 from collections import Counter
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体支持
-plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
+from ytanalytics import METRIC_COLUMNS, channel_summary, duration_bucket_stats, top_rows, video_metrics
+from ytrecords import typed_columns
+from yttrending import add_detector_arguments
+
+# TextBlob / matplotlib / wordcloud / psycopg2 导入很慢, 只在需要它们的阶段按需导入
+_pyplot = None
+
+
+def get_pyplot():
+    """按需导入matplotlib并设置中文字体支持"""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib.pyplot as plt
+        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
+        plt.rcParams['axes.unicode_minus'] = False
+        _pyplot = plt
+    return _pyplot
+
+
+def _short_title(title, width=50):
+    title = str(title)
+    return title[:width] + '...' if len(title) > width else title
+
+
+def _format_value(value, spec, suffix=''):
+    """格式化数值, NaN/缺失 (如观看数为0的比率) 显示 N/A"""
+    return f"{value:{spec}}{suffix}" if pd.notna(value) else 'N/A'
+
+
+def _sentiment_labels(compound, threshold=0.05):
+    """compound分数 -> positive / neutral / negative"""
+    return np.select([compound >= threshold, compound <= -threshold],
+                     ['positive', 'negative'], default='neutral')
+
+
+class HashedLexiconScorer:
+    """VADER词典的向量化近似: 哈希词袋稀疏矩阵与词典权重做点积
+    
+    只使用词典分值, 不处理VADER的否定词/程度副词/大写/标点规则, 因此是近似值,
+    但可以在几秒内给数百万条评论打分. 哈希冲突时后写入的词覆盖先写入的词.
+    """
+    
+    def __init__(self, lexicon, n_features=2 ** 20, alpha=15):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.alpha = alpha
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features, alternate_sign=False, norm=None, dtype=np.float32
+        )
+        
+        # 只保留分词后就是它自己的词 (表情符号等在clean_text之后不会出现)
+        analyzer = self.vectorizer.build_analyzer()
+        words = [w for w in lexicon if analyzer(w) == [w]]
+        valence = np.array([lexicon[w] for w in words], dtype=np.float32)
+        columns = self.vectorizer.transform(words).indices
+        
+        self.valence = np.zeros(n_features, dtype=np.float32)
+        self.valence[columns] = valence
+        # VADER: 正面词计 valence+1, 负面词计 valence-1, 其它词计入neu
+        self.pos_weight = np.where(self.valence > 0, self.valence + 1, 0).astype(np.float32)
+        self.neg_weight = np.where(self.valence < 0, 1 - self.valence, 0).astype(np.float32)
+        self.hit_weight = (self.valence != 0).astype(np.float32)
+    
+    def score(self, texts):
+        """返回与texts同索引的 compound/pos/neu/neg/sentiment"""
+        X = self.vectorizer.transform(texts.fillna('').astype(str))
+        total = X @ self.valence
+        pos_sum = X @ self.pos_weight
+        neg_sum = X @ self.neg_weight
+        tokens = np.asarray(X.sum(axis=1)).ravel()
+        neu_count = tokens - X @ self.hit_weight
+        
+        compound = np.clip(total / np.sqrt(total * total + self.alpha), -1, 1)
+        denom = pos_sum + neg_sum + neu_count
+        empty = denom == 0
+        denom[empty] = 1
+        neu = neu_count / denom
+        neu[empty] = 1
+        
+        return pd.DataFrame({
+            'compound': np.round(compound, 4),
+            'pos': np.round(pos_sum / denom, 3),
+            'neu': np.round(neu, 3),
+            'neg': np.round(neg_sum / denom, 3),
+            'sentiment': _sentiment_labels(compound),
+        }, index=texts.index)
+
 
 class YouTubeSentimentAnalyzer:
     def __init__(self):
         """初始化情感分析器"""
-        self.vader_analyzer = SentimentIntensityAnalyzer()
+        self._vader_analyzer = None
+        self._lexicon_scorer = None
+        self.scorers = {target: list(names) for target, names in DEFAULT_SCORERS.items()}
+        self.sentiment_scorer = 'vader'
+        self.detect_language = True
+        self.dedup = False
+        self.rollups = None
+        # 增量模式: 需要评分的评论 (布尔掩码) 和上次的得分 (结果CSV路径或DataFrame, 沿用其中的得分)
+        self.score_mask = None
+        self.previous_scores = None
+        # 本次实际评分的评论 (布尔掩码, None 为全部)
+        self.rescored = None
+        self.topics = None
         self.df_channels = None
         self.df_videos = None
         self.df_comments = None
     
-    def load_from_csv(self, data_dir='youtube_data'):
-        """从CSV文件加载数据"""
+    @property
+    def vader_analyzer(self):
+        """VADER分析器 (首次使用时创建)"""
+        if self._vader_analyzer is None:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+            self._vader_analyzer = SentimentIntensityAnalyzer()
+        return self._vader_analyzer
+    
+    def load_from_csv(self, data_dir='youtube_data', snapshots='latest', channel_id=None, comments=True):
+        """从CSV文件加载数据
+
+        目录里有 manifest_*.json 时按manifest加载: snapshots 为 'latest', 'all' 或最近N个导出,
+        多个导出合并后按 comment_id / video_id 去重, 评论只从有评论文件的导出中选;
+        没有manifest时读取固定文件名 channel_data.csv 等.
+        comments=False 时不加载评论 (近似模式流式抽样评论).
+        时间列解析为 datetime64[ns, UTC], 视频有 duration_seconds 列 (见 ytrecords.typed_columns)
+        """
+        import ytcatalog
+
+        manifests = ytcatalog.resolve_snapshots(data_dir, snapshots, channel_id)
+        if manifests:
+            frames = ytcatalog.load_snapshots(data_dir, manifests, ('channel', 'video'))
+            print(f"✓ 使用 {len(manifests)} 个导出: {', '.join(m['timestamp'] for m in manifests)}")
+            self.df_channels, self.df_videos = frames['channel'], frames['video']
+            if comments:
+                # 评论单独选择: 没有评论文件的导出 (如中断的流水线) 不算
+                comment_manifests = ytcatalog.resolve_snapshots(data_dir, snapshots, channel_id, kind='comment')
+                if comment_manifests != manifests[-len(comment_manifests):]:
+                    print(f"⚠ 评论使用导出: {', '.join(m['timestamp'] for m in comment_manifests) or '无'}")
+                self.df_comments = ytcatalog.load_snapshots(data_dir, comment_manifests, ('comment',))['comment']
+            if self.df_channels is not None:
+                print(f"✓ 加载频道数据: {len(self.df_channels)} 条")
+            if self.df_videos is None:
+                print("❌ 未找到视频数据文件")
+                return False
+            print(f"✓ 加载视频数据: {len(self.df_videos)} 条")
+            if self.df_comments is not None:
+                print(f"✓ 加载评论数据: {len(self.df_comments)} 条")
+            elif comments:
+                print("⚠ 未找到评论数据文件")
+            return True
+
         try:
-            self.df_channels = pd.read_csv(f'{data_dir}/channel_data.csv')
+            self.df_channels = typed_columns(pd.read_csv(f'{data_dir}/channel_data.csv'))
             print(f"✓ 加载频道数据: {len(self.df_channels)} 条")
         except FileNotFoundError:
             print("⚠ 未找到频道数据文件")
         
         try:
-            self.df_videos = pd.read_csv(f'{data_dir}/video_data.csv')
+            self.df_videos = typed_columns(pd.read_csv(f'{data_dir}/video_data.csv'))
             print(f"✓ 加载视频数据: {len(self.df_videos)} 条")
         except FileNotFoundError:
             print("❌ 未找到视频数据文件")
             return False
         
+        if not comments:
+            return True
         try:
-            self.df_comments = pd.read_csv(f'{data_dir}/comment_data.csv')
+            self.df_comments = typed_columns(pd.read_csv(f'{data_dir}/comment_data.csv'))
             print(f"✓ 加载评论数据: {len(self.df_comments)} 条")
         except FileNotFoundError:
             print("⚠ 未找到评论数据文件")
         
         return True
     
-    def load_from_postgres(self, db_config):
-        """从PostgreSQL数据库加载数据"""
+    def load_from_postgres(self, db_config, comments=True):
+        """从PostgreSQL数据库加载数据 (comments=False 时不加载评论)"""
         try:
+            import psycopg2
             conn = psycopg2.connect(**db_config)
             
-            self.df_channels = pd.read_sql("SELECT * FROM channels", conn)
+            # 表名与 ytcoll._create_tables 一致
+            self.df_channels = typed_columns(pd.read_sql("SELECT * FROM youtube_channels", conn))
             print(f"✓ 加载频道数据: {len(self.df_channels)} 条")
             
-            self.df_videos = pd.read_sql("SELECT * FROM videos", conn)
+            self.df_videos = typed_columns(pd.read_sql("SELECT * FROM youtube_videos", conn))
             print(f"✓ 加载视频数据: {len(self.df_videos)} 条")
             
-            self.df_comments = pd.read_sql("SELECT * FROM comments", conn)
-            print(f"✓ 加载评论数据: {len(self.df_comments)} 条")
+            if comments:
+                self.df_comments = typed_columns(pd.read_sql("SELECT * FROM youtube_comments", conn))
+                print(f"✓ 加载评论数据: {len(self.df_comments)} 条")
             
             conn.close()
             return True
@@ -77,6 +218,71 @@ class YouTubeSentimentAnalyzer:
             print(f"❌ 数据库加载错误: {e}")
             return False
     
+    def load_postgres_scores(self, db_config):
+        """--source postgres: 读取 youtube_comment_sentiment 中主评分器的得分作为 previous_scores,
+        只给没有得分或 needs_rescore 的评论评分 (见 save_scores_to_postgres)
+
+        近似重复聚类 (--dedup) 需要全部评论, 此时不沿用得分
+        """
+        if self.df_comments is None or self.dedup:
+            return
+        import psycopg2
+        conn = psycopg2.connect(**db_config)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT to_regclass('youtube_comment_sentiment')")
+            exists = cursor.fetchone()[0] is not None
+            cursor.close()
+            stored = pd.read_sql("SELECT * FROM youtube_comment_sentiment", conn) if exists else None
+        finally:
+            conn.close()
+        self.use_stored_scores(stored)
+    
+    def use_stored_scores(self, stored):
+        """stored: youtube_comment_sentiment 的内容 (None 表示没有这张表); 设置 score_mask 和 previous_scores"""
+        comment_scorers = self.scorers.get('comments', [])
+        primary = self.sentiment_scorer if self.sentiment_scorer in comment_scorers else next(
+            (name for name in comment_scorers if SCORERS[name]['primary']), self.sentiment_scorer)
+        prefix = SCORERS[primary]['prefix']
+        if stored is None:
+            stored = pd.DataFrame(columns=['comment_id'])
+        stored = stored.drop(columns=['scored_at'], errors='ignore').rename(
+            columns={col: f'{prefix}_{col}' for col in stored.columns if col not in ('comment_id', 'lang')})
+        stored['comment_id'] = stored['comment_id'].astype(str)
+        
+        flagged = self.df_comments.get('needs_rescore', pd.Series(False, index=self.df_comments.index))
+        self.score_mask = flagged.fillna(False).astype(bool).to_numpy()
+        self.previous_scores = stored
+        print(f"✓ 数据库已有 {len(stored):,} 条评论得分, 需要重新评分 {int(self.score_mask.sum()):,} 条")
+    
+    def save_scores_to_postgres(self, db_config):
+        """本次评分的评论得分 (主评分器) 写入 youtube_comment_sentiment, 并清除它们的 needs_rescore"""
+        if self.df_comments is None or self._col('compound') not in self.df_comments.columns:
+            return 0
+        import psycopg2
+        from datetime import timezone
+        from ytcoll import SENTIMENT_COLUMNS, create_sentiment_table, save_comment_sentiment
+        from ytrecords import frame_to_records
+        scored = self.df_comments if self.rescored is None else self.df_comments[self.rescored]
+        scores = pd.DataFrame({
+            'comment_id': scored['comment_id'].astype(str),
+            'lang': scored['lang'] if 'lang' in scored.columns else None,
+            **{col: scored[self._col(col)] for col in ['compound', 'pos', 'neu', 'neg', 'sentiment']
+               if self._col(col) in scored.columns},
+            'scored_at': pd.Timestamp(datetime.now(timezone.utc)),
+        }).reindex(columns=SENTIMENT_COLUMNS)
+        conn = psycopg2.connect(**db_config)
+        try:
+            cursor = conn.cursor()
+            create_sentiment_table(cursor)
+            save_comment_sentiment(cursor, frame_to_records(scores))
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        print(f"✓ {len(scores):,} 条评论得分已写入 youtube_comment_sentiment")
+        return len(scores)
+    
     def clean_text(self, text):
         """清理文本数据"""
         if pd.isna(text) or text == '':
@@ -108,6 +314,7 @@ class YouTubeSentimentAnalyzer:
                 'sentiment': 'neutral'
             }
         
+        from textblob import TextBlob
         blob = TextBlob(text)
         polarity = blob.sentiment.polarity
         
@@ -148,43 +355,313 @@ class YouTubeSentimentAnalyzer:
         scores['sentiment'] = sentiment
         return scores
     
+    def _col(self, name):
+        """主评分器的评论结果列名, 如 vader_compound"""
+        return f"{SCORERS[self.sentiment_scorer]['prefix']}_{name}"
+    
+    @property
+    def lexicon_scorer(self):
+        """基于VADER词典的哈希向量化评分器 (首次使用时创建)"""
+        if self._lexicon_scorer is None:
+            self._lexicon_scorer = HashedLexiconScorer(self.vader_analyzer.lexicon)
+        return self._lexicon_scorer
+    
+    def score_texts(self, df, texts, scorer_names, template, languages=None):
+        """用选定的评分器给已清理文本打分, 结果按template命名写入df
+        
+        给出languages (每行的语言代码) 时, 每个评分器只处理它支持的语言, 其它行为空值
+        """
+        for name in scorer_names:
+            scorer = SCORERS[name]
+            if languages is not None and scorer['languages'] is not None:
+                supported = texts[languages.isin(scorer['languages'])]
+                result = scorer['score'](self, supported) if len(supported) else None
+            else:
+                result = scorer['score'](self, texts)
+            # 没有支持语言的行时也输出声明的列 (空值), 每一批的列都相同
+            columns = list(scorer['columns'])
+            if result is not None:
+                columns += [col for col in result.columns if col not in columns]
+            result = (result if result is not None else pd.DataFrame()).reindex(index=texts.index, columns=columns)
+            for col in result.columns:
+                df[template.format(prefix=scorer['prefix'], col=col)] = result[col]
+    
     def perform_sentiment_analysis(self):
-        """对所有数据进行情感分析"""
+        """对所有数据进行情感分析 (每一列使用 self.scorers 中选定的评分器)"""
         print("\n执行情感分析...")
         
         # 分析评论
+        comment_scorers = self.scorers.get('comments', [])
         if self.df_comments is not None and len(self.df_comments) > 0:
-            print("  分析评论情感...")
-            self.df_comments['cleaned_text'] = self.df_comments['comment_text'].apply(self.clean_text)
-            
-            # TextBlob分析
-            textblob_results = self.df_comments['cleaned_text'].apply(self.analyze_sentiment_textblob)
-            self.df_comments['tb_polarity'] = textblob_results.apply(lambda x: x['polarity'])
-            self.df_comments['tb_subjectivity'] = textblob_results.apply(lambda x: x['subjectivity'])
-            self.df_comments['tb_sentiment'] = textblob_results.apply(lambda x: x['sentiment'])
+            print(f"  分析评论情感 ({', '.join(comment_scorers) or '-'})...")
+            if self.score_mask is not None:
+                self._score_comment_subset(comment_scorers)
+            else:
+                self._score_comments(comment_scorers)
             
-            # VADER分析
-            vader_results = self.df_comments['cleaned_text'].apply(self.analyze_sentiment_vader)
-            self.df_comments['vader_compound'] = vader_results.apply(lambda x: x['compound'])
-            self.df_comments['vader_pos'] = vader_results.apply(lambda x: x['pos'])
-            self.df_comments['vader_neu'] = vader_results.apply(lambda x: x['neu'])
-            self.df_comments['vader_neg'] = vader_results.apply(lambda x: x['neg'])
-            self.df_comments['vader_sentiment'] = vader_results.apply(lambda x: x['sentiment'])
+            # 统计和图表使用的主评分器
+            if self.sentiment_scorer not in comment_scorers:
+                primary = [name for name in comment_scorers if SCORERS[name]['primary']]
+                if primary:
+                    self.sentiment_scorer = primary[0]
             
             print(f"  ✓ 完成 {len(self.df_comments)} 条评论的情感分析")
         
         # 分析视频标题和描述
         if self.df_videos is not None:
-            print("  分析视频标题情感...")
-            self.df_videos['title_cleaned'] = self.df_videos['title'].apply(self.clean_text)
-            title_sentiment = self.df_videos['title_cleaned'].apply(self.analyze_sentiment_vader)
-            self.df_videos['title_sentiment'] = title_sentiment.apply(lambda x: x['sentiment'])
-            self.df_videos['title_compound'] = title_sentiment.apply(lambda x: x['compound'])
+            title_scorers = self.scorers.get('titles', [])
+            if title_scorers:
+                print(f"  分析视频标题情感 ({', '.join(title_scorers)})...")
+                self.df_videos['title_cleaned'] = self.df_videos['title'].apply(self.clean_text)
+                self.score_texts(self.df_videos, self.df_videos['title_cleaned'],
+                                 title_scorers, SCORE_TARGETS['titles'])
+                # 兼容旧的列名
+                primary = [name for name in title_scorers if SCORERS[name]['primary']]
+                if primary:
+                    prefix = SCORERS[primary[0]]['prefix']
+                    self.df_videos['title_sentiment'] = self.df_videos[f'title_{prefix}_sentiment']
+                    self.df_videos['title_compound'] = self.df_videos[f'title_{prefix}_compound']
+                print(f"  ✓ 完成 {len(self.df_videos)} 个视频标题的情感分析")
             
-            print(f"  ✓ 完成 {len(self.df_videos)} 个视频标题的情感分析")
+            description_scorers = self.scorers.get('descriptions', [])
+            if description_scorers:
+                print(f"  分析视频描述情感 ({', '.join(description_scorers)})...")
+                self.df_videos['description_cleaned'] = self.df_videos['description'].apply(self.clean_text)
+                self.score_texts(self.df_videos, self.df_videos['description_cleaned'],
+                                 description_scorers, SCORE_TARGETS['descriptions'])
+                print(f"  ✓ 完成 {len(self.df_videos)} 个视频描述的情感分析")
+    
+    def _score_comments(self, comment_scorers):
+        """清理文本, 识别语言, 给 df_comments 的全部评论评分"""
+        self.rescored = None
+        self.df_comments['cleaned_text'] = self.df_comments['comment_text'].apply(self.clean_text)
+        
+        # 语言识别, 评分器只给它支持的语言打分
+        languages = None
+        if self.detect_language:
+            from ytlang import detect_languages
+            self.df_comments['lang'] = detect_languages(self.df_comments['cleaned_text'])
+            languages = self.df_comments['lang']
+            top = languages.value_counts().head(5)
+            print("  语言分布: " + ', '.join(f"{lang} {count:,}" for lang, count in top.items()))
+        
+        if self.dedup:
+            self.score_deduplicated_comments(comment_scorers, languages)
+        else:
+            self.score_texts(self.df_comments, self.df_comments['cleaned_text'],
+                             comment_scorers, SCORE_TARGETS['comments'], languages)
+    
+    def _score_comment_subset(self, comment_scorers):
+        """增量模式: 只给 score_mask 中的评论评分, 其它评论沿用 previous_scores (上次导出或数据库) 的得分
+
+        previous_scores 里找不到得分的评论也会评分; df_comments 始终是完整的评论表
+        """
+        full = self.df_comments
+        ids = full['comment_id'].astype(str)
+        todo = np.asarray(self.score_mask, dtype=bool).copy()
+        previous = self.previous_scores
+        if isinstance(previous, str):
+            previous = pd.read_csv(previous, dtype={'comment_id': str}) if os.path.exists(previous) else None
+        if previous is not None:
+            required = [SCORE_TARGETS['comments'].format(prefix=SCORERS[name]['prefix'], col=col)
+                        for name in comment_scorers for col in SCORERS[name]['columns']]
+            if all(column in previous.columns for column in required):
+                # 沿用上次评分产生的列 (主题每次重新计算)
+                derived = [c for c in previous.columns if c not in full.columns and c != 'topic_id']
+                previous = previous.drop_duplicates('comment_id', keep='last').set_index('comment_id')[derived]
+                todo |= ~ids.isin(previous.index).to_numpy()
+            else:
+                previous = None
+        if previous is None:
+            todo[:] = True
+        
+        print(f"  只评分新评论: {int(todo.sum()):,} 条, 沿用上次得分: {int((~todo).sum()):,} 条")
+        self.df_comments = full[todo].reset_index(drop=True)
+        try:
+            if len(self.df_comments):
+                self._score_comments(comment_scorers)
+            scored = self.df_comments
+        finally:
+            self.df_comments = full
+        
+        columns = list(dict.fromkeys([c for c in scored.columns if c not in full.columns]
+                                     + (list(previous.columns) if previous is not None else [])))
+        for column in columns:
+            parts = []
+            if column in scored.columns:
+                parts.append(pd.Series(scored[column].to_numpy(), index=full.index[todo]))
+            if previous is not None and column in previous.columns:
+                parts.append(pd.Series(previous[column].reindex(ids[~todo]).to_numpy(), index=full.index[~todo]))
+            full[column] = pd.concat([part for part in parts if len(part)] or parts).reindex(full.index)
+        # 数据库里的得分不含清理后的文本
+        missing = full['cleaned_text'].isna() if 'cleaned_text' in full.columns else pd.Series(True, index=full.index)
+        if missing.any():
+            full.loc[missing, 'cleaned_text'] = full.loc[missing, 'comment_text'].apply(self.clean_text)
+        self.rescored = todo
+    
+    def dedupe_comments(self):
+        """MinHash/LSH 近似重复评论聚类, 添加 dup_cluster_id / dup_cluster_size 列"""
+        from ytdedup import minhash_clusters
+        cluster_first, cluster_size = minhash_clusters(self.df_comments['cleaned_text'])
+        # 簇编号使用簇内第一条评论的comment_id
+        self.df_comments['dup_cluster_id'] = self.df_comments['comment_id'].to_numpy()[cluster_first]
+        self.df_comments['dup_cluster_size'] = cluster_size
+        
+        duplicated = int((cluster_size > 1).sum())
+        clusters = int(self.df_comments['dup_cluster_id'].nunique())
+        print(f"  重复评论: {duplicated:,} 条评论属于多条评论的簇, 共 {clusters:,} 个不同的簇")
+    
+    def score_deduplicated_comments(self, scorer_names, languages=None):
+        """每个重复簇只评分一次, 得分复制给簇内所有评论
+        
+        识别了语言时按 (簇, 语言) 评分, 每组的第一条评论作为代表, 评分器是否支持由评论自己的语言决定;
+        同组内文本不完全相同的评论 (近似重复) 继承代表的得分, lang 列仍是每条评论自己的语言
+        """
+        self.dedupe_comments()
+        
+        keys = self.df_comments['dup_cluster_id'].astype(str)
+        if languages is not None:
+            keys = keys + '\x00' + languages.astype(str)
+        groups, _ = pd.factorize(keys)
+        first = pd.Series(np.arange(len(groups))).groupby(groups).transform('min').to_numpy()
+        rows = np.unique(first)
+        representatives = self.df_comments.iloc[rows]
+        scores = pd.DataFrame(index=representatives.index)
+        self.score_texts(scores, representatives['cleaned_text'], scorer_names, SCORE_TARGETS['comments'],
+                         languages.loc[representatives.index] if languages is not None else None)
+        print(f"  只需评分 {len(representatives):,} / {len(self.df_comments):,} 条评论")
+        
+        position = np.searchsorted(rows, first)
+        for col in scores.columns:
+            self.df_comments[col] = scores[col].to_numpy()[position]
+    
+    def extract_topics(self, n_topics=20, model_path=None, chunk_size=50000):
+        """评论主题聚类 (yttopics.py): 添加 topic_id 列, 视频添加 dominant_topic 列
+        
+        model_path 已存在时加载模型, 只在没有训练过的评论 (按 comment_id) 上继续训练; 结束后保存模型
+        """
+        if self.df_comments is None or 'cleaned_text' not in self.df_comments.columns:
+            return None
+        from yttopics import TopicModel, topic_table, video_topics
+        
+        if model_path and os.path.exists(model_path):
+            model = TopicModel.load(model_path)
+            print(f"\n主题聚类: 加载模型 {model_path} ({model.n_topics} 个主题, 已训练 {model.n_docs:,} 条评论)")
+        else:
+            model = TopicModel(n_topics=n_topics)
+            print(f"\n主题聚类: {n_topics} 个主题")
+        texts = self.df_comments['cleaned_text']
+        ids = self.df_comments['comment_id'] if 'comment_id' in self.df_comments.columns else None
+        trained = model.n_docs
+        ranges = [slice(start, start + chunk_size) for start in range(0, len(texts), chunk_size)]
+        try:
+            model.fit((texts.iloc[rows], ids.iloc[rows]) if ids is not None else texts.iloc[rows] for rows in ranges)
+        except ValueError as e:
+            print(f"  ⚠ 跳过主题聚类: {e}")
+            return None
+        print(f"  训练 {model.n_docs - trained:,} 条新评论")
+        if model_path:
+            model.save(model_path)
+            print(f"  ✓ 模型已保存: {model_path}")
+        
+        labels = np.concatenate([model.predict(texts.iloc[rows]) for rows in ranges])
+        self.df_comments['topic_id'] = labels
+        self.topics = topic_table(model, labels)
+        if self.df_videos is not None:
+            per_video = video_topics(self.df_comments['video_id'], labels)
+            for col in per_video.columns:
+                self.df_videos[col] = self.df_videos['video_id'].map(per_video[col])
+        
+        for row in top_rows(self.topics, 'comments', 10).itertuples():
+            print(f"  {row.topic_id:3d}  {row.comments:8,}  {row.terms}")
+        return self.topics[['topic_id', 'comments', 'terms']].to_dict('records')
+    
+    def approximate_statistics(self, population=None, confidence=0.95, n_boot=200, seed=0):
+        """近似模式: 样本上的情感占比、平均compound和视频排名及 bootstrap 置信区间 (ytapprox.py)"""
+        if self.df_comments is None or self._col('compound') not in self.df_comments.columns:
+            return None
+        from ytapprox import approximate_report
+        report = approximate_report(self.df_comments, self._col('compound'), self._col('sentiment'),
+                                    population, confidence, n_boot, seed)
+        level = f"{confidence:.0%}"
+        total = f"{population:,}" if population is not None else '?'
+        print(f"\n【近似统计 - 样本 {report['sample']:,} 条 / 总体 {total} 条, {level} 置信区间】")
+        for sentiment, name in [('positive', '正面'), ('neutral', '中性'), ('negative', '负面')]:
+            share = report['shares'][sentiment]
+            print(f"{name}: {share['estimate']:.1%} ({share['low']:.1%} ~ {share['high']:.1%})")
+        mean = report['mean_compound']
+        print(f"平均情感得分: {mean['estimate']:.3f} ({mean['low']:.3f} ~ {mean['high']:.3f})")
+        
+        titles = self.df_videos.set_index('video_id')['title'] if self.df_videos is not None else pd.Series(dtype=str)
+        for key, heading in [('top_videos', '情感最积极的视频'), ('bottom_videos', '情感最消极的视频')]:
+            if report[key]:
+                print(f"\n{heading}:")
+            for row in report[key]:
+                title = _short_title(titles.get(row['video_id'], row['video_id']))
+                print(f"  {row['estimate']:.3f} ({row['low']:.3f} ~ {row['high']:.3f}) - {title} ({row['comments']}条样本)")
+        return report
+    
+    def scorer_agreement_report(self, candidate='lexicon', reference='vader', sample_size=10000):
+        """评分器一致性报告: candidate 与 reference 在评论上的对比"""
+        if self.df_comments is None or 'cleaned_text' not in self.df_comments.columns:
+            return None
+        
+        df = self.df_comments
+        if 'lang' in df.columns:
+            languages = set(SCORERS[candidate]['languages'] or ENGLISH) & set(SCORERS[reference]['languages'] or ENGLISH)
+            df = df[df['lang'].isin(languages)]
+        columns = {}
+        for name in (candidate, reference):
+            prefix = SCORERS[name]['prefix']
+            if f'{prefix}_compound' in df.columns:
+                columns[name] = df[[f'{prefix}_compound', f'{prefix}_sentiment']]
+        
+        # 没有跑过的评分器只在样本上计算
+        if len(columns) < 2:
+            sample = df if len(df) <= sample_size else df.sample(sample_size, random_state=0)
+            for name in (candidate, reference):
+                if name not in columns:
+                    prefix = SCORERS[name]['prefix']
+                    scored = SCORERS[name]['score'](self, sample['cleaned_text'])
+                    columns[name] = scored[['compound', 'sentiment']].rename(
+                        columns=lambda c: f'{prefix}_{c}')
+            index = columns[candidate].index.intersection(columns[reference].index)
+            columns = {name: frame.loc[index] for name, frame in columns.items()}
+        
+        both = columns[candidate].iloc[:, 0].notna() & columns[reference].iloc[:, 0].notna()
+        cand = columns[candidate][both]
+        ref = columns[reference][both]
+        cand_compound = cand.iloc[:, 0].to_numpy(dtype=float)
+        ref_compound = ref.iloc[:, 0].to_numpy(dtype=float)
+        cand_label = cand.iloc[:, 1].to_numpy()
+        ref_label = ref.iloc[:, 1].to_numpy()
+        
+        report = {
+            'candidate': candidate,
+            'reference': reference,
+            'n': int(len(cand_compound)),
+            'label_agreement': float((cand_label == ref_label).mean()) if len(cand_label) else None,
+            'compound_mae': float(np.abs(cand_compound - ref_compound).mean()) if len(cand_label) else None,
+            'compound_pearson': (float(np.corrcoef(cand_compound, ref_compound)[0, 1])
+                                 if len(cand_label) > 1 and cand_compound.std() > 0 and ref_compound.std() > 0
+                                 else None),
+            'confusion': pd.crosstab(
+                pd.Series(ref_label, name=reference), pd.Series(cand_label, name=candidate)
+            ).to_dict(),
+        }
+        
+        print(f"\n【评分器一致性: {candidate} vs {reference}】")
+        print(f"样本数: {report['n']:,}")
+        if report['n']:
+            print(f"标签一致率: {report['label_agreement'] * 100:.1f}%")
+            print(f"compound 平均绝对误差: {report['compound_mae']:.3f}")
+            if report['compound_pearson'] is not None:
+                print(f"compound 相关系数: {report['compound_pearson']:.3f}")
+        return report
     
     def generate_statistics(self):
-        """生成统计报告"""
+        """生成统计报告, 返回主要指标 (用于运行摘要)"""
+        stats = {}
         print("\n" + "=" * 60)
         print("数据统计报告")
         print("=" * 60)
@@ -208,20 +685,53 @@ class YouTubeSentimentAnalyzer:
             print(f"总观看数: {self.df_videos['view_count'].sum():,}")
             print(f"总点赞数: {self.df_videos['like_count'].sum():,}")
             
-            # 互动率
-            self.df_videos['engagement_rate'] = (
-                (self.df_videos['like_count'] + self.df_videos['comment_count']) / 
-                self.df_videos['view_count'] * 100
-            )
-            print(f"平均互动率: {self.df_videos['engagement_rate'].mean():.2f}%")
+            # 互动率 (观看数为0的视频为NaN, 不计入平均)
+            self._add_engagement_rate()
+            rate = self.df_videos['engagement_rate'].mean()
+            print(f"平均互动率: {_format_value(rate, '.2f', '%')}")
+            stats['videos'] = len(self.df_videos)
+            stats['total_views'] = int(self.df_videos['view_count'].sum())
+            stats['mean_engagement_rate'] = float(rate) if pd.notna(rate) else None
+            
+            print("\n互动率最高的视频:")
+            top = top_rows(self.df_videos, 'engagement_rate', 5)
+            for _, row in top.iterrows():
+                print(f"  {row['engagement_rate']:.2f}% (频道内 {row['engagement_percentile']:.0f} 百分位) - "
+                      f"{_short_title(row['title'])}")
+            stats['top_engagement'] = top['video_id'].tolist()
+            stats['top_sentiment_weighted_engagement'] = top_rows(
+                self.df_videos, 'sentiment_weighted_engagement', 5)['video_id'].tolist()
+            outliers = self.df_videos['engagement_zscore'].abs() > 3
+            if outliers.any():
+                print(f"互动率异常的视频 (|z| > 3, 相对同频道之前的视频): {int(outliers.sum())}")
+            stats['engagement_outliers'] = int(outliers.sum())
+            
+            if self.df_videos['channel_id'].nunique() > 1:
+                channels = channel_summary(self.df_videos)
+                print(f"\n【频道对比】 ({len(channels)} 个频道)")
+                for channel_id, row in top_rows(channels, 'engagement_rate', 10).iterrows():
+                    print(f"  {channel_id}: {int(row['videos'])} 个视频, "
+                          f"互动率 {_format_value(row['engagement_rate'], '.2f', '%')}, "
+                          f"中位数 {_format_value(row['median_engagement_rate'], '.2f', '%')}")
+            
+            if 'duration_seconds' in typed_columns(self.df_videos).columns \
+                    and self.df_videos['duration_seconds'].gt(0).any():
+                self._duration_statistics(stats)
+        
+        # 评论情感统计 (有汇总表时直接读取汇总表)
+        if self.rollups is not None and self.rollups.totals() is not None:
+            self._rollup_statistics(stats)
+            return stats
         
-        # 评论情感统计
-        if self.df_comments is not None and 'vader_sentiment' in self.df_comments.columns:
-            print(f"\n【评论情感分析 - VADER】")
+        if self.df_comments is not None and self._col('sentiment') in self.df_comments.columns:
+            print(f"\n【评论情感分析 - {self.sentiment_scorer.upper()}】")
             print(f"总评论数: {len(self.df_comments)}")
             
-            sentiment_counts = self.df_comments['vader_sentiment'].value_counts()
-            total = len(self.df_comments)
+            sentiment_counts = self.df_comments[self._col('sentiment')].value_counts()
+            # 评分器不支持的语言没有得分, 不计入比例
+            total = int(sentiment_counts.sum())
+            if total < len(self.df_comments):
+                print(f"已评分评论数: {total:,} (跳过 {len(self.df_comments) - total:,} 条不支持语言的评论)")
             
             for sentiment in ['positive', 'neutral', 'negative']:
                 count = sentiment_counts.get(sentiment, 0)
@@ -229,15 +739,28 @@ class YouTubeSentimentAnalyzer:
                 emoji = {'positive': '😊', 'neutral': '😐', 'negative': '😞'}
                 print(f"{emoji[sentiment]} {sentiment.capitalize()}: {count:,} ({pct:.1f}%)")
             
-            print(f"\n平均情感得分: {self.df_comments['vader_compound'].mean():.3f}")
-            print(f"正面强度: {self.df_comments['vader_pos'].mean():.3f}")
-            print(f"负面强度: {self.df_comments['vader_neg'].mean():.3f}")
+            print(f"\n平均情感得分: {self.df_comments[self._col('compound')].mean():.3f}")
+            print(f"正面强度: {self.df_comments[self._col('pos')].mean():.3f}")
+            print(f"负面强度: {self.df_comments[self._col('neg')].mean():.3f}")
+            stats['comments'] = len(self.df_comments)
+            stats['scored_comments'] = total
+            if 'dup_cluster_size' in self.df_comments.columns:
+                duplicated = int((self.df_comments['dup_cluster_size'] > 1).sum())
+                print(f"重复/刷屏评论: {duplicated:,} ({duplicated / len(self.df_comments) * 100:.1f}%)")
+                stats['duplicate_comments'] = duplicated
+                stats['comment_clusters'] = int(self.df_comments['dup_cluster_id'].nunique())
+            if 'lang' in self.df_comments.columns:
+                stats['languages'] = {lang: int(count) for lang, count in
+                                      self.df_comments['lang'].value_counts().items()}
+            stats['sentiment_counts'] = {s: int(sentiment_counts.get(s, 0))
+                                         for s in ['positive', 'neutral', 'negative']}
+            stats['mean_compound'] = float(self.df_comments[self._col('compound')].mean())
         
         # 按视频的情感分布
-        if self.df_comments is not None and 'vader_sentiment' in self.df_comments.columns:
+        if self.df_comments is not None and self._col('sentiment') in self.df_comments.columns:
             print(f"\n【视频情感排名】")
             video_sentiment = self.df_comments.groupby('video_id').agg({
-                'vader_compound': 'mean',
+                self._col('compound'): 'mean',
                 'comment_id': 'count'
             }).rename(columns={'comment_id': 'comment_count'})
             
@@ -248,14 +771,96 @@ class YouTubeSentimentAnalyzer:
             )
             
             print("\n最受欢迎的视频 (情感最积极):")
-            top_positive = video_sentiment.nlargest(5, 'vader_compound')
+            top_positive = top_rows(video_sentiment, self._col('compound'), 5)
             for idx, row in top_positive.iterrows():
-                title = row['title'][:50] + '...' if len(row['title']) > 50 else row['title']
-                print(f"  {row['vader_compound']:.3f} - {title} ({row['comment_count']}条评论)")
+                print(f"  {row[self._col('compound')]:.3f} - {_short_title(row['title'])} ({row['comment_count']}条评论)")
+        
+        return stats
+    
+    def _duration_statistics(self, stats):
+        """按视频时长分桶的互动率和评论情感"""
+        buckets = duration_bucket_stats(self.df_videos, self._video_sentiment())
+        print(f"\n【按时长分组】")
+        rows = []
+        for label, row in buckets.iterrows():
+            if row['videos'] == 0:
+                continue
+            compound = f", 评论情感 {row['mean_compound']:+.3f}" if pd.notna(row['mean_compound']) else ''
+            print(f"  {label:>6}: {int(row['videos'])} 个视频, 观看中位数 {_format_value(row['median_views'], ',.0f')}, "
+                  f"互动率 {_format_value(row['engagement_rate'], '.2f', '%')}{compound}")
+            rows.append({'bucket': label, 'videos': int(row['videos']),
+                         **{column: round(float(row[column]), 4) if pd.notna(row[column]) else None
+                            for column in ('median_views', 'engagement_rate', 'mean_compound')}})
+        stats['duration_buckets'] = rows
+    
+    def _rollup_statistics(self, stats):
+        """从汇总表生成评论情感统计和视频情感排名"""
+        totals = self.rollups.totals()
+        total = int(totals['scored'])
+        print(f"\n【评论情感分析 - {self.rollups.prefix.upper()} (汇总表)】")
+        print(f"总评论数: {int(totals['comments']):,}")
+        if total < totals['comments']:
+            print(f"已评分评论数: {total:,} (跳过 {int(totals['comments']) - total:,} 条不支持语言的评论)")
+        
+        emoji = {'positive': '😊', 'neutral': '😐', 'negative': '😞'}
+        for sentiment in ['positive', 'neutral', 'negative']:
+            count = int(totals[sentiment])
+            pct = (count / total * 100) if total > 0 else 0
+            print(f"{emoji[sentiment]} {sentiment.capitalize()}: {count:,} ({pct:.1f}%)")
+        
+        print(f"\n平均情感得分: {totals['mean_compound']:.3f}")
+        print(f"正面强度: {totals['mean_pos']:.3f}")
+        print(f"负面强度: {totals['mean_neg']:.3f}")
+        stats['comments'] = int(totals['comments'])
+        stats['scored_comments'] = total
+        stats['sentiment_counts'] = {s: int(totals[s]) for s in ['positive', 'neutral', 'negative']}
+        stats['mean_compound'] = float(totals['mean_compound']) if total else None
+        
+        print(f"\n【视频情感排名】")
+        video_sentiment = self.rollups.video_stats()[['mean_compound', 'comments']].reset_index()
+        if self.df_videos is not None:
+            video_sentiment = video_sentiment.merge(self.df_videos[['video_id', 'title']], on='video_id', how='left')
+        else:
+            video_sentiment['title'] = video_sentiment['video_id']
+        video_sentiment['title'] = video_sentiment['title'].fillna(video_sentiment['video_id'])
+        
+        print("\n最受欢迎的视频 (情感最积极):")
+        top_positive = top_rows(video_sentiment, 'mean_compound', 5)
+        for idx, row in top_positive.iterrows():
+            print(f"  {row['mean_compound']:.3f} - {_short_title(row['title'])} ({int(row['comments'])}条评论)")
+    
+    def update_rollups(self):
+        """把本次评分的评论加入汇总表, 返回新增评论数"""
+        if self.rollups is None or self.df_comments is None:
+            return 0
+        if self._col('compound') not in self.df_comments.columns:
+            return 0
+        prefix = SCORERS[self.sentiment_scorer]['prefix']
+        if self.rollups.tables['video'] is None:
+            self.rollups.prefix = prefix
+        elif self.rollups.prefix != prefix:
+            print(f"⚠ 汇总表使用的评分器是 {self.rollups.prefix}, 本次是 {prefix}, 未更新汇总表")
+            return 0
+        added = self.rollups.update(self.df_comments, self.df_videos)
+        print(f"✓ 汇总表新增 {added:,} 条评论: {self.rollups.path}")
+        return added
+    
+    def _video_sentiment(self):
+        """video_id -> 评论平均compound (有汇总表时读汇总表), 没有评分时为 None"""
+        if self.rollups is not None and self.rollups.video_stats() is not None:
+            return self.rollups.video_stats()['mean_compound']
+        if self.df_comments is not None and self._col('compound') in self.df_comments.columns:
+            return self.df_comments.groupby('video_id')[self._col('compound')].mean()
+        return None
+    
+    def _add_engagement_rate(self):
+        """互动率 = (点赞 + 评论) / 观看, 以及 ytanalytics 的比率、频道内百分位和z分数"""
+        metrics = video_metrics(self.df_videos, self._video_sentiment())
+        for column in METRIC_COLUMNS:
+            self.df_videos[column] = metrics[column]
     
     def visualize_results(self, output_dir='analysis_results'):
         """生成可视化分析"""
-        import os
         os.makedirs(output_dir, exist_ok=True)
         
         print(f"\n生成可视化分析...")
@@ -279,13 +884,14 @@ class YouTubeSentimentAnalyzer:
     
     def _plot_sentiment_overview(self, output_dir):
         """情感分析总览"""
-        if self.df_comments is None or 'vader_sentiment' not in self.df_comments.columns:
+        plt = get_pyplot()
+        if self.df_comments is None or self._col('sentiment') not in self.df_comments.columns:
             return
         
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
         
         # 1. 情感分布饼图
-        sentiment_counts = self.df_comments['vader_sentiment'].value_counts()
+        sentiment_counts = self.df_comments[self._col('sentiment')].value_counts()
         colors = {'positive': '#4CAF50', 'neutral': '#FFC107', 'negative': '#F44336'}
         axes[0, 0].pie(
             sentiment_counts.values, 
@@ -297,8 +903,8 @@ class YouTubeSentimentAnalyzer:
         axes[0, 0].set_title('Comment Sentiment Distribution', fontsize=14, fontweight='bold')
         
         # 2. VADER compound分数分布
-        axes[0, 1].hist(self.df_comments['vader_compound'], bins=50, color='skyblue', edgecolor='black', alpha=0.7)
-        axes[0, 1].axvline(self.df_comments['vader_compound'].mean(), color='red', linestyle='--', linewidth=2, label='Mean')
+        axes[0, 1].hist(self.df_comments[self._col('compound')].dropna(), bins=50, color='skyblue', edgecolor='black', alpha=0.7)
+        axes[0, 1].axvline(self.df_comments[self._col('compound')].mean(), color='red', linestyle='--', linewidth=2, label='Mean')
         axes[0, 1].axvline(0, color='gray', linestyle=':', linewidth=1)
         axes[0, 1].set_xlabel('VADER Compound Score', fontsize=12)
         axes[0, 1].set_ylabel('Frequency', fontsize=12)
@@ -307,9 +913,9 @@ class YouTubeSentimentAnalyzer:
         
         # 3. 情感强度对比
         sentiment_intensities = pd.DataFrame({
-            'Positive': self.df_comments.groupby('vader_sentiment')['vader_pos'].mean(),
-            'Neutral': self.df_comments.groupby('vader_sentiment')['vader_neu'].mean(),
-            'Negative': self.df_comments.groupby('vader_sentiment')['vader_neg'].mean()
+            'Positive': self.df_comments.groupby(self._col('sentiment'))[self._col('pos')].mean(),
+            'Neutral': self.df_comments.groupby(self._col('sentiment'))[self._col('neu')].mean(),
+            'Negative': self.df_comments.groupby(self._col('sentiment'))[self._col('neg')].mean()
         })
         sentiment_intensities.plot(kind='bar', ax=axes[1, 0], color=['#4CAF50', '#FFC107', '#F44336'])
         axes[1, 0].set_title('Sentiment Intensity by Category', fontsize=14, fontweight='bold')
@@ -321,8 +927,8 @@ class YouTubeSentimentAnalyzer:
         # 4. 评论长度 vs 情感
         self.df_comments['text_length'] = self.df_comments['cleaned_text'].str.len()
         for sentiment, color in colors.items():
-            data = self.df_comments[self.df_comments['vader_sentiment'] == sentiment]
-            axes[1, 1].scatter(data['text_length'], data['vader_compound'], 
+            data = self.df_comments[self.df_comments[self._col('sentiment')] == sentiment]
+            axes[1, 1].scatter(data['text_length'], data[self._col('compound')], 
                              alpha=0.3, s=20, c=color, label=sentiment.capitalize())
         axes[1, 1].set_xlabel('Comment Length (characters)', fontsize=12)
         axes[1, 1].set_ylabel('Sentiment Score', fontsize=12)
@@ -337,13 +943,16 @@ class YouTubeSentimentAnalyzer:
     
     def _plot_video_performance(self, output_dir):
         """视频性能分析"""
+        plt = get_pyplot()
         if self.df_videos is None:
             return
+        if 'engagement_rate' not in self.df_videos.columns:
+            self._add_engagement_rate()
         
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
         
         # 1. Top 10 观看量
-        top_views = self.df_videos.nlargest(10, 'view_count')
+        top_views = top_rows(self.df_videos, 'view_count', 10)
         axes[0, 0].barh(range(len(top_views)), top_views['view_count'], color='steelblue')
         axes[0, 0].set_yticks(range(len(top_views)))
         axes[0, 0].set_yticklabels([t[:40]+'...' if len(t) > 40 else t for t in top_views['title']], fontsize=9)
@@ -352,7 +961,7 @@ class YouTubeSentimentAnalyzer:
         axes[0, 0].invert_yaxis()
         
         # 2. 互动率 Top 10
-        top_engagement = self.df_videos.nlargest(10, 'engagement_rate')
+        top_engagement = top_rows(self.df_videos, 'engagement_rate', 10)
         axes[0, 1].barh(range(len(top_engagement)), top_engagement['engagement_rate'], color='coral')
         axes[0, 1].set_yticks(range(len(top_engagement)))
         axes[0, 1].set_yticklabels([t[:40]+'...' if len(t) > 40 else t for t in top_engagement['title']], fontsize=9)
@@ -379,16 +988,24 @@ class YouTubeSentimentAnalyzer:
     
     def _plot_time_series(self, output_dir):
         """时间序列分析"""
-        if self.df_comments is None or 'published_at' not in self.df_comments.columns:
+        plt = get_pyplot()
+        daily = self.rollups.daily() if self.rollups is not None else None
+        if daily is not None:
+            # 直接使用按天汇总表
+            dates = pd.to_datetime(daily.index).date
+            daily_comments = pd.Series(daily['comments'].to_numpy(), index=dates)
+            daily_sentiment = pd.Series(daily['mean_compound'].to_numpy(), index=dates)
+        elif self.df_comments is not None and 'published_at' in self.df_comments.columns:
+            # published_at 加载时已解析 (UTC), 按天取整分组
+            days = typed_columns(self.df_comments)['published_at'].dt.floor('D')
+            daily_comments = self.df_comments.groupby(days).size()
+            daily_sentiment = self.df_comments.groupby(days)[self._col('compound')].mean()
+        else:
             return
         
-        # 转换时间
-        self.df_comments['published_date'] = pd.to_datetime(self.df_comments['published_at']).dt.date
-        
         fig, axes = plt.subplots(2, 1, figsize=(15, 10))
         
         # 1. 每日评论数量
-        daily_comments = self.df_comments.groupby('published_date').size()
         axes[0].plot(daily_comments.index, daily_comments.values, marker='o', linewidth=2)
         axes[0].set_xlabel('Date', fontsize=12)
         axes[0].set_ylabel('Number of Comments', fontsize=12)
@@ -396,7 +1013,6 @@ class YouTubeSentimentAnalyzer:
         axes[0].grid(True, alpha=0.3)
         
         # 2. 每日平均情感
-        daily_sentiment = self.df_comments.groupby('published_date')['vader_compound'].mean()
         axes[1].plot(daily_sentiment.index, daily_sentiment.values, marker='o', linewidth=2, color='purple')
         axes[1].axhline(0, color='gray', linestyle='--', linewidth=1)
         axes[1].fill_between(daily_sentiment.index, 0, daily_sentiment.values, 
@@ -416,8 +1032,10 @@ class YouTubeSentimentAnalyzer:
     
     def _generate_wordclouds(self, output_dir):
         """生成词云"""
-        if self.df_comments is None:
+        if self.df_comments is None or self._col('sentiment') not in self.df_comments.columns:
             return
+        plt = get_pyplot()
+        from wordcloud import WordCloud
         
         fig, axes = plt.subplots(1, 3, figsize=(18, 6))
         
@@ -425,7 +1043,7 @@ class YouTubeSentimentAnalyzer:
         colors = ['Greens', 'Greys', 'Reds']
         
         for idx, (sentiment, cmap) in enumerate(zip(sentiments, colors)):
-            comments = self.df_comments[self.df_comments['vader_sentiment'] == sentiment]
+            comments = self.df_comments[self.df_comments[self._col('sentiment')] == sentiment]
             if len(comments) > 0:
                 text = ' '.join(comments['cleaned_text'].astype(str))
                 text = re.sub(r'\b\w{1,2}\b', '', text)  # 移除短词
@@ -448,30 +1066,36 @@ class YouTubeSentimentAnalyzer:
     
     def _plot_detailed_sentiment(self, output_dir):
         """详细情感分析"""
-        if self.df_comments is None:
+        plt = get_pyplot()
+        if self.df_comments is None or self._col('sentiment') not in self.df_comments.columns:
             return
         
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
         
-        # 1. TextBlob vs VADER对比
-        axes[0, 0].scatter(self.df_comments['tb_polarity'], self.df_comments['vader_compound'], alpha=0.3, s=20)
-        axes[0, 0].plot([-1, 1], [-1, 1], 'r--', linewidth=2, label='Perfect Agreement')
-        axes[0, 0].set_xlabel('TextBlob Polarity', fontsize=12)
-        axes[0, 0].set_ylabel('VADER Compound', fontsize=12)
-        axes[0, 0].set_title('TextBlob vs VADER Comparison', fontsize=14, fontweight='bold')
-        axes[0, 0].legend()
-        axes[0, 0].grid(True, alpha=0.3)
-        
-        # 2. 主观性分析
-        axes[0, 1].hist(self.df_comments['tb_subjectivity'], bins=30, color='orange', edgecolor='black', alpha=0.7)
-        axes[0, 1].axvline(self.df_comments['tb_subjectivity'].mean(), color='red', linestyle='--', linewidth=2, label='Mean')
-        axes[0, 1].set_xlabel('Subjectivity Score', fontsize=12)
-        axes[0, 1].set_ylabel('Frequency', fontsize=12)
-        axes[0, 1].set_title('Comment Subjectivity Distribution', fontsize=14, fontweight='bold')
-        axes[0, 1].legend()
+        if 'tb_polarity' in self.df_comments.columns:
+            # 1. TextBlob vs VADER对比
+            axes[0, 0].scatter(self.df_comments['tb_polarity'], self.df_comments[self._col('compound')], alpha=0.3, s=20)
+            axes[0, 0].plot([-1, 1], [-1, 1], 'r--', linewidth=2, label='Perfect Agreement')
+            axes[0, 0].set_xlabel('TextBlob Polarity', fontsize=12)
+            axes[0, 0].set_ylabel('VADER Compound', fontsize=12)
+            axes[0, 0].set_title('TextBlob vs VADER Comparison', fontsize=14, fontweight='bold')
+            axes[0, 0].legend()
+            axes[0, 0].grid(True, alpha=0.3)
+            
+            # 2. 主观性分析
+            axes[0, 1].hist(self.df_comments['tb_subjectivity'], bins=30, color='orange', edgecolor='black', alpha=0.7)
+            axes[0, 1].axvline(self.df_comments['tb_subjectivity'].mean(), color='red', linestyle='--', linewidth=2, label='Mean')
+            axes[0, 1].set_xlabel('Subjectivity Score', fontsize=12)
+            axes[0, 1].set_ylabel('Frequency', fontsize=12)
+            axes[0, 1].set_title('Comment Subjectivity Distribution', fontsize=14, fontweight='bold')
+            axes[0, 1].legend()
+        else:
+            # 没有运行TextBlob评分器
+            axes[0, 0].axis('off')
+            axes[0, 1].axis('off')
         
         # 3. 点赞数 vs 情感
-        axes[1, 0].scatter(self.df_comments['like_count'], self.df_comments['vader_compound'], alpha=0.3, s=20)
+        axes[1, 0].scatter(self.df_comments['like_count'], self.df_comments[self._col('compound')], alpha=0.3, s=20)
         axes[1, 0].set_xlabel('Comment Likes', fontsize=12)
         axes[1, 0].set_ylabel('Sentiment Score', fontsize=12)
         axes[1, 0].set_title('Comment Popularity vs Sentiment', fontsize=14, fontweight='bold')
@@ -479,9 +1103,9 @@ class YouTubeSentimentAnalyzer:
         
         # 4. 情感分布箱线图
         sentiment_data = [
-            self.df_comments[self.df_comments['vader_sentiment'] == 'positive']['vader_compound'],
-            self.df_comments[self.df_comments['vader_sentiment'] == 'neutral']['vader_compound'],
-            self.df_comments[self.df_comments['vader_sentiment'] == 'negative']['vader_compound']
+            self.df_comments[self.df_comments[self._col('sentiment')] == 'positive'][self._col('compound')],
+            self.df_comments[self.df_comments[self._col('sentiment')] == 'neutral'][self._col('compound')],
+            self.df_comments[self.df_comments[self._col('sentiment')] == 'negative'][self._col('compound')]
         ]
         bp = axes[1, 1].boxplot(sentiment_data, labels=['Positive', 'Neutral', 'Negative'],
                                 patch_artist=True)
@@ -500,7 +1124,6 @@ class YouTubeSentimentAnalyzer:
     
     def export_results(self, output_dir='analysis_results'):
         """导出分析结果"""
-        import os
         os.makedirs(output_dir, exist_ok=True)
         
         if self.df_comments is not None:
@@ -510,58 +1133,406 @@ class YouTubeSentimentAnalyzer:
         if self.df_videos is not None:
             self.df_videos.to_csv(f'{output_dir}/videos_with_analysis.csv', index=False, encoding='utf-8')
             print(f"✓ 视频分析结果: {output_dir}/videos_with_analysis.csv")
+        
+        if self.topics is not None:
+            self.topics.to_csv(f'{output_dir}/topics.csv', index=False, encoding='utf-8')
+            print(f"✓ 主题关键词: {output_dir}/topics.csv")
+
 
+# ============== 情感评分器注册表 ==============
+# name -> {'prefix': 结果列前缀, 'primary': 是否产出 compound/pos/neu/neg/sentiment,
+#          'languages': 支持的语言代码 (None 表示全部), 'score': fn}
+SCORERS = {}
 
-def main():
-    """主函数"""
+# 英文评分器也处理判断不出语言的短评论 ('und', 如 "great", "lol")
+ENGLISH = ('en', 'und')
+
+# 评分器默认的输出列 (与VADER相同)
+SENTIMENT_COLUMNS = ('neg', 'neu', 'pos', 'compound', 'sentiment')
+
+# 每一类文本的结果列命名
+SCORE_TARGETS = {
+    'comments': '{prefix}_{col}',
+    'titles': 'title_{prefix}_{col}',
+    'descriptions': 'description_{prefix}_{col}',
+}
+
+DEFAULT_SCORERS = {
+    'comments': ['textblob', 'vader'],
+    'titles': ['vader'],
+    'descriptions': [],
+}
+
+
+def register_scorer(name, prefix=None, primary=False, languages=ENGLISH, columns=SENTIMENT_COLUMNS):
+    """注册评分器, score(analyzer, texts) 返回与texts同索引的DataFrame
+
+    columns 为输出的列, 一批中没有评分器支持的语言时这些列为空值
+    """
+    def decorator(score):
+        SCORERS[name] = {'prefix': prefix or name, 'primary': primary,
+                         'languages': languages, 'columns': tuple(columns), 'score': score}
+        return score
+    return decorator
+
+
+@register_scorer('textblob', prefix='tb', columns=('polarity', 'subjectivity', 'sentiment'))
+def _score_textblob(analyzer, texts):
+    return pd.DataFrame(list(texts.map(analyzer.analyze_sentiment_textblob)), index=texts.index)
+
+
+@register_scorer('vader', primary=True)
+def _score_vader(analyzer, texts):
+    return pd.DataFrame(list(texts.map(analyzer.analyze_sentiment_vader)), index=texts.index)
+
+
+@register_scorer('lexicon', prefix='lex', primary=True, columns=('compound', 'pos', 'neu', 'neg', 'sentiment'))
+def _score_lexicon(analyzer, texts):
+    return analyzer.lexicon_scorer.score(texts)
+
+
+# 退出码 (供调度系统使用)
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CONFIG_ERROR = 2
+
+STAGES = ('stats', 'plots', 'export')
+
+
+def load_config(path):
+    """读取JSON配置文件 (键名与命令行参数的dest一致)"""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"配置文件必须是JSON对象: {path}")
+    return config
+
+
+def parse_args(argv=None):
+    """解析命令行参数, --config中的值作为默认值, 命令行参数优先"""
+    load_dotenv()
+    
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument('--config')
+    pre_args, _ = pre.parse_known_args(argv)
+    
+    parser = argparse.ArgumentParser(
+        description='YouTube 情感分析器 - Part 2',
+        parents=[pre]
+    )
+    # 数据源
+    parser.add_argument('--source', choices=['csv', 'postgres'], default='csv')
+    parser.add_argument('--data-dir', default='youtube_data', help='CSV数据目录')
+    parser.add_argument('--snapshots', default='latest',
+                        help="按manifest加载的导出: latest, all 或最近N个 (见 ytcatalog)")
+    parser.add_argument('--channel-id', help='只加载包含该频道的导出')
+    parser.add_argument('--db-host', default=os.getenv('DB_HOST') or 'localhost')
+    parser.add_argument('--db-name', default=os.getenv('DB_NAME') or 'youtube_db')
+    parser.add_argument('--db-user', default=os.getenv('DB_USER') or 'postgres')
+    parser.add_argument('--db-password', default=os.getenv('DB_PASSWORD') or 'password')
+    parser.add_argument('--db-port', default=os.getenv('DB_PORT') or '5432')
+    
+    # 阶段
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"逗号分隔的阶段 (可选: {', '.join(STAGES)})")
+    parser.add_argument('--skip-plots', action='store_true', help='跳过可视化 (最耗时的阶段)')
+    
+    # 评分器
+    parser.add_argument('--comment-scorers', default=','.join(DEFAULT_SCORERS['comments']),
+                        help=f"评论使用的评分器 (可选: {', '.join(SCORERS)})")
+    parser.add_argument('--title-scorers', default=','.join(DEFAULT_SCORERS['titles']))
+    parser.add_argument('--description-scorers', default=','.join(DEFAULT_SCORERS['descriptions']))
+    parser.add_argument('--no-language-detection', action='store_true',
+                        help='不识别评论语言, 所有评论都交给评分器')
+    parser.add_argument('--dedup', action='store_true',
+                        help='近似重复评论聚类, 每个簇只评分一次')
+    parser.add_argument('--rollup-dir',
+                        help='增量汇总表目录: 只评分新评论, 统计报告和时间序列图读取汇总表')
+    parser.add_argument('--agreement-report', action='store_true',
+                        help='输出 lexicon 与 VADER 的一致性报告')
+    parser.add_argument('--topics', type=int, default=0,
+                        help='评论主题聚类的主题数 (0 表示不做; 使用已有 --topic-model 时以模型为准)')
+    parser.add_argument('--topic-model', help='主题模型文件 (joblib), 存在时加载并继续训练')
+    parser.add_argument('--approx', type=float, metavar='ERROR',
+                        help='近似模式: 只给样本评分, 样本量使情感占比的置信区间半宽不超过 ERROR (如 0.01)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='近似模式的置信度')
+    parser.add_argument('--approx-stream', action='store_true',
+                        help='近似模式下流式读取评论并抽样 (不把全部评论读入内存), 否则按 视频×日期 分层抽样')
+    parser.add_argument('--bootstrap', type=int, default=200, help='bootstrap 重抽样次数')
+    parser.add_argument('--seed', type=int, default=0, help='抽样随机种子')
+    parser.add_argument('--search-index', help='全文索引目录 (ytsearch.py), 评分后把新评论加入索引')
+    parser.add_argument('--author-index', help='评论者索引目录 (ytauthors.py), 评分后把新评论加入并报告回头评论者')
+    parser.add_argument('--alerts',
+                        help="按发布时间重放评论做趋势检测, 告警写入文件 (.csv/.jsonl) 或 'postgres' (youtube_alerts表)")
+    add_detector_arguments(parser)
+    
+    # 限制
+    parser.add_argument('--max-comments', type=int, default=None, help='最多分析的评论数')
+    
+    # 输出
+    parser.add_argument('--output-dir', default='analysis_results')
+    parser.add_argument('--summary', help="JSON运行摘要输出文件 ('-' 表示stdout)")
+    
+    if pre_args.config:
+        config = load_config(pre_args.config)
+        known = {action.dest for action in parser._actions}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            parser.error(f"{pre_args.config} 中有未知配置项: {', '.join(unknown)}")
+        for key in ('stages', 'comment_scorers', 'title_scorers', 'description_scorers'):
+            if isinstance(config.get(key), list):
+                config[key] = ','.join(config[key])
+        parser.set_defaults(**config)
+    
+    args = parser.parse_args(argv)
+    args.stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    invalid = [s for s in args.stages if s not in STAGES]
+    if invalid:
+        parser.error(f"未知阶段: {', '.join(invalid)}")
+    if args.skip_plots and 'plots' in args.stages:
+        args.stages.remove('plots')
+    if args.approx is not None:
+        if not 0 < args.approx < 0.5:
+            parser.error("--approx 应在 0 和 0.5 之间")
+        if not 0 < args.confidence < 1:
+            parser.error("--confidence 应在 0 和 1 之间")
+        if args.rollup_dir:
+            parser.error("--approx 不能和 --rollup-dir 一起使用 (样本不能写入汇总表)")
+    elif args.approx_stream:
+        parser.error("--approx-stream 需要 --approx")
+    args.snapshots = str(args.snapshots)
+    if args.snapshots not in ('latest', 'all') and not (args.snapshots.isdigit() and int(args.snapshots) > 0):
+        parser.error(f"--snapshots 应为 latest, all 或正整数: {args.snapshots}")
+    
+    args.scorers = {}
+    for target in SCORE_TARGETS:
+        value = getattr(args, f"{target[:-1]}_scorers")
+        names = [s.strip() for s in value.split(',') if s.strip()]
+        invalid = [name for name in names if name not in SCORERS]
+        if invalid:
+            parser.error(f"未知评分器: {', '.join(invalid)}")
+        args.scorers[target] = names
+    return args
+
+
+def write_summary(summary, path):
+    """输出机器可读的运行摘要"""
+    if not path:
+        return
+    text = json.dumps(summary, ensure_ascii=False, indent=2, default=str)
+    if path == '-':
+        print(text)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+def main(argv=None):
+    """主函数, 返回退出码"""
+    try:
+        args = parse_args(argv)
+    except (OSError, ValueError) as e:
+        print(f"❌ 配置错误: {e}")
+        return EXIT_CONFIG_ERROR
+    
+    started = time.time()
+    summary = {
+        'tool': 'ytanalysis',
+        'status': 'failed',
+        'exit_code': EXIT_FAILED,
+        'started_at': datetime.now().isoformat(),
+        'source': args.source,
+        'stages': args.stages,
+        'output_dir': args.output_dir,
+        'timings': {},
+        'failed_stages': {},
+    }
+    
+    def finish(exit_code, status):
+        summary['exit_code'] = exit_code
+        summary['status'] = status
+        summary['elapsed_seconds'] = round(time.time() - started, 3)
+        write_summary(summary, args.summary)
+        return exit_code
+    
+    def run_stage(name, stage):
+        """运行一个阶段并记录耗时; 出错时打印错误, 记入 summary['failed_stages'], 返回 False"""
+        stage_start = time.time()
+        try:
+            stage()
+            return True
+        except Exception as e:
+            summary['failed_stages'][name] = f"{type(e).__name__}: {e}"
+            print(f"❌ 阶段 {name} 失败: {summary['failed_stages'][name]}")
+            traceback.print_exc()
+            return False
+        finally:
+            summary['timings'][name] = round(time.time() - stage_start, 3)
+    
     print("=" * 60)
     print("YouTube 情感分析器 - Part 2")
     print("=" * 60)
     
     analyzer = YouTubeSentimentAnalyzer()
+    analyzer.scorers = args.scorers
+    analyzer.detect_language = not args.no_language_detection
+    analyzer.dedup = args.dedup
+    summary['scorers'] = args.scorers
     
-    # 选择数据源
-    print("\n选择数据源:")
-    print("1. CSV文件")
-    print("2. PostgreSQL数据库")
-    choice = input("请选择 (1/2): ").strip()
-    
-    success = False
-    if choice == '1':
-        data_dir = input("CSV数据目录 (默认: youtube_data): ").strip() or 'youtube_data'
-        success = analyzer.load_from_csv(data_dir)
-    elif choice == '2':
-        print("\nPostgreSQL配置:")
-        db_config = {
-            'host': input("Host (默认: localhost): ").strip() or 'localhost',
-            'database': input("Database (默认: youtube_db): ").strip() or 'youtube_db',
-            'user': input("User (默认: postgres): ").strip() or 'postgres',
-            'password': input("Password: ").strip() or 'password',
-            'port': input("Port (默认: 5432): ").strip() or '5432'
-        }
-        success = analyzer.load_from_postgres(db_config)
+    # 加载数据
+    stage_start = time.time()
+    db_config = {
+        'host': args.db_host,
+        'database': args.db_name,
+        'user': args.db_user,
+        'password': args.db_password,
+        'port': args.db_port
+    }
+    stream = args.approx is not None and args.approx_stream
+    if args.source == 'csv':
+        success = analyzer.load_from_csv(args.data_dir, args.snapshots, args.channel_id, comments=not stream)
+    else:
+        success = analyzer.load_from_postgres(db_config, comments=not stream)
+    summary['timings']['load'] = round(time.time() - stage_start, 3)
     
     if not success:
         print("数据加载失败!")
-        return
+        return finish(EXIT_FAILED, 'load_failed')
+    
+    if args.max_comments is not None and analyzer.df_comments is not None:
+        analyzer.df_comments = analyzer.df_comments.head(args.max_comments).copy()
+    
+    # 近似模式: 只评分一个样本
+    if args.approx is not None:
+        import ytapprox
+        stage_start = time.time()
+        if stream:
+            if args.source == 'csv':
+                chunks = ytapprox.csv_comment_chunks(args.data_dir, args.snapshots, args.channel_id)
+            else:
+                chunks = ytapprox.postgres_comment_chunks(db_config)
+            try:
+                analyzer.df_comments, population = ytapprox.reservoir_sample(
+                    chunks, ytapprox.sample_size(args.approx, args.confidence), seed=args.seed)
+            except Exception as e:
+                print(f"❌ 评论抽样失败: {e}")
+                return finish(EXIT_FAILED, 'load_failed')
+        elif analyzer.df_comments is not None:
+            population = len(analyzer.df_comments)
+            analyzer.df_comments = ytapprox.stratified_sample(
+                analyzer.df_comments, ytapprox.sample_size(args.approx, args.confidence, population), seed=args.seed)
+        else:
+            population = 0
+        sampled = len(analyzer.df_comments) if analyzer.df_comments is not None else 0
+        print(f"✓ 近似模式: 抽样 {sampled:,} / {population:,} 条评论 (误差目标 ±{args.approx:.1%}, "
+              f"{args.confidence:.0%} 置信度)")
+        summary['approx'] = {'error': args.approx, 'population': population, 'sample': sampled}
+        summary['timings']['sample'] = round(time.time() - stage_start, 3)
+    
+    # 数据库来源: 只给没有得分或编辑过 (needs_rescore) 的评论评分
+    if args.source == 'postgres' and analyzer.df_comments is not None:
+        try:
+            analyzer.load_postgres_scores(db_config)
+        except Exception as e:
+            print(f"⚠ 读取数据库中的得分失败, 全部重新评分: {type(e).__name__}: {e}")
+    
+    # 增量汇总: 已经汇总过的评论不再评分
+    if args.rollup_dir:
+        from ytrollup import RollupStore
+        analyzer.rollups = RollupStore(args.rollup_dir).load()
+        if analyzer.df_comments is not None:
+            new = analyzer.rollups.is_new(analyzer.df_comments)
+            print(f"✓ 汇总表已有 {len(analyzer.rollups.seen_ids):,} 条评论, 本次新增 {int(new.sum()):,} 条")
+            # 只给新评论评分, 其它评论沿用上次导出 (或数据库) 的得分; 导出和图表仍然覆盖全部评论
+            if analyzer.score_mask is None:
+                analyzer.score_mask = new.to_numpy()
+                analyzer.previous_scores = f'{args.output_dir}/comments_with_sentiment.csv'
     
-    # 执行分析
-    analyzer.perform_sentiment_analysis()
+    # 执行分析 (之后的阶段都依赖评分, 评分失败时直接结束)
+    if not run_stage('sentiment', analyzer.perform_sentiment_analysis):
+        return finish(EXIT_FAILED, 'stage_failed')
+    
+    if args.source == 'postgres':
+        run_stage('postgres_scores', lambda: summary.update(
+            postgres_scores=analyzer.save_scores_to_postgres(db_config)))
+    
+    if analyzer.rollups is not None:
+        run_stage('rollups', lambda: summary.update(rollup_added=analyzer.update_rollups()))
+    
+    if args.approx is not None:
+        def approx_stage():
+            report = analyzer.approximate_statistics(summary['approx']['population'], args.confidence,
+                                                     args.bootstrap, args.seed)
+            if report is not None:
+                summary['approx'].update(report)
+        run_stage('approx', approx_stage)
+    
+    if args.topics or args.topic_model:
+        run_stage('topics', lambda: summary.update(
+            topics=analyzer.extract_topics(args.topics or 20, args.topic_model)))
+    
+    if args.search_index and analyzer.df_comments is not None:
+        def search_stage():
+            from ytsearch import SearchIndex
+            index = SearchIndex(args.search_index)
+            summary['search_indexed'] = index.add(analyzer.df_comments, analyzer._col('compound'))
+            print(f"✓ 全文索引新增 {summary['search_indexed']:,} 条评论, 共 {len(index):,} 条: {args.search_index}")
+        run_stage('search_index', search_stage)
+    
+    if args.author_index and analyzer.df_comments is not None:
+        def authors_stage():
+            from ytauthors import AuthorIndex
+            authors = AuthorIndex(args.author_index).load()
+            added = authors.update(analyzer.df_comments, analyzer._col('compound'))
+            summary['authors'] = {'added': added, 'authors': len(authors)}
+            if len(authors):
+                loyal = authors.loyal_share()
+                top = authors.top_commenters(5)
+                summary['authors'].update(loyal_share=loyal['loyal_share'], loyal_authors=loyal['loyal_authors'],
+                                          top_commenters=[{'name': row['name'], 'comments': int(row['comments']),
+                                                           'videos': int(row['videos'])}
+                                                          for _, row in top.iterrows()])
+                print(f"✓ 评论者索引新增 {added:,} 条评论, 共 {len(authors):,} 个评论者; "
+                      f"评论过至少2个视频的评论者贡献 {loyal['loyal_share']:.1%} 的评论")
+        run_stage('authors', authors_stage)
+    
+    if args.alerts and analyzer.df_comments is not None \
+            and analyzer._col('compound') in analyzer.df_comments.columns:
+        def alerts_stage():
+            from yttrending import detector_from_args, open_alerts
+            detector = detector_from_args(args)
+            alerts = open_alerts(args.alerts, db_config, detector.bucket_seconds)
+            found = detector.observe_frame(analyzer.df_comments, analyzer._col('compound')) + detector.flush()
+            alerts.write(found)
+            summary['alerts'] = {'target': alerts.close(), 'count': alerts.written, 'duplicates': alerts.duplicates}
+            print(f"✓ 趋势检测: {len(found)} 条告警, 新写入 {alerts.written} 条 -> {summary['alerts']['target']}")
+        run_stage('alerts', alerts_stage)
+    
+    if args.agreement_report:
+        run_stage('agreement', lambda: summary.update(
+            agreement=analyzer.scorer_agreement_report('lexicon', 'vader')))
     
     # 生成统计报告
-    analyzer.generate_statistics()
+    if 'stats' in args.stages:
+        run_stage('stats', lambda: summary.update(stats=analyzer.generate_statistics()))
     
     # 生成可视化
-    output_dir = input("\n输出目录 (默认: analysis_results): ").strip() or 'analysis_results'
-    analyzer.visualize_results(output_dir)
+    if 'plots' in args.stages:
+        run_stage('plots', lambda: analyzer.visualize_results(args.output_dir))
     
     # 导出结果
-    analyzer.export_results(output_dir)
+    if 'export' in args.stages:
+        run_stage('export', lambda: analyzer.export_results(args.output_dir))
+    
+    if summary['failed_stages']:
+        print(f"\n❌ 失败的阶段: {', '.join(summary['failed_stages'])}")
+        return finish(EXIT_FAILED, 'stage_failed')
     
     print("\n" + "=" * 60)
     print("分析完成!")
     print("=" * 60)
+    return finish(EXIT_OK, 'ok')
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
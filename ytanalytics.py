@@ -0,0 +1,199 @@
+"""
+Vectorized engagement and ranking analytics
+
+一次 NumPy 计算得到每个视频的:
+    engagement_rate                 (点赞 + 评论) / 观看 * 100
+    like_rate / comment_rate        点赞 / 观看, 评论 / 观看 (%)
+    sentiment_weighted_engagement   engagement_rate * (1 + 评论平均compound), 无评分时等于互动率
+    engagement_percentile           在所属频道内的百分位 (0-100, 并列取平均名次)
+    engagement_zscore               相对同频道之前 window 个视频 (按发布时间) 的z分数
+
+观看数为0或缺失时比率为 NaN (不会出现 inf). 排名用 argpartition, 不对全部视频排序.
+duration_bucket_stats 按视频时长 (duration_seconds) 分桶汇总互动率和评论情感.
+"""
+
+import numpy as np
+import pandas as pd
+
+METRIC_COLUMNS = ['engagement_rate', 'like_rate', 'comment_rate', 'sentiment_weighted_engagement',
+                  'engagement_percentile', 'engagement_zscore']
+
+# 时长分桶 (秒, 左闭右开): Shorts, 短视频, 常规, 长视频, 超长 (直播回放等)
+DURATION_BUCKETS = [0, 60, 240, 1200, 3600, np.inf]
+DURATION_LABELS = ['<1m', '1-4m', '4-20m', '20-60m', '60m+']
+
+
+def safe_divide(numerator, denominator, scale=1.0):
+    """numerator / denominator * scale, 分母 <= 0 或非有限值时为 NaN"""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    valid = np.isfinite(numerator) & np.isfinite(denominator) & (denominator > 0)
+    result = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator * scale, denominator, out=result, where=valid)
+    return result
+
+
+def group_percentiles(values, groups):
+    """每个值在所属组内的百分位 (0-100), 并列取平均名次, NaN 保持 NaN
+
+    groups 为非负整数组编号 (如 pd.factorize 的结果)
+    """
+    values = np.asarray(values, dtype=float)
+    groups = np.asarray(groups, dtype=np.int64)
+    result = np.full(len(values), np.nan)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return result
+
+    # 组号和值的名次合成一个整数键, 排序一次后用 searchsorted 找到组起点和并列区间
+    _, ranks = np.unique(values[valid], return_inverse=True)
+    width = np.int64(ranks.max() + 1)
+    keys = groups[valid] * width + ranks
+    sorted_keys = np.sort(keys)
+    left = np.searchsorted(sorted_keys, keys, 'left')
+    right = np.searchsorted(sorted_keys, keys, 'right')
+    start = np.searchsorted(sorted_keys, groups[valid] * width, 'left')
+    sizes = np.bincount(groups[valid])[groups[valid]]
+
+    average_rank = (left + right - 1) / 2 - start
+    # 组内只有一个视频时记为50
+    result[valid] = np.where(sizes > 1, safe_divide(average_rank, sizes - 1, 100.0), 50.0)
+    return result
+
+
+def rolling_zscores(values, groups, order, window=10, min_periods=3):
+    """相对同组前 window 个值 (按 order 排序) 的z分数
+
+    用累计和计算每个窗口的均值和标准差, 不逐组循环
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if n == 0:
+        return result
+    groups = np.asarray(groups, dtype=np.int64)
+    sort = np.lexsort((np.asarray(order), groups))
+    x = values[sort]
+    g = groups[sort]
+    valid = ~np.isnan(x)
+    filled = np.where(valid, x, 0.0)
+
+    # 前缀和, 下标 i 表示前 i 个元素之和
+    csum = np.concatenate([[0.0], np.cumsum(filled)])
+    csq = np.concatenate([[0.0], np.cumsum(filled * filled)])
+    ccount = np.concatenate([[0], np.cumsum(valid)])
+
+    positions = np.arange(n)
+    group_start = np.searchsorted(g, g, 'left')
+    window_start = np.maximum(group_start, positions - window)
+    count = ccount[positions] - ccount[window_start]
+    total = csum[positions] - csum[window_start]
+    squares = csq[positions] - csq[window_start]
+
+    mean = safe_divide(total, count)
+    variance = safe_divide(squares, count) - mean * mean
+    std = np.sqrt(np.clip(variance * safe_divide(count, count - 1), 0, None))
+    z = safe_divide(x - mean, std)
+    z[(count < min_periods) | ~valid] = np.nan
+    result[sort] = z
+    return result
+
+
+def top_k(values, k, largest=True):
+    """前k个值的位置 (已排序), 忽略 NaN; 用 argpartition, O(n + k log k)"""
+    values = np.asarray(values, dtype=float)
+    candidates = np.nonzero(~np.isnan(values))[0]
+    if largest:
+        keyed = -values[candidates]
+    else:
+        keyed = values[candidates]
+    if k < len(candidates):
+        part = np.argpartition(keyed, k - 1)[:k]
+    else:
+        part = np.arange(len(candidates))
+    return candidates[part[np.argsort(keyed[part], kind='stable')]]
+
+
+def top_rows(df, column, k=10, largest=True):
+    """df 中 column 最大 (或最小) 的 k 行"""
+    if column not in df.columns or len(df) == 0:
+        return df.iloc[:0]
+    return df.iloc[top_k(pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float), k, largest)]
+
+
+def video_metrics(df_videos, video_sentiment=None, window=10):
+    """计算每个视频的互动和排名指标, 返回与 df_videos 同索引的 DataFrame (列见 METRIC_COLUMNS)
+
+    video_sentiment: video_id -> 评论平均 compound 的 Series (可选)
+    """
+    views = pd.to_numeric(df_videos['view_count'], errors='coerce').to_numpy(dtype=float)
+    likes = pd.to_numeric(df_videos['like_count'], errors='coerce').to_numpy(dtype=float)
+    comments = pd.to_numeric(df_videos['comment_count'], errors='coerce').to_numpy(dtype=float)
+
+    engagement = safe_divide(likes + comments, views, 100.0)
+    if video_sentiment is not None:
+        compound = df_videos['video_id'].map(video_sentiment).to_numpy(dtype=float)
+        compound = np.where(np.isnan(compound), 0.0, compound)
+    else:
+        compound = np.zeros(len(df_videos))
+
+    if 'channel_id' in df_videos.columns:
+        groups, _ = pd.factorize(df_videos['channel_id'].astype(str))
+    else:
+        groups = np.zeros(len(df_videos), dtype=np.int64)
+    if 'published_at' in df_videos.columns:
+        order = pd.to_datetime(df_videos['published_at'], utc=True, errors='coerce')
+        order = order.fillna(pd.Timestamp(0, tz='UTC')).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    else:
+        order = np.arange(len(df_videos))
+
+    return pd.DataFrame({
+        'engagement_rate': engagement,
+        'like_rate': safe_divide(likes, views, 100.0),
+        'comment_rate': safe_divide(comments, views, 100.0),
+        'sentiment_weighted_engagement': engagement * (1.0 + compound),
+        'engagement_percentile': group_percentiles(engagement, groups),
+        'engagement_zscore': rolling_zscores(engagement, groups, order, window=window),
+    }, index=df_videos.index)
+
+
+def channel_summary(df_videos):
+    """每个频道的视频数、观看数和互动率 (需要先有 video_metrics 的列)"""
+    channel = df_videos['channel_id'] if 'channel_id' in df_videos.columns else pd.Series('unknown', index=df_videos.index)
+    grouped = df_videos.groupby(channel.astype(str))
+    summary = grouped.agg(videos=('video_id', 'size'), view_count=('view_count', 'sum'),
+                          like_count=('like_count', 'sum'), comment_count=('comment_count', 'sum'),
+                          median_engagement_rate=('engagement_rate', 'median'))
+    summary['engagement_rate'] = safe_divide(summary['like_count'] + summary['comment_count'],
+                                             summary['view_count'], 100.0)
+    return summary
+
+
+def duration_bucket_stats(df_videos, video_sentiment=None):
+    """按时长分桶的视频数、观看中位数、平均互动率和评论平均compound, 以桶名为索引
+
+    需要 duration_seconds 列和 video_metrics 的比率列; 时长为0 (直播/预告, P0D) 或缺失的视频不计入.
+    video_sentiment: video_id -> 评论平均 compound 的 Series (可选), mean_compound 为各视频平均值的平均
+    """
+    seconds = pd.to_numeric(df_videos['duration_seconds'], errors='coerce').astype(float)
+    buckets = pd.cut(seconds.where(seconds > 0), DURATION_BUCKETS, right=False, labels=DURATION_LABELS)
+    frame = pd.DataFrame({
+        'bucket': buckets,
+        'duration_seconds': seconds,
+        'view_count': pd.to_numeric(df_videos['view_count'], errors='coerce'),
+        'engagement_rate': df_videos['engagement_rate'],
+        'like_rate': df_videos['like_rate'],
+        'comment_rate': df_videos['comment_rate'],
+        'mean_compound': (df_videos['video_id'].map(video_sentiment) if video_sentiment is not None
+                          else np.nan),
+    })
+    return frame.groupby('bucket', observed=False).agg(
+        videos=('duration_seconds', 'size'),
+        median_duration=('duration_seconds', 'median'),
+        median_views=('view_count', 'median'),
+        engagement_rate=('engagement_rate', 'mean'),
+        median_engagement_rate=('engagement_rate', 'median'),
+        like_rate=('like_rate', 'mean'),
+        comment_rate=('comment_rate', 'mean'),
+        mean_compound=('mean_compound', 'mean'),
+    )
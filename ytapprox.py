@@ -0,0 +1,181 @@
+"""
+Approximate analysis: sampling and bootstrap confidence intervals
+
+只给评论的一个样本打分, 报告情感占比、平均compound和视频排名的置信区间:
+    sample_size          由误差目标 (占比的置信区间半宽, 如 0.01 = ±1个百分点) 计算样本量,
+                         有总数时做有限总体修正
+    stratified_sample    按 视频 × 发布日期 分层, 按比例分配样本 (随机取整, 每条评论入样概率相同)
+    reservoir_sample     流式读取 CSV / PostgreSQL 时抽样: 每条评论按 comment_id 的哈希排序,
+                         保留最小的 n 个, 多次导出中的同一条评论只算一次
+    bootstrap_means      多个均值 (占比是指示变量的均值) 的 bootstrap 百分位区间
+"""
+
+import glob
+import math
+import os
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from ytrecords import typed_columns
+
+SENTIMENTS = ['positive', 'neutral', 'negative']
+
+
+def sample_size(error, confidence=0.95, population=None):
+    """占比估计达到 ±error (置信度 confidence) 需要的样本量 (按最坏情况 p=0.5)"""
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    n = math.ceil(z * z * 0.25 / (error * error))
+    if population is not None:
+        n = min(population, math.ceil(n / (1 + (n - 1) / max(population, 1))))
+    return n
+
+
+def comment_strata(df):
+    """分层键: video_id 和发布日期"""
+    published = df['published_at']
+    if isinstance(published.dtype, pd.DatetimeTZDtype):
+        return [df['video_id'].astype(str), published.dt.floor('D')]
+    return [df['video_id'].astype(str), published.astype(str).str[:10]]
+
+
+def stratified_sample(df, n, strata=None, seed=0):
+    """按层比例分配抽取 n 行 (期望值), n >= len(df) 时返回全部"""
+    if n >= len(df):
+        return df.reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+    groups = df.groupby(strata if strata is not None else comment_strata(df), sort=False,
+                        dropna=False).ngroup().to_numpy()
+    sizes = np.bincount(groups)
+    quota = sizes * (n / len(df))
+    # 随机取整: 期望样本量等于 quota, 每条评论的入样概率都是 n / N
+    allocation = np.floor(quota).astype(np.int64) + (rng.random(len(sizes)) < quota % 1)
+
+    order = rng.permutation(len(df))
+    shuffled = groups[order]
+    rank = pd.Series(shuffled).groupby(shuffled).cumcount().to_numpy()
+    chosen = order[rank < allocation[shuffled]]
+    return df.iloc[np.sort(chosen)].reset_index(drop=True)
+
+
+def reservoir_sample(chunks, n, key='comment_id', seed=0):
+    """从 DataFrame 块的流中抽取 n 个不同 key 的行, 返回 (样本, 读取的行数)
+
+    每行的排序键是 key 的64位哈希, 保留最小的 n 个, 内存只占 n + 一个块
+    """
+    hash_key = f'{seed:016d}'[-16:]
+    reservoir = None
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        chunk = chunk.assign(_sample_key=pd.util.hash_pandas_object(
+            chunk[key].astype(str), index=False, hash_key=hash_key).to_numpy())
+        pool = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+        if 'collected_at' in pool.columns:
+            pool = pool.sort_values('collected_at', kind='stable')
+        pool = pool.drop_duplicates(key, keep='last')
+        reservoir = pool.nsmallest(n, '_sample_key')
+    if reservoir is None:
+        return None, 0
+    return reservoir.drop(columns='_sample_key').reset_index(drop=True), rows
+
+
+def csv_comment_chunks(data_dir, snapshots='latest', channel_id=None, chunksize=200000):
+    """按块读取评论CSV (与 ytanalysis 一样按manifest选择导出)"""
+    import ytcatalog
+    if ytcatalog.list_manifests(data_dir, channel_id):
+        # 只选有评论文件的导出, 与 ytanalysis 一致
+        manifests = ytcatalog.resolve_snapshots(data_dir, snapshots, channel_id, kind='comment')
+        if not manifests:
+            print(f"⚠ {data_dir} 的导出里没有评论文件")
+        entries = [(m['files']['comment'], m.get('schema_version', 1)) for m in manifests]
+    else:
+        entries = [({'file': 'comment_data.csv'}, None)]
+    for entry, schema_version in entries:
+        path = os.path.join(data_dir, entry['file'])
+        if entry.get('format') == 'parquet':
+            chunks = (pd.read_parquet(part).astype({'comment_id': str, 'video_id': str})
+                      for part in sorted(glob.glob(os.path.join(glob.escape(path), 'part-*.parquet'))))
+        elif os.path.exists(path):
+            chunks = pd.read_csv(path, dtype={'comment_id': str, 'video_id': str}, chunksize=chunksize)
+        else:
+            print(f"⚠ 未找到评论文件: {path}")
+            continue
+        for chunk in chunks:
+            yield typed_columns(chunk) if schema_version is None else ytcatalog.typed_export(chunk, schema_version)
+
+
+def postgres_comment_chunks(db_config, chunksize=200000):
+    """用服务器端游标按块读取 youtube_comments"""
+    import psycopg2
+    conn = psycopg2.connect(**db_config)
+    try:
+        cursor = conn.cursor(name='ytapprox_comments')
+        cursor.itersize = chunksize
+        cursor.execute("SELECT * FROM youtube_comments")
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            yield typed_columns(pd.DataFrame(rows, columns=[column[0] for column in cursor.description]))
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def bootstrap_means(values, n_boot=200, confidence=0.95, seed=0, batch=50):
+    """values: (n, k) 矩阵, 返回每列均值的 (估计, 下限, 上限)"""
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    estimate = values.mean(axis=0)
+    if n < 2:
+        return estimate, estimate.copy(), estimate.copy()
+    rng = np.random.default_rng(seed)
+    means = []
+    for start in range(0, n_boot, batch):
+        size = min(batch, n_boot - start)
+        # 每次重抽样用各行被抽中的次数表示, 均值就是一次矩阵乘法
+        counts = rng.multinomial(n, np.full(n, 1.0 / n), size=size)
+        means.append(counts @ values / n)
+    means = np.concatenate(means)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(means, [tail, 100 - tail], axis=0)
+    return estimate, low, high
+
+
+def _interval(estimate, low, high):
+    return {'estimate': round(float(estimate), 4), 'low': round(float(low), 4), 'high': round(float(high), 4)}
+
+
+def approximate_report(df, compound_column, sentiment_column, population=None, confidence=0.95,
+                       n_boot=200, seed=0, top=5, min_video_comments=5):
+    """样本上的情感占比、平均compound和视频排名, 都带 bootstrap 置信区间"""
+    scored = df[df[compound_column].notna()]
+    compound = scored[compound_column].to_numpy(dtype=float)
+    labels = scored[sentiment_column].to_numpy()
+    matrix = np.column_stack([labels == s for s in SENTIMENTS] + [compound])
+    estimate, low, high = bootstrap_means(matrix, n_boot, confidence, seed)
+
+    report = {
+        'population': population,
+        'sample': len(df),
+        'scored': len(scored),
+        'confidence': confidence,
+        'shares': {s: _interval(estimate[i], low[i], high[i]) for i, s in enumerate(SENTIMENTS)},
+        'mean_compound': _interval(estimate[-1], low[-1], high[-1]),
+    }
+
+    per_video = scored.groupby('video_id')[compound_column].agg(['mean', 'size'])
+    per_video = per_video[per_video['size'] >= min_video_comments]
+    for name, largest in (('top_videos', True), ('bottom_videos', False)):
+        ranked = per_video.nlargest(top, 'mean') if largest else per_video.nsmallest(top, 'mean')
+        rows = []
+        for video_id, row in ranked.iterrows():
+            values = scored.loc[scored['video_id'] == video_id, compound_column].to_numpy(dtype=float)
+            mean, lo, hi = bootstrap_means(values, n_boot, confidence, seed)
+            rows.append({'video_id': video_id, 'comments': int(row['size']), **_interval(mean[0], lo[0], hi[0])})
+        report[name] = rows
+    return report
@@ -0,0 +1,233 @@
+"""
+Commenter (author) index
+
+每个评论者 (authorDisplayName 的64位哈希) 一行汇总, 每次只把新评论用一次 groupby 加进去:
+    comments / scored                       评论数, 有得分的评论数
+    compound_sum / compound_sq_sum          compound 之和与平方和
+    t_sum / t_sq_sum / tx_sum               发布时间 (天) 的和、平方和、与compound乘积之和,
+                                            用来算 compound 随时间的回归斜率 (情感漂移)
+    first_seen / last_seen                  第一条 / 最后一条评论的发布时间 (epoch秒)
+    videos                                  评论过的不同视频数
+查询 (前N评论者, 回头评论者占比, 情感漂移) 只读汇总表, 不需要重新扫描评论.
+
+目录结构:
+    <path>/authors.csv          每个评论者一行 (author_key 为索引, name 为最近一次的显示名)
+    <path>/author_videos.csv    (author_key, video_id) -> 评论数
+    <path>/comment_ids.csv      已经加入的 comment_id
+
+usage:
+python ytauthors.py build author_index analysis_results/comments_with_sentiment.csv
+python ytauthors.py report author_index --min-videos 3
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# 固定的哈希密钥, 同一个名字每次得到同一个 author_key
+HASH_KEY = 'ytauthors-v1-key'
+# 时间按天计, 以2005-01-01为原点 (YouTube 之前没有评论), 平方和不会损失精度
+EPOCH = pd.Timestamp('2005-01-01', tz='UTC').value // 10 ** 9
+SUM_COLUMNS = ['comments', 'scored', 'compound_sum', 'compound_sq_sum', 't_sum', 't_sq_sum', 'tx_sum']
+
+
+def author_keys(names):
+    """显示名 -> int64 哈希"""
+    return pd.util.hash_pandas_object(pd.Series(names, dtype=object).fillna('').astype(str),
+                                      index=False, hash_key=HASH_KEY).to_numpy().view(np.int64)
+
+
+class AuthorIndex:
+    def __init__(self, path):
+        self.path = path
+        self.authors = None
+        self.author_videos = None
+        self.seen_ids = pd.Index([], dtype=object)
+
+    def __len__(self):
+        return 0 if self.authors is None else len(self.authors)
+
+    def load(self):
+        """读取已有的索引, 目录不存在时为空"""
+        authors_file = os.path.join(self.path, 'authors.csv')
+        if os.path.exists(authors_file):
+            self.authors = pd.read_csv(authors_file, index_col='author_key', dtype={'name': str})
+            self.author_videos = pd.read_csv(os.path.join(self.path, 'author_videos.csv'),
+                                             index_col=['author_key', 'video_id'], dtype={'video_id': str})
+        ids_file = os.path.join(self.path, 'comment_ids.csv')
+        if os.path.exists(ids_file):
+            self.seen_ids = pd.Index(pd.read_csv(ids_file, dtype=str)['comment_id'])
+        return self
+
+    def save(self, new_ids=None):
+        """保存汇总表; comment_ids.csv 只追加新的id"""
+        os.makedirs(self.path, exist_ok=True)
+        if self.authors is not None:
+            self.authors.to_csv(os.path.join(self.path, 'authors.csv'))
+            self.author_videos.to_csv(os.path.join(self.path, 'author_videos.csv'))
+        ids_file = os.path.join(self.path, 'comment_ids.csv')
+        if new_ids is not None and os.path.exists(ids_file):
+            pd.DataFrame({'comment_id': new_ids}).to_csv(ids_file, mode='a', header=False, index=False)
+        else:
+            pd.DataFrame({'comment_id': self.seen_ids}).to_csv(ids_file, index=False)
+
+    def update(self, df_comments, compound_column='vader_compound'):
+        """把新评论加进索引, 返回新增的评论数"""
+        new = df_comments[~df_comments['comment_id'].astype(str).isin(self.seen_ids)]
+        new = new.drop_duplicates('comment_id')
+        if len(new) == 0:
+            return 0
+
+        published = pd.to_datetime(new['published_at'], utc=True, errors='coerce', format='ISO8601')
+        seconds = published.to_numpy(dtype='datetime64[ns]').view(np.int64) // 10 ** 9
+        valid_time = published.notna().to_numpy()
+        days = np.where(valid_time, (seconds - EPOCH) / 86400.0, 0.0)
+        if compound_column in new.columns:
+            compound = pd.to_numeric(new[compound_column], errors='coerce').to_numpy(dtype=float)
+        else:
+            compound = np.full(len(new), np.nan)
+        # 回归只用有得分且有发布时间的评论
+        scored = ~np.isnan(compound) & valid_time
+        x = np.where(scored, compound, 0.0)
+        t = np.where(scored, days, 0.0)
+
+        keys = author_keys(new['author'].to_numpy())
+        rows = pd.DataFrame({
+            'author_key': keys,
+            'name': new['author'].fillna('').astype(str).to_numpy(),
+            'comments': 1,
+            'scored': scored.astype(np.int64),
+            'compound_sum': x,
+            'compound_sq_sum': x * x,
+            't_sum': t,
+            't_sq_sum': t * t,
+            'tx_sum': t * x,
+            'first_seen': np.where(valid_time, seconds, np.iinfo(np.int64).max),
+            'last_seen': np.where(valid_time, seconds, np.iinfo(np.int64).min),
+        })
+        delta = rows.groupby('author_key').agg(
+            name=('name', 'last'), **{c: (c, 'sum') for c in SUM_COLUMNS},
+            first_seen=('first_seen', 'min'), last_seen=('last_seen', 'max'))
+        pairs = pd.DataFrame({'author_key': keys, 'video_id': new['video_id'].astype(str).to_numpy()}) \
+            .groupby(['author_key', 'video_id']).size().rename('comments').to_frame()
+
+        if self.authors is None:
+            merged = delta
+            self.author_videos = pairs
+        else:
+            old = self.authors.drop(columns='videos')
+            merged = pd.concat([old, delta]).groupby(level=0, sort=False).agg(
+                {'name': 'last', **{c: 'sum' for c in SUM_COLUMNS}, 'first_seen': 'min', 'last_seen': 'max'})
+            self.author_videos = self.author_videos.add(pairs, fill_value=0).astype(np.int64)
+        merged['videos'] = self.author_videos.groupby(level='author_key').size().reindex(merged.index).to_numpy()
+        self.authors = merged
+
+        new_ids = pd.Index(new['comment_id'].astype(str))
+        self.seen_ids = self.seen_ids.append(new_ids)
+        self.save(new_ids)
+        return len(new)
+
+    def profiles(self):
+        """每个评论者的平均得分、首末评论时间和情感漂移
+
+        drift_per_30d 为 compound 对时间回归的斜率 (每30天), drift_t 为斜率的t统计量
+        """
+        table = self.authors.copy()
+        n = table['scored'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = table['compound_sum'].to_numpy() / n
+            s_tt = table['t_sq_sum'].to_numpy() - table['t_sum'].to_numpy() ** 2 / n
+            s_tx = table['tx_sum'].to_numpy() - table['t_sum'].to_numpy() * mean
+            s_xx = table['compound_sq_sum'].to_numpy() - n * mean * mean
+            slope = s_tx / s_tt
+            residual = np.clip(s_xx - slope * s_tx, 0, None) / (n - 2)
+            t_stat = slope / np.sqrt(residual / s_tt)
+        valid = (n > 2) & (s_tt > 1e-9)
+        table['mean_compound'] = np.where(n > 0, mean, np.nan)
+        table['drift_per_30d'] = np.where(valid, slope * 30, np.nan)
+        table['drift_t'] = np.where(valid & np.isfinite(t_stat), t_stat, np.nan)
+        for column in ('first_seen', 'last_seen'):
+            seconds = table[column].where(table[column].abs() < np.iinfo(np.int64).max)
+            table[column] = pd.to_datetime(seconds, unit='s', utc=True)
+        table['active_days'] = (table['last_seen'] - table['first_seen']).dt.total_seconds() / 86400
+        return table
+
+    def top_commenters(self, k=10):
+        from ytanalytics import top_rows
+        return top_rows(self.profiles(), 'comments', k)
+
+    def loyal_share(self, min_videos=2, video_ids=None):
+        """评论过至少 min_videos 个视频的评论者, 及其评论占全部评论的比例
+
+        video_ids 给定时只看这些视频 (如一个频道的视频)
+        """
+        pairs = self.author_videos
+        if video_ids is not None:
+            pairs = pairs[pairs.index.get_level_values('video_id').isin(pd.Index(video_ids).astype(str))]
+        per_author = pairs.groupby(level='author_key')['comments'].agg(['size', 'sum'])
+        loyal = per_author['size'] >= min_videos
+        total = int(per_author['sum'].sum())
+        return {
+            'min_videos': min_videos,
+            'authors': int(len(per_author)),
+            'loyal_authors': int(loyal.sum()),
+            'comments': total,
+            'loyal_comments': int(per_author.loc[loyal, 'sum'].sum()),
+            'loyal_share': round(float(per_author.loc[loyal, 'sum'].sum() / total), 4) if total else None,
+        }
+
+    def sentiment_drift(self, k=10, min_comments=5, min_days=7):
+        """漂移最显著 (按t统计量) 的评论者: (变得更积极的, 变得更消极的)"""
+        from ytanalytics import top_rows
+        table = self.profiles()
+        table = table[(table['scored'] >= min_comments) & (table['active_days'] >= min_days)]
+        return top_rows(table, 'drift_t', k), top_rows(table, 'drift_t', k, largest=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='YouTube commenter index')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='把评论CSV加入索引 (已加入的评论会跳过)')
+    build.add_argument('index')
+    build.add_argument('comments', nargs='+')
+    build.add_argument('--compound-column', default='vader_compound')
+    report = sub.add_parser('report', help='前N评论者, 回头评论者占比, 情感漂移')
+    report.add_argument('index')
+    report.add_argument('--top', type=int, default=10)
+    report.add_argument('--min-videos', type=int, default=2, help='评论过至少这么多视频算回头评论者')
+    report.add_argument('--min-comments', type=int, default=5, help='计算情感漂移至少需要的评论数')
+    args = parser.parse_args(argv)
+
+    index = AuthorIndex(args.index).load()
+    if args.command == 'build':
+        added = 0
+        for path in args.comments:
+            for chunk in pd.read_csv(path, dtype={'comment_id': str, 'video_id': str, 'author': str},
+                                     chunksize=500000):
+                added += index.update(chunk, args.compound_column)
+        print(f"✓ 新增 {added:,} 条评论, 共 {len(index):,} 个评论者")
+        return 0
+
+    if index.authors is None:
+        print(f"✗ 索引为空: {args.index}")
+        return 1
+    print(f"评论者: {len(index):,}")
+    print(f"\n评论最多的 {args.top} 个评论者:")
+    for key, row in index.top_commenters(args.top).iterrows():
+        print(f"  {row['comments']:6,} 条评论  {row['videos']:4} 个视频  {row['mean_compound']:+.3f}  {row['name']}")
+    loyal = index.loyal_share(args.min_videos)
+    print(f"\n评论过至少 {args.min_videos} 个视频的评论者: {loyal['loyal_authors']:,} / {loyal['authors']:,}, "
+          f"评论占比 {loyal['loyal_share']:.1%}")
+    rising, falling = index.sentiment_drift(args.top, args.min_comments)
+    for title, table in (('变得更积极', rising), ('变得更消极', falling)):
+        print(f"\n{title} (每30天compound变化):")
+        for key, row in table.iterrows():
+            print(f"  {row['drift_per_30d']:+.3f} (t={row['drift_t']:+.1f})  {row['scored']:5} 条评论  {row['name']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+"""
+Dataset catalog for collector exports
+
+ytcoll.export_to_csv 每次导出都写一个 manifest_<timestamp>.json, 记录这次导出的文件、行数、
+schema版本、频道和时间范围; ytpipeline 结束后把评分过的评论文件补进同一个manifest. 分析器通过manifest找到最新 (或全部) 的导出, 不需要手工改文件名.
+
+usage:
+python ytcatalog.py list youtube_data
+python ytcatalog.py index youtube_data      # 给没有manifest的旧导出补上manifest
+python ytcatalog.py prune youtube_data --keep 5
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from ytrecords import typed_columns
+
+# 1: 时间是API原样字符串, collected_at 为不带时区的本地时间, 没有 duration_seconds
+# 2: 时间为UTC ISO字符串, 视频有 duration_seconds (ytrecords.typed_columns)
+SCHEMA_VERSION = 2
+
+# 数据类型 -> (文件名前缀, 主键)
+DATASETS = {
+    'channel': ('channel_data', 'channel_id'),
+    'video': ('video_data', 'video_id'),
+    'comment': ('comment_data', 'comment_id'),
+}
+
+# 旧导出的时间戳只到秒, new_timestamp 生成的带微秒
+_TIMESTAMPED = re.compile(r'^(channel_data|video_data|comment_data)_(\d{8}_\d{6}(?:_\d{6})?)\.csv$')
+_WITH_OFFSET = r'(?:Z|[+-]\d\d:?\d\d)$'
+
+
+def _time_range(df, column):
+    if df is None or column not in df.columns or len(df) == 0:
+        return None
+    values = pd.to_datetime(df[column], utc=True, errors='coerce').dropna()
+    if len(values) == 0:
+        return None
+    return [values.min().isoformat(), values.max().isoformat()]
+
+
+def _local_to_utc(values):
+    """不带时区的本地时间字符串 -> datetime64[ns, UTC] (按各自日期的本地时区和夏令时换算)"""
+    naive = pd.to_datetime(pd.Series(values), errors='coerce', format='ISO8601')
+    if isinstance(naive.dtype, pd.DatetimeTZDtype):
+        return naive.dt.tz_convert('UTC')
+    # 每个API响应一个值, 只换算不同的值
+    codes, uniques = pd.factorize(naive)
+    converted = pd.to_datetime([ts.to_pydatetime().astimezone(timezone.utc) for ts in uniques], utc=True)
+    return pd.Series(converted.array.take(codes, allow_fill=True), index=naive.index)
+
+
+def typed_export(df, schema_version):
+    """按导出的schema版本解析时间和时长列 (原地修改并返回 df)"""
+    if schema_version < 2 and 'collected_at' in df.columns \
+            and not isinstance(df['collected_at'].dtype, pd.DatetimeTZDtype):
+        df['collected_at'] = _local_to_utc(df['collected_at'])
+    return typed_columns(df)
+
+
+def guess_schema_version(frames):
+    """没有manifest的导出: collected_at 带时区的是版本2, 否则是版本1"""
+    for df in frames.values():
+        if df is not None and 'collected_at' in df.columns:
+            values = df['collected_at'].dropna().astype(str)
+            if len(values):
+                return 2 if values.str.contains(_WITH_OFFSET).all() else 1
+    return 1
+
+
+def new_timestamp(output_dir):
+    """新导出的时间戳 (本地时间, 精确到微秒), 目录里已有同名导出时重新生成"""
+    while True:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        if not (os.path.isdir(output_dir) and glob.glob(os.path.join(glob.escape(output_dir), f'*_{timestamp}*'))):
+            return timestamp
+
+
+def write_manifest(output_dir, timestamp, files, frames, schema_version=SCHEMA_VERSION):
+    """写 manifest_<timestamp>.json
+
+    files: 数据类型 -> 文件路径, frames: 数据类型 -> 导出的DataFrame
+    """
+    entries = {}
+    for kind, path in files.items():
+        if not path:
+            continue
+        df = frames.get(kind)
+        entries[kind] = {
+            'file': os.path.basename(path),
+            'rows': int(len(df)) if df is not None else None,
+            'columns': list(df.columns) if df is not None else None,
+        }
+
+    channel_ids = set()
+    for kind in ('channel', 'video'):
+        df = frames.get(kind)
+        if df is not None and 'channel_id' in df.columns:
+            channel_ids.update(df['channel_id'].dropna().astype(str))
+
+    manifest = {
+        'schema_version': schema_version,
+        'timestamp': timestamp,
+        'created_at': datetime.now().isoformat(),
+        'channel_ids': sorted(channel_ids),
+        'files': entries,
+        'time_range': {
+            'video_published_at': _time_range(frames.get('video'), 'published_at'),
+            'comment_published_at': _time_range(frames.get('comment'), 'published_at'),
+            'collected_at': _time_range(
+                pd.concat([df[['collected_at']] for df in frames.values()
+                           if df is not None and 'collected_at' in df.columns] or [pd.DataFrame()]),
+                'collected_at'
+            ),
+        },
+    }
+    path = os.path.join(output_dir, f'manifest_{timestamp}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def add_file(manifest_path, kind, path, rows=None, columns=None, file_format='csv'):
+    """给已写好的manifest补一个数据文件 (例如流水线结束后写完的评论文件)
+
+    file_format 为 'csv' 或 'parquet' (目录, 每个批次一个 part-*.parquet 文件)
+    """
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['files'][kind] = {
+        'file': os.path.basename(path),
+        'rows': rows,
+        'columns': columns,
+    }
+    if file_format != 'csv':
+        manifest['files'][kind]['format'] = file_format
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest_path
+
+
+def read_entry(data_dir, entry, key):
+    """读取manifest里的一个数据文件 (csv或parquet目录)"""
+    path = os.path.join(data_dir, entry['file'])
+    if entry.get('format') == 'parquet':
+        df = pd.read_parquet(path)
+        df[key] = df[key].astype(str)
+        return df
+    return pd.read_csv(path, dtype={key: str})
+
+
+def list_manifests(data_dir, channel_id=None):
+    """目录下所有manifest, 按时间从旧到新"""
+    manifests = []
+    for path in glob.glob(os.path.join(data_dir, 'manifest_*.json')):
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('schema_version', 0) > SCHEMA_VERSION:
+            print(f"⚠ 跳过更新版本的manifest: {path}")
+            continue
+        if channel_id and channel_id not in manifest.get('channel_ids', []):
+            continue
+        manifest['path'] = path
+        manifests.append(manifest)
+    return sorted(manifests, key=lambda m: m['timestamp'])
+
+
+def resolve_snapshots(data_dir, snapshots='latest', channel_id=None, kind=None):
+    """选择要加载的导出: 'latest', 'all', 或最近N个
+
+    kind 不为空时只考虑有该数据类型文件的导出 (例如流水线中断时manifest只有频道和视频)
+    """
+    manifests = list_manifests(data_dir, channel_id)
+    if kind is not None:
+        manifests = [m for m in manifests if m['files'].get(kind)]
+    if snapshots == 'all':
+        return manifests
+    count = 1 if snapshots in (None, 'latest') else int(snapshots)
+    return manifests[-count:] if count > 0 else []
+
+
+def load_snapshots(data_dir, manifests, kinds=None):
+    """加载并合并多个导出, 按主键去重 (保留collected_at最新的一行)
+
+    kinds 为要加载的数据类型 (默认全部); 返回 数据类型 -> DataFrame (没有数据或未加载时为None),
+    时间和时长列已按各导出的schema版本解析 (typed_export)
+    """
+    frames = {}
+    for kind, (_, key) in DATASETS.items():
+        if kinds is not None and kind not in kinds:
+            frames[kind] = None
+            continue
+        parts = []
+        for manifest in manifests:
+            entry = manifest['files'].get(kind)
+            if not entry:
+                continue
+            part = read_entry(data_dir, entry, key)
+            parts.append(typed_export(part, manifest.get('schema_version', 1)))
+        if not parts:
+            frames[kind] = None
+            continue
+        df = typed_columns(pd.concat(parts, ignore_index=True)) if len(parts) > 1 else parts[0]
+        if len(parts) > 1:
+            if 'collected_at' in df.columns:
+                df = df.sort_values('collected_at', kind='stable')
+            df = df.drop_duplicates(key, keep='last').reset_index(drop=True)
+        frames[kind] = df
+    return frames
+
+
+def index_directory(data_dir):
+    """给没有manifest的带时间戳的旧导出生成manifest, 返回新写的manifest路径"""
+    exports = {}
+    for name in os.listdir(data_dir):
+        match = _TIMESTAMPED.match(name)
+        if match:
+            exports.setdefault(match.group(2), {})[match.group(1)] = os.path.join(data_dir, name)
+
+    written = []
+    for timestamp, found in sorted(exports.items()):
+        if os.path.exists(os.path.join(data_dir, f'manifest_{timestamp}.json')):
+            continue
+        files, frames = {}, {}
+        for kind, (prefix, key) in DATASETS.items():
+            if prefix in found:
+                files[kind] = found[prefix]
+                frames[kind] = pd.read_csv(found[prefix], dtype={key: str})
+        written.append(write_manifest(data_dir, timestamp, files, frames, guess_schema_version(frames)))
+    return written
+
+
+def prune(data_dir, keep):
+    """只保留最近keep个导出 (keep至少为1), 删除更早的导出文件和manifest"""
+    if keep < 1:
+        raise ValueError(f"keep must be at least 1, got {keep}")
+    manifests = list_manifests(data_dir)
+    removed = []
+    for manifest in manifests[:-keep]:
+        for entry in manifest['files'].values():
+            path = os.path.join(data_dir, entry['file'])
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+                removed.append(path)
+            elif os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+        os.remove(manifest['path'])
+        removed.append(manifest['path'])
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='YouTube export catalog')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('list', help='列出导出')
+    p.add_argument('data_dir')
+    p.add_argument('--channel-id')
+    p = sub.add_parser('index', help='给旧导出补manifest')
+    p.add_argument('data_dir')
+    p = sub.add_parser('prune', help='删除旧导出')
+    p.add_argument('data_dir')
+    p.add_argument('--keep', type=int, required=True)
+    args = parser.parse_args(argv)
+    if args.command == 'prune' and args.keep < 1:
+        parser.error('--keep must be at least 1')
+
+    if args.command == 'list':
+        for manifest in list_manifests(args.data_dir, args.channel_id):
+            rows = ', '.join(f"{kind} {entry['rows']}" for kind, entry in manifest['files'].items())
+            print(f"{manifest['timestamp']}  {','.join(manifest['channel_ids'])}  {rows}")
+    elif args.command == 'index':
+        for path in index_directory(args.data_dir):
+            print(f"✓ {path}")
+    elif args.command == 'prune':
+        for path in prune(args.data_dir, args.keep):
+            print(f"✓ removed {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
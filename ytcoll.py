@@ -5,29 +5,88 @@ dependencies:
 pip install google-api-python-client pandas psycopg2-binary python-dotenv
 """
 
-from googleapiclient.discovery import build
+# googleapiclient.discovery, pandas and psycopg2 are imported where they are used,
+# googleapiclient.errors is cheap
 from googleapiclient.errors import HttpError
-import pandas as pd
-import psycopg2
-from psycopg2 import sql
+import argparse
+import json
 import os
-from datetime import datetime
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from ytrecords import ChannelRecord, VideoRecord, CommentRecord, records_to_frame, frame_to_records, parse_durations
+from ytrequests import (CHANNEL_FIELDS, CHANNEL_ID_FIELDS, COMMENT_FIELDS, PLAYLIST_ITEM_FIELDS,
+                        VIDEO_FIELDS, RequestMeter, metered_http)
+
+# exit status for schedulers / orchestration
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CONFIG_ERROR = 2
+
+SINKS = ('csv', 'postgres')
 
 class YouTubeDataCollector:
-    def __init__(self, api_key):
+    # parsed discovery document, shared by all collectors and threads
+    _discovery = None
+    _discovery_lock = threading.Lock()
+    
+    def __init__(self, api_key, workers=1, discovery_doc=None, digest_index=None):
         """ Initialize YouTube API Client"""
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+        self.api_key = api_key
+        self.workers = max(1, int(workers))
+        self.discovery_doc = discovery_doc
+        self._local = threading.local()
+        # requests / bytes per endpoint of all threads
+        self.meter = RequestMeter()
+        # optional ytdigest.CommentDigestIndex: only new/changed comments are written to PostgreSQL
+        self.digest_index = digest_index
+        self.comment_changes = None
         self.channel_data = []
         self.video_data = []
         self.comment_data = []
     
+    @classmethod
+    def load_discovery(cls, path=None):
+        """Load the YouTube v3 discovery document once, from a local file or the static copy in googleapiclient"""
+        with cls._discovery_lock:
+            if cls._discovery is None:
+                if path:
+                    with open(path, encoding='utf-8') as f:
+                        doc = f.read()
+                else:
+                    from googleapiclient.discovery_cache import get_static_doc
+                    doc = get_static_doc('youtube', 'v3')
+                if doc is None:
+                    return None
+                cls._discovery = json.loads(doc)
+            return cls._discovery
+    
+    @property
+    def youtube(self):
+        """API client of the current thread (httplib2 is not thread safe)"""
+        client = getattr(self._local, 'youtube', None)
+        if client is None:
+            from googleapiclient.discovery import build, build_from_document
+            discovery = self.load_discovery(self.discovery_doc)
+            http = metered_http(self.meter)
+            if discovery is not None:
+                client = build_from_document(discovery, developerKey=self.api_key, http=http)
+            else:
+                client = build('youtube', 'v3', developerKey=self.api_key, http=http,
+                               static_discovery=True, cache_discovery=False)
+            self._local.youtube = client
+        return client
+    
     def get_channel_id_from_username(self, username):
         """Get ID from username"""
         try:
             request = self.youtube.channels().list(
                 part='id',
-                forUsername=username
+                forUsername=username,
+                fields=CHANNEL_ID_FIELDS
             )
             response = request.execute()
             
@@ -68,43 +127,54 @@ class YouTubeDataCollector:
         print(f"✗ cannot found channel from url: {url}")
         return None
     
+    def resolve_channel_id(self, channel_id=None, channel_url=None, channel_username=None):
+        """Channel ID from one of: ID, URL, username (default GoogleDevelopers)"""
+        if channel_id:
+            return channel_id
+        if channel_url:
+            return self.get_channel_id_from_url(channel_url)
+        return self.get_channel_id_from_username(channel_username or 'GoogleDevelopers')
+    
     def get_channel_stats(self, channel_id):
         """channel statistics"""
         try:
             request = self.youtube.channels().list(
                 part='snippet,contentDetails,statistics',
-                id=channel_id
+                id=channel_id,
+                fields=CHANNEL_FIELDS
             )
             response = request.execute()
             
             # 检查响应是否有效
-            if 'items' not in response:
+            if 'error' in response:
                 print(f"✗ Error API response: {response}")
-                if 'error' in response:
-                    print(f"✗ Error Details: {response['error']}")
+                print(f"✗ Error Details: {response['error']}")
                 return None
             
-            if not response['items']:
+            # 使用fields掩码时, 没有结果的响应不包含 items
+            if not response.get('items'):
                 print(f"✗ Cannot Found channel: {channel_id}")
                 print(" Check channel ID")
                 return None
             
             if response['items']:
                 channel = response['items'][0]
-                stats = {
-                    'channel_id': channel_id,
-                    'channel_name': channel['snippet']['title'],
-                    'channel_description': channel['snippet']['description'],
-                    'subscribers': int(channel['statistics'].get('subscriberCount', 0)),
-                    'total_views': int(channel['statistics'].get('viewCount', 0)),
-                    'total_videos': int(channel['statistics'].get('videoCount', 0)),
-                    'country': channel['snippet'].get('country', 'N/A'),
-                    'published_at': channel['snippet']['publishedAt'],
-                    'uploads_playlist': channel['contentDetails']['relatedPlaylists']['uploads'],
-                    'collected_at': datetime.now().isoformat()
-                }
+                snippet = channel['snippet']
+                statistics = channel.get('statistics', {})
+                stats = ChannelRecord(
+                    channel_id,
+                    snippet['title'],
+                    snippet.get('description', ''),
+                    int(statistics.get('subscriberCount', 0)),
+                    int(statistics.get('viewCount', 0)),
+                    int(statistics.get('videoCount', 0)),
+                    snippet.get('country', 'N/A'),
+                    snippet['publishedAt'],
+                    channel['contentDetails']['relatedPlaylists']['uploads'],
+                    datetime.now(timezone.utc).isoformat()
+                )
                 self.channel_data.append(stats)
-                print(f"✓ got channel information: {stats['channel_name']}")
+                print(f"✓ got channel information: {stats.channel_name}")
                 return stats
             return None
         except HttpError as e:
@@ -125,25 +195,25 @@ class YouTubeDataCollector:
             print(f"✗ Unkown Error: {type(e).__name__}: {e}")
             return None
     
-    def get_video_ids(self, uploads_playlist_id, max_results=50):
-        """get ID from uploaded video list"""
-        video_ids = []
+    def iter_video_id_pages(self, uploads_playlist_id, max_results=50):
+        """逐页获取上传列表的视频ID, 每页 yield 一个ID列表"""
+        fetched = 0
         next_page_token = None
         
-        print(f"get video ID (max {max_results} 个)...")
-        
-        while len(video_ids) < max_results:
+        while fetched < max_results:
             try:
                 request = self.youtube.playlistItems().list(
                     part='contentDetails',
                     playlistId=uploads_playlist_id,
-                    maxResults=min(50, max_results - len(video_ids)),
-                    pageToken=next_page_token
+                    maxResults=min(50, max_results - fetched),
+                    pageToken=next_page_token,
+                    fields=PLAYLIST_ITEM_FIELDS
                 )
                 response = request.execute()
                 
-                for item in response['items']:
-                    video_ids.append(item['contentDetails']['videoId'])
+                page = [item['contentDetails']['videoId'] for item in response.get('items', [])]
+                fetched += len(page)
+                yield page
                 
                 next_page_token = response.get('nextPageToken')
                 if not next_page_token:
@@ -151,10 +221,53 @@ class YouTubeDataCollector:
             except HttpError as e:
                 print(f"✗ get veido ID Error: {e}")
                 break
+    
+    def get_video_ids(self, uploads_playlist_id, max_results=50):
+        """get ID from uploaded video list"""
+        print(f"get video ID (max {max_results} 个)...")
+        
+        video_ids = []
+        for page in self.iter_video_id_pages(uploads_playlist_id, max_results):
+            video_ids.extend(page)
         
         print(f"✓ got {len(video_ids)} video ID")
         return video_ids
     
+    def fetch_video_batch(self, batch):
+        """一次 videos.list 调用 (最多50个ID), 返回视频数据列表"""
+        request = self.youtube.videos().list(
+            part='snippet,statistics,contentDetails',
+            id=','.join(batch),
+            fields=VIDEO_FIELDS
+        )
+        response = request.execute()
+        
+        # 同一个响应的行共用一个 collected_at
+        collected_at = datetime.now(timezone.utc).isoformat()
+        videos = []
+        for video in response.get('items', []):
+            snippet = video['snippet']
+            stats = video.get('statistics', {})
+            content = video['contentDetails']
+            
+            videos.append(VideoRecord(
+                video['id'],
+                snippet['channelId'],
+                snippet['title'],
+                snippet.get('description', ''),
+                snippet['publishedAt'],
+                ','.join(snippet.get('tags', [])),
+                snippet.get('categoryId', 'N/A'),
+                content['duration'],
+                content['definition'],
+                content.get('caption', 'false'),
+                int(stats.get('viewCount', 0)),
+                int(stats.get('likeCount', 0)),
+                int(stats.get('commentCount', 0)),
+                collected_at
+            ))
+        return videos
+    
     def get_video_details(self, video_ids):
         """获取视频详细信息"""
         print(f"Getting {len(video_ids)} video detail information...")
@@ -162,69 +275,73 @@ class YouTubeDataCollector:
         for i in range(0, len(video_ids), 50):
             batch = video_ids[i:i+50]
             try:
-                request = self.youtube.videos().list(
-                    part='snippet,statistics,contentDetails',
-                    id=','.join(batch)
-                )
-                response = request.execute()
-                
-                for video in response['items']:
-                    snippet = video['snippet']
-                    stats = video['statistics']
-                    content = video['contentDetails']
-                    
-                    video_data = {
-                        'video_id': video['id'],
-                        'channel_id': snippet['channelId'],
-                        'title': snippet['title'],
-                        'description': snippet['description'],
-                        'published_at': snippet['publishedAt'],
-                        'tags': ','.join(snippet.get('tags', [])),
-                        'category_id': snippet.get('categoryId', 'N/A'),
-                        'duration': content['duration'],
-                        'definition': content['definition'],
-                        'caption': content.get('caption', 'false'),
-                        'view_count': int(stats.get('viewCount', 0)),
-                        'like_count': int(stats.get('likeCount', 0)),
-                        'comment_count': int(stats.get('commentCount', 0)),
-                        'collected_at': datetime.now().isoformat()
-                    }
-                    self.video_data.append(video_data)
+                self.video_data.extend(self.fetch_video_batch(batch))
             except HttpError as e:
                 print(f"✗ get video error information (batch {i//50 + 1}): {e}")
         
         print(f"✓ got {len(self.video_data)} video detailed information")
     
-    def get_video_comments(self, video_id, max_comments=100):
-        """获取单个视频的评论"""
-        comments = []
+    def discover_videos(self, uploads_playlist_id, max_results=50):
+        """流水线方式获取视频: 每页ID一到就交给 videos.list 线程, 同时继续翻下一页
+
+        结果按上传列表顺序加入 self.video_data, 返回视频ID列表
+        """
+        print(f"Discovering videos (max {max_results}, {self.workers} detail workers)...")
+        
+        video_ids = []
+        futures = []
+        # 至少两个线程: 翻页在当前线程, 详情请求与之并行
+        with ThreadPoolExecutor(max_workers=max(2, self.workers)) as executor:
+            for page in self.iter_video_id_pages(uploads_playlist_id, max_results):
+                video_ids.extend(page)
+                if page:
+                    futures.append(executor.submit(self.fetch_video_batch, page))
+            for number, future in enumerate(futures, 1):
+                try:
+                    self.video_data.extend(future.result())
+                except HttpError as e:
+                    print(f"✗ get video error information (batch {number}): {e}")
+        
+        print(f"✓ got {len(video_ids)} video ID, {len(self.video_data)} video detailed information")
+        return video_ids
+    
+    def iter_comment_pages(self, video_id, max_comments=100):
+        """逐页获取单个视频的评论, 每页 yield 一个评论列表"""
+        fetched = 0
         next_page_token = None
         
         try:
-            while len(comments) < max_comments:
+            while fetched < max_comments:
                 request = self.youtube.commentThreads().list(
                     part='snippet',
                     videoId=video_id,
-                    maxResults=min(100, max_comments - len(comments)),
+                    maxResults=min(100, max_comments - fetched),
                     pageToken=next_page_token,
                     textFormat='plainText',
-                    order='relevance'
+                    order='relevance',
+                    fields=COMMENT_FIELDS
                 )
                 response = request.execute()
                 
-                for item in response['items']:
-                    comment_snippet = item['snippet']['topLevelComment']['snippet']
-                    comments.append({
-                        'video_id': video_id,
-                        'comment_id': item['snippet']['topLevelComment']['id'],
-                        'author': comment_snippet['authorDisplayName'],
-                        'comment_text': comment_snippet['textDisplay'],
-                        'like_count': comment_snippet['likeCount'],
-                        'published_at': comment_snippet['publishedAt'],
-                        'updated_at': comment_snippet.get('updatedAt', comment_snippet['publishedAt']),
-                        'reply_count': item['snippet']['totalReplyCount'],
-                        'collected_at': datetime.now().isoformat()
-                    })
+                collected_at = datetime.now(timezone.utc).isoformat()
+                comments = []
+                for item in response.get('items', []):
+                    top = item['snippet']['topLevelComment']
+                    comment_snippet = top['snippet']
+                    comments.append(CommentRecord(
+                        video_id,
+                        top['id'],
+                        comment_snippet['authorDisplayName'],
+                        comment_snippet['textDisplay'],
+                        comment_snippet['likeCount'],
+                        comment_snippet['publishedAt'],
+                        comment_snippet.get('updatedAt', comment_snippet['publishedAt']),
+                        item['snippet']['totalReplyCount'],
+                        collected_at
+                    ))
+                fetched += len(comments)
+                if comments:
+                    yield comments
                 
                 next_page_token = response.get('nextPageToken')
                 if not next_page_token:
@@ -235,7 +352,12 @@ class YouTubeDataCollector:
                 print(f"  Comment disabled: {video_id}")
             else:
                 print(f"  Cannot Get Comment: {video_id} - {e}")
-        
+    
+    def get_video_comments(self, video_id, max_comments=100):
+        """获取单个视频的评论"""
+        comments = []
+        for page in self.iter_comment_pages(video_id, max_comments):
+            comments.extend(page)
         return comments
     
     def collect_all_comments(self, max_comments_per_video=100, max_videos=None):
@@ -245,51 +367,73 @@ class YouTubeDataCollector:
         
         print(f"\nGetting {total_videos} Video Comments...")
         
-        for idx, video in enumerate(videos_to_process, 1):
-            print(f"[{idx}/{total_videos}] Processing: {video['title'][:50]}...")
-            comments = self.get_video_comments(video['video_id'], max_comments_per_video)
-            self.comment_data.extend(comments)
-            print(f"  ✓ Get {len(comments)} Comments")
+        if self.workers > 1:
+            # 每个线程使用自己的API客户端
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = executor.map(
+                    lambda video: self.get_video_comments(video.video_id, max_comments_per_video),
+                    videos_to_process
+                )
+                for idx, (video, comments) in enumerate(zip(videos_to_process, results), 1):
+                    print(f"[{idx}/{total_videos}] Processed: {video.title[:50]}...")
+                    self.comment_data.extend(comments)
+                    print(f"  ✓ Get {len(comments)} Comments")
+        else:
+            for idx, video in enumerate(videos_to_process, 1):
+                print(f"[{idx}/{total_videos}] Processing: {video.title[:50]}...")
+                comments = self.get_video_comments(video.video_id, max_comments_per_video)
+                self.comment_data.extend(comments)
+                print(f"  ✓ Get {len(comments)} Comments")
         
         print(f"\n✓ Got {len(self.comment_data)} Comments in Total")
     
-    def export_to_csv(self, output_dir='youtube_data'):
-        """导出数据到CSV文件"""
+    def export_to_csv(self, output_dir='youtube_data', timestamp=None):
+        """导出数据到CSV文件, 并写 manifest_<timestamp>.json (见 ytcatalog)"""
+        import ytcatalog
+        
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        timestamp = timestamp or ytcatalog.new_timestamp(output_dir)
+        files, frames = {}, {}
         
         # 导出频道数据
         if self.channel_data:
-            df_channel = pd.DataFrame(self.channel_data)
+            df_channel = records_to_frame(self.channel_data, ChannelRecord)
             channel_file = f"{output_dir}/channel_data_{timestamp}.csv"
             df_channel.to_csv(channel_file, index=False, encoding='utf-8-sig')
+            files['channel'], frames['channel'] = channel_file, df_channel
             print(f"✓ Channel Data is Saved: {channel_file}")
         
         # 导出视频数据
         if self.video_data:
-            df_videos = pd.DataFrame(self.video_data)
+            df_videos = records_to_frame(self.video_data, VideoRecord)
             video_file = f"{output_dir}/video_data_{timestamp}.csv"
             df_videos.to_csv(video_file, index=False, encoding='utf-8-sig')
+            files['video'], frames['video'] = video_file, df_videos
             print(f"✓ video meta Data is saved: {video_file} ({len(df_videos)} records)")
         
         # 导出评论数据
         if self.comment_data:
-            df_comments = pd.DataFrame(self.comment_data)
+            df_comments = records_to_frame(self.comment_data, CommentRecord)
             comment_file = f"{output_dir}/comment_data_{timestamp}.csv"
             df_comments.to_csv(comment_file, index=False, encoding='utf-8-sig')
+            files['comment'], frames['comment'] = comment_file, df_comments
             print(f"✓ Comments data is saved: {comment_file} ({len(df_comments)} records)")
         
+        manifest_file = ytcatalog.write_manifest(output_dir, timestamp, files, frames) if files else None
+        
         return {
-            'channel_file': channel_file if self.channel_data else None,
-            'video_file': video_file if self.video_data else None,
-            'comment_file': comment_file if self.comment_data else None
+            'channel_file': files.get('channel'),
+            'video_file': files.get('video'),
+            'comment_file': files.get('comment'),
+            'manifest_file': manifest_file
         }
     
     def export_to_postgres(self, db_config):
         """导出数据到PostgreSQL数据库"""
         try:
+            import psycopg2
             conn = psycopg2.connect(
                 host=db_config['host'],
                 database=db_config['database'],
@@ -313,7 +457,19 @@ class YouTubeDataCollector:
                 print(f"✓ Inserted {len(self.video_data)} video data")
             
             # 插入评论数据
-            if self.comment_data:
+            written = None
+            if self.comment_data and self.digest_index is not None:
+                # 只写新增或变化的评论, 编辑过的评论标记为需要重新评分
+                written = records_to_frame(self.comment_data, CommentRecord)
+                status = self.digest_index.diff(written)
+                self.comment_changes = self.digest_index.counts(status)
+                edited = set(written.loc[status == 'edited', 'comment_id'])
+                written = written[status != 'unchanged']
+                self._upsert_comment_data(cursor, frame_to_records(written, CommentRecord), edited)
+                print(f"✓ Wrote {len(written)} new or changed Comments, "
+                      f"skipped {self.comment_changes['unchanged']} unchanged "
+                      f"({self.comment_changes['edited']} edited, flagged for re-scoring)")
+            elif self.comment_data:
                 self._insert_comment_data(cursor, self.comment_data)
                 print(f"✓ Inserted {len(self.comment_data)} Comments data")
             
@@ -321,13 +477,21 @@ class YouTubeDataCollector:
             cursor.close()
             conn.close()
             
+            if written is not None:
+                self.digest_index.update(written)
+                self.digest_index.save()
+            
             print("✓ Data Expoted to PostgreSQL")
+            return True
             
         except Exception as e:
             print(f"✗ PostgreSQL Export Error: {e}")
+            return False
     
     def _create_tables(self, cursor):
         """创建数据库表"""
+        # TIMESTAMP 列不带时区, 时间一律按UTC存储 (带时区的值按会话时区换算)
+        cursor.execute("SET TIME ZONE 'UTC'")
         # 频道表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS youtube_channels (
@@ -365,6 +529,11 @@ class YouTubeDataCollector:
             )
         """)
         
+        # duration (ISO 8601) 换算的秒数
+        cursor.execute("""
+            ALTER TABLE youtube_videos ADD COLUMN IF NOT EXISTS duration_seconds INTEGER
+        """)
+        
         # 评论表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS youtube_comments (
@@ -380,6 +549,10 @@ class YouTubeDataCollector:
                 FOREIGN KEY (video_id) REFERENCES youtube_videos(video_id)
             )
         """)
+        # 编辑过、需要重新评分的评论; 评分后写入 youtube_comment_sentiment 时清除
+        cursor.execute("""
+            ALTER TABLE youtube_comments ADD COLUMN IF NOT EXISTS needs_rescore BOOLEAN DEFAULT FALSE
+        """)
     
     def _insert_channel_data(self, cursor, data):
         """插入频道数据"""
@@ -395,33 +568,35 @@ class YouTubeDataCollector:
                     total_videos = EXCLUDED.total_videos,
                     collected_at = EXCLUDED.collected_at
             """, (
-                channel['channel_id'], channel['channel_name'], 
-                channel['channel_description'], channel['subscribers'],
-                channel['total_views'], channel['total_videos'],
-                channel['country'], channel['published_at'],
-                channel['uploads_playlist'], channel['collected_at']
+                channel.channel_id, channel.channel_name, 
+                channel.channel_description, channel.subscribers,
+                channel.total_views, channel.total_videos,
+                channel.country, channel.published_at,
+                channel.uploads_playlist, channel.collected_at
             ))
     
     def _insert_video_data(self, cursor, data):
         """插入视频数据"""
-        for video in data:
+        durations = parse_durations([video.duration for video in data])
+        for video, seconds in zip(data, durations.astype(object).where(durations.notna(), None)):
             cursor.execute("""
                 INSERT INTO youtube_videos 
                 (video_id, channel_id, title, description, published_at, tags, 
-                 category_id, duration, definition, caption, view_count, 
+                 category_id, duration, duration_seconds, definition, caption, view_count, 
                  like_count, comment_count, collected_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 ON CONFLICT (video_id) DO UPDATE SET
+                    duration_seconds = EXCLUDED.duration_seconds,
                     view_count = EXCLUDED.view_count,
                     like_count = EXCLUDED.like_count,
                     comment_count = EXCLUDED.comment_count,
                     collected_at = EXCLUDED.collected_at
             """, (
-                video['video_id'], video['channel_id'], video['title'],
-                video['description'], video['published_at'], video['tags'],
-                video['category_id'], video['duration'], video['definition'],
-                video['caption'], video['view_count'], video['like_count'],
-                video['comment_count'], video['collected_at']
+                video.video_id, video.channel_id, video.title,
+                video.description, video.published_at, video.tags,
+                video.category_id, video.duration, seconds, video.definition,
+                video.caption, video.view_count, video.like_count,
+                video.comment_count, video.collected_at
             ))
     
     def _insert_comment_data(self, cursor, data):
@@ -434,33 +609,218 @@ class YouTubeDataCollector:
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                 ON CONFLICT (comment_id) DO NOTHING
             """, (
-                comment['comment_id'], comment['video_id'], comment['author'],
-                comment['comment_text'], comment['like_count'], 
-                comment['published_at'], comment['updated_at'],
-                comment['reply_count'], comment['collected_at']
+                comment.comment_id, comment.video_id, comment.author,
+                comment.comment_text, comment.like_count, 
+                comment.published_at, comment.updated_at,
+                comment.reply_count, comment.collected_at
+            ))
+    
+    def _upsert_comment_data(self, cursor, data, edited_ids=()):
+        """插入或更新评论数据 (文本, 点赞数等), edited_ids 中的评论标记 needs_rescore"""
+        for comment in data:
+            cursor.execute("""
+                INSERT INTO youtube_comments 
+                (comment_id, video_id, author, comment_text, like_count, 
+                 published_at, updated_at, reply_count, collected_at, needs_rescore)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (comment_id) DO UPDATE SET
+                    comment_text = EXCLUDED.comment_text,
+                    like_count = EXCLUDED.like_count,
+                    updated_at = EXCLUDED.updated_at,
+                    reply_count = EXCLUDED.reply_count,
+                    collected_at = EXCLUDED.collected_at,
+                    needs_rescore = youtube_comments.needs_rescore OR EXCLUDED.needs_rescore
+            """, (
+                comment.comment_id, comment.video_id, comment.author,
+                comment.comment_text, comment.like_count, 
+                comment.published_at, comment.updated_at,
+                comment.reply_count, comment.collected_at,
+                comment.comment_id in edited_ids
             ))
 
 
+# ============== Comment sentiment table ==============
+# 主评分器的得分 (ytpipeline.py 的 postgres sink 和 ytanalysis.py --source postgres 写入)
+SENTIMENT_COLUMNS = ['comment_id', 'lang', 'compound', 'pos', 'neu', 'neg', 'sentiment', 'scored_at']
+
+
+def create_sentiment_table(cursor):
+    """创建 youtube_comment_sentiment 表 (依赖 youtube_comments)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS youtube_comment_sentiment (
+            comment_id VARCHAR(255) PRIMARY KEY,
+            lang VARCHAR(10),
+            compound REAL,
+            pos REAL,
+            neu REAL,
+            neg REAL,
+            sentiment VARCHAR(20),
+            scored_at TIMESTAMP,
+            FOREIGN KEY (comment_id) REFERENCES youtube_comments(comment_id)
+        )
+    """)
+
+
+def save_comment_sentiment(cursor, rows):
+    """写入或更新评论得分 (rows 按 SENTIMENT_COLUMNS 的顺序), 并清除这些评论的 needs_rescore"""
+    from psycopg2.extras import execute_values
+    if not rows:
+        return
+    execute_values(cursor, f"""
+        INSERT INTO youtube_comment_sentiment ({', '.join(SENTIMENT_COLUMNS)})
+        VALUES %s
+        ON CONFLICT (comment_id) DO UPDATE SET
+            lang = EXCLUDED.lang,
+            compound = EXCLUDED.compound,
+            pos = EXCLUDED.pos,
+            neu = EXCLUDED.neu,
+            neg = EXCLUDED.neg,
+            sentiment = EXCLUDED.sentiment,
+            scored_at = EXCLUDED.scored_at
+    """, rows)
+    cursor.execute("UPDATE youtube_comments SET needs_rescore = FALSE WHERE needs_rescore AND comment_id = ANY(%s)",
+                   ([row[0] for row in rows],))
+
+
 # ============== Main ==============
-def main():
-    # loading .env file
+def load_config(path):
+    """读取JSON配置文件 (键名与命令行参数的dest一致)"""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"config file must contain a JSON object: {path}")
+    return config
+
+
+def parse_args(argv=None):
+    """Parse command line, --config values are defaults and flags override them"""
+    # .env values are the lowest priority defaults
     load_dotenv()
     
-    # ===== Config Area =====
-    API_KEY = os.getenv('YOUTUBE_API_KEY', 'YOUR_API_KEY_HERE')
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument('--config')
+    pre_args, _ = pre.parse_known_args(argv)
     
-    # Channel ID Config - pick one method:
-    # method 1: channel ID (recommended if you have it)
-    #CHANNEL_ID = 'UC_x5XG1OV2P6uZZ5FSM9Ttw'  # eg.: Google Developers
+    parser = argparse.ArgumentParser(
+        description='YouTube Data Collector',
+        parents=[pre]
+    )
+    parser.add_argument('--api-key', default=os.getenv('YOUTUBE_API_KEY', 'YOUR_API_KEY_HERE'),
+                        help='YouTube Data API key (default: $YOUTUBE_API_KEY)')
+    
+    # Channel - pick one method
+    channel = parser.add_mutually_exclusive_group()
+    channel.add_argument('--channel-id', default=os.getenv('CHANNEL_ID'))
+    channel.add_argument('--channel-url', default=os.getenv('CHANNEL_URL'))
+    channel.add_argument('--channel-username', default=os.getenv('CHANNEL_USERNAME'))
+    
+    # limits
+    parser.add_argument('--max-videos', type=int, default=int(os.getenv('MAX_VIDEOS', '50')),
+                        help='maximum video to fetch')
+    parser.add_argument('--max-comments-per-video', type=int,
+                        default=int(os.getenv('MAX_COMMENTS_PER_VIDEO', '100')),
+                        help='maximum comments per video')
+    parser.add_argument('--max-videos-for-comments', type=int,
+                        default=int(os.getenv('MAX_VIDEOS_FOR_COMMENTS', '20')),
+                        help='maximum videos to fetch comments from')
+    parser.add_argument('--skip-comments', action='store_true',
+                        help='do not collect comments (the most expensive step)')
+    
+    # concurrency
+    parser.add_argument('--workers', type=int, default=1,
+                        help='concurrent API workers for comment collection and video details')
+    parser.add_argument('--pipelined-discovery', action='store_true',
+                        help='fetch video details while the uploads playlist is still being paged')
+    parser.add_argument('--discovery-doc',
+                        help='local YouTube v3 discovery JSON (default: static copy shipped with googleapiclient)')
+    
+    # sinks
+    parser.add_argument('--sink', dest='sinks', action='append', choices=SINKS, default=None,
+                        help='export target, can be repeated (default: csv)')
+    parser.add_argument('--output-dir', default='youtube_data')
+    parser.add_argument('--db-host', default=os.getenv('DB_HOST') or 'localhost')
+    parser.add_argument('--db-name', default=os.getenv('DB_NAME') or 'youtube_data')
+    parser.add_argument('--db-user', default=os.getenv('DB_USER') or 'postgres')
+    parser.add_argument('--db-password', default=os.getenv('DB_PASSWORD') or 'your_password')
+    parser.add_argument('--db-port', type=int, default=int(os.getenv('DB_PORT') or 5432))
+    parser.add_argument('--digest-index',
+                        help='comment digest file; PostgreSQL export then writes only new or changed comments')
+    
+    parser.add_argument('--summary',
+                        help="write a JSON run summary to this file ('-' for stdout)")
+    
+    config_sinks = None
+    if pre_args.config:
+        config = load_config(pre_args.config)
+        known = {action.dest for action in parser._actions}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            parser.error(f"unknown keys in {pre_args.config}: {', '.join(unknown)}")
+        # action='append' 会把命令行的 --sink 追加到默认值上, 所以 sinks 不作为默认值,
+        # 解析后再决定: 命令行 > 配置文件 > csv
+        config_sinks = config.pop('sinks', None)
+        if isinstance(config_sinks, str):
+            config_sinks = [config_sinks]
+        parser.set_defaults(**config)
+    
+    args = parser.parse_args(argv)
+    args.sinks = args.sinks or config_sinks or ['csv']
+    for sink in args.sinks:
+        if sink not in SINKS:
+            parser.error(f"invalid sink: {sink}")
+    if args.workers < 1:
+        parser.error('--workers must be >= 1')
+    return args
+
+
+def write_summary(summary, path):
+    """输出机器可读的运行摘要"""
+    if not path:
+        return
+    text = json.dumps(summary, ensure_ascii=False, indent=2, default=str)
+    if path == '-':
+        print(text)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+    except (OSError, ValueError) as e:
+        print(f"✗ Config Error: {e}")
+        return EXIT_CONFIG_ERROR
+    
+    started = time.time()
+    summary = {
+        'tool': 'ytcoll',
+        'status': 'failed',
+        'exit_code': EXIT_FAILED,
+        'started_at': datetime.now().isoformat(),
+        'channel_id': None,
+        'channel_name': None,
+        'videos': 0,
+        'comments': 0,
+        'files': {},
+        'sinks': {},
+    }
     
-    # method 2: Channel URL (get ID automatically)
-    # CHANNEL_URL = 'https://www.youtube.com/@GoogleDevelopers'
+    collector = None
     
-    # method 3: Channel Username (get ID automatically)
-    CHANNEL_USERNAME = os.getenv('CHANNEL_USERNAME', 'GoogleDevelopers')
+    def finish(exit_code, status):
+        summary['exit_code'] = exit_code
+        summary['status'] = status
+        summary['elapsed_seconds'] = round(time.time() - started, 3)
+        if collector is not None:
+            summary['requests'] = collector.meter.summary()
+        write_summary(summary, args.summary)
+        return exit_code
+    
+    API_KEY = args.api_key
     
     # Check Configuration
-    if API_KEY == 'YOUR_API_KEY_HERE':
+    if not API_KEY or API_KEY == 'YOUR_API_KEY_HERE':
         print("=" * 60)
         print("Error: Please Use a valid API KEY!")
         print("=" * 60)
@@ -469,42 +829,37 @@ def main():
         print("2. Create a new Project")
         print("3. enable 'YouTube Data API v3'")
         print("4. create credentials > API KEY")
-        print("5. copy API Key to API_KEY in .env file or in Main config YOUR_API_KEY_HERE")
+        print("5. copy API Key to YOUTUBE_API_KEY in .env file or pass --api-key")
         print("=" * 60)
-        return
+        return finish(EXIT_CONFIG_ERROR, 'config_error')
     
     print(f"\nPrompts: Current USING the API KEY Prefix: {API_KEY[:10]}...")
     
     # 处理频道ID
-    collector = YouTubeDataCollector(API_KEY)
-    
-    # 如果提供了URL，尝试提取频道ID
-    if 'CHANNEL_URL' in locals():
-        CHANNEL_ID = collector.get_channel_id_from_url(CHANNEL_URL)
-        if not CHANNEL_ID:
-            return
-    # 如果提供了用户名，获取频道ID
-    elif 'CHANNEL_USERNAME' in locals():
-        CHANNEL_ID = collector.get_channel_id_from_username(CHANNEL_USERNAME)
-        if not CHANNEL_ID:
-            return
+    digest_index = None
+    if args.digest_index:
+        from ytdigest import CommentDigestIndex
+        digest_index = CommentDigestIndex(args.digest_index).load()
+    collector = YouTubeDataCollector(API_KEY, workers=args.workers, discovery_doc=args.discovery_doc,
+                                     digest_index=digest_index)
+    
+    # method 1: channel ID, method 2: channel URL, method 3: username
+    CHANNEL_ID = collector.resolve_channel_id(args.channel_id, args.channel_url, args.channel_username)
+    if not CHANNEL_ID:
+        return finish(EXIT_FAILED, 'channel_not_found')
+    summary['channel_id'] = CHANNEL_ID
     
     print(f"Prompts: Target Channel ID: {CHANNEL_ID}\n")
     
     # PostgreSQL配置 (可选)
     DB_CONFIG = {
-        'host': os.getenv('DB_HOST', 'localhost'),
-        'database': os.getenv('DB_NAME', 'youtube_data'),
-        'user': os.getenv('DB_USER', 'postgres'),
-        'password': os.getenv('DB_PASSWORD', 'your_password'),
-        'port': os.getenv('DB_PORT', 5432)
+        'host': args.db_host,
+        'database': args.db_name,
+        'user': args.db_user,
+        'password': args.db_password,
+        'port': args.db_port
     }
     
-    # data collection parameters
-    MAX_VIDEOS = os.getenv('MAX_VIDEOS', '50')  # maximum video to fetch
-    MAX_COMMENTS_PER_VIDEO = os.getenv('MAX_COMMENTS_PER_VIDEO', '100')  # maximum comments per video
-    MAX_VIDEOS_FOR_COMMENTS = os.getenv('MAX_VIDEOS_FOR_COMMENTS', '20')  # maximum videos to fetch comments from
-    
     # ===== 开始数据收集 =====
     print("=" * 60)
     print("YouTube Data Collector")
@@ -528,47 +883,76 @@ def main():
         print("→ Check channel ID")
         print("→ Check API Quota: https://console.cloud.google.com/apis/api/youtube.googleapis.com/quotas")
         print("=" * 60)
-        return
-    
-    # 2. 获取视频ID列表
-    print("\n[Step 2/5] getting video lists...")
-    video_ids = collector.get_video_ids(
-        channel_stats['uploads_playlist'], 
-        max_results=MAX_VIDEOS
-    )
-    
-    # 3. 获取视频详细信息
-    print("\n[Step 3/5] Get video Detail Information...")
-    collector.get_video_details(video_ids)
+        return finish(EXIT_FAILED, 'channel_stats_failed')
+    summary['channel_name'] = channel_stats.channel_name
+    
+    if args.pipelined_discovery:
+        # 2+3. 翻页与视频详情请求同时进行
+        print("\n[Step 2-3/5] getting video lists and detail information...")
+        collector.discover_videos(channel_stats.uploads_playlist, max_results=args.max_videos)
+    else:
+        # 2. 获取视频ID列表
+        print("\n[Step 2/5] getting video lists...")
+        video_ids = collector.get_video_ids(
+            channel_stats.uploads_playlist, 
+            max_results=args.max_videos
+        )
+        
+        # 3. 获取视频详细信息
+        print("\n[Step 3/5] Get video Detail Information...")
+        collector.get_video_details(video_ids)
+    summary['videos'] = len(collector.video_data)
     
     # 4. 收集评论
-    print("\n[Step 4/5] Collecting Comments on Videos...")
-    collector.collect_all_comments(
-        max_comments_per_video=MAX_COMMENTS_PER_VIDEO,
-        max_videos=MAX_VIDEOS_FOR_COMMENTS
-    )
+    if args.skip_comments:
+        print("\n[Step 4/5] Skipped Comments (--skip-comments)")
+    else:
+        print("\n[Step 4/5] Collecting Comments on Videos...")
+        collector.collect_all_comments(
+            max_comments_per_video=args.max_comments_per_video,
+            max_videos=args.max_videos_for_comments
+        )
+    summary['comments'] = len(collector.comment_data)
     
     # 5. 导出数据
     print("\n[Step 5/5] Export Data...")
     
-    # 导出到CSV
-    print("\n>>> Export to CSV File...")
-    files = collector.export_to_csv()
-    
-    # 导出到PostgreSQL (可选 - 取消注释以使用)
-    # print("\n>>> 导出到 PostgreSQL...")
-    # collector.export_to_postgres(DB_CONFIG)
+    ok = True
+    if 'csv' in args.sinks:
+        print("\n>>> Export to CSV File...")
+        try:
+            summary['files'] = collector.export_to_csv(args.output_dir)
+            summary['sinks']['csv'] = 'ok'
+        except Exception as e:
+            # 仍然继续导出到PostgreSQL, 退出码为失败
+            print(f"✗ CSV Export Error: {type(e).__name__}: {e}")
+            summary['sinks']['csv'] = 'failed'
+            ok = False
+    
+    if 'postgres' in args.sinks:
+        print("\n>>> Export to PostgreSQL...")
+        exported = collector.export_to_postgres(DB_CONFIG)
+        summary['sinks']['postgres'] = 'ok' if exported else 'failed'
+        if collector.comment_changes is not None:
+            summary['comment_changes'] = collector.comment_changes
+        ok = ok and exported
     
     # 总结
     print("\n" + "=" * 60)
     print("Youtube Data Collection is Done！")
     print("=" * 60)
-    print(f"Channel: {channel_stats['channel_name']}")
+    print(f"Channel: {channel_stats.channel_name}")
     print(f"Video Number: {len(collector.video_data)}")
     print(f"Commnet Number: {len(collector.comment_data)}")
+    print("API requests:")
+    collector.meter.report()
     print("\nNext Step: Run Sentiment Analysis on Comments")
     print("=" * 60)
+    
+    if not ok:
+        return finish(EXIT_FAILED, 'export_failed')
+    return finish(EXIT_OK, 'ok')
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Near-duplicate comment clustering (MinHash + LSH)
+
+刷屏/复制粘贴的评论在清理后几乎一样. 步骤:
+1. 规范化文本 (小写, 合并空白) 后完全相同的评论先合并
+   (少于k个k-gram的短文本, 包括清理后为空的纯表情评论, 不参与聚类, 各自成簇)
+2. 剩下的唯一文本按字符k-gram做MinHash签名
+3. LSH分段分桶, 同桶文本用签名估计Jaccard相似度, 超过阈值的连成一簇
+4. 连通分量即为重复簇
+
+所有步骤都是批量的 numpy 运算, 时间大致与评论数成线性.
+"""
+
+import numpy as np
+import pandas as pd
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+
+
+def _shingle_hashes(text, k):
+    """文本的字符k-gram哈希 (uint64, 取值 < 2^32), 重复的k-gram不影响最小值, 不去重"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < k:
+        # 短文本整体作为一个k-gram
+        codes = np.concatenate([codes, np.zeros(k - len(codes), dtype=np.uint64)])
+    # 多项式滚动哈希 mod 2^32
+    windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+    with np.errstate(over='ignore'):
+        return (windows @ _powers(k)) & _MASK32
+
+
+_POWERS = {}
+
+
+def _powers(k):
+    if k not in _POWERS:
+        _POWERS[k] = np.uint64(1000003) ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    return _POWERS[k]
+
+
+def minhash_signatures(texts, num_perm=64, k=5, seed=1, chunk_shingles=200000):
+    """每条文本的MinHash签名, 返回 (len(texts), num_perm) uint32 矩阵"""
+    rng = np.random.default_rng(seed)
+    # multiply-shift 哈希族: h(x) = ((a * x + b) mod 2^64) >> 32, a 为奇数
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        # 按k-gram数量分块, 控制内存
+        hashes, lengths = [], []
+        total = 0
+        end = start
+        while end < len(texts) and (total < chunk_shingles or end == start):
+            h = _shingle_hashes(texts[end], k)
+            hashes.append(h)
+            lengths.append(len(h))
+            total += len(h)
+            end += 1
+        stacked = np.concatenate(hashes)
+        with np.errstate(over='ignore'):
+            values = ((stacked[:, None] * a + b) >> _SHIFT32).astype(np.uint32)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        signatures[start:end] = np.minimum.reduceat(values, offsets, axis=0)
+        start = end
+    return signatures
+
+
+def lsh_components(signatures, bands=16, threshold=0.8, seed=2):
+    """LSH分桶 + 相似度校验, 返回每条签名所属的连通分量编号"""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n, num_perm = signatures.shape
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    rows = num_perm // bands
+    rng = np.random.default_rng(seed)
+    weights = rng.integers(1, 2 ** 63, size=rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+    src, dst = [], []
+    for band in range(bands):
+        block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        with np.errstate(over='ignore'):
+            keys = (block * weights).sum(axis=1) + np.uint64(band)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        head = first[inverse]
+        candidates = np.nonzero(head != np.arange(n))[0]
+        if len(candidates) == 0:
+            continue
+        # 用签名估计Jaccard相似度, 去掉LSH的误报
+        similarity = (signatures[candidates] == signatures[head[candidates]]).mean(axis=1)
+        keep = similarity >= threshold
+        src.append(candidates[keep])
+        dst.append(head[candidates][keep])
+
+    if src:
+        src = np.concatenate(src)
+        dst = np.concatenate(dst)
+    else:
+        src = dst = np.zeros(0, dtype=np.int64)
+    graph = coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def normalize_text(texts):
+    """小写并合并空白, 完全相同的刷屏评论规范化后一致"""
+    return (pd.Series(texts).fillna('').astype(str).str.lower()
+            .str.replace(r'\s+', ' ', regex=True).str.strip())
+
+
+def minhash_clusters(texts, num_perm=64, bands=16, k=5, threshold=0.8):
+    """近似重复评论聚类
+
+    返回 (cluster_id, cluster_size) 两个与texts等长的数组,
+    cluster_id 是簇内第一条评论的位置 (0起), 不重复的评论自成一簇.
+    少于k个k-gram (不到 2k-1 个字符) 的文本自成一簇: 它们的签名几乎只由一两个k-gram决定,
+    清理后为空的评论 (纯表情/链接) 签名全部相同, 会连成一个巨大的簇
+    """
+    normalized = normalize_text(texts)
+    clustered = (normalized.str.len() >= 2 * k - 1).to_numpy()
+    labels = np.empty(len(normalized), dtype=np.int64)
+    # 完全相同的文本只算一次
+    exact, unique = pd.factorize(normalized[clustered])
+    signatures = minhash_signatures(list(unique), num_perm=num_perm, k=k)
+    labels[clustered] = lsh_components(signatures, bands=bands, threshold=threshold)[exact]
+    # 短文本接在已有编号之后, 每条一个编号
+    start = labels[clustered].max() + 1 if clustered.any() else 0
+    labels[~clustered] = np.arange(start, start + int((~clustered).sum()))
+
+    # 簇编号改为簇内第一条评论的位置
+    positions = np.arange(len(labels))
+    first = pd.Series(positions).groupby(labels).transform('min').to_numpy()
+    sizes = np.bincount(labels)[labels]
+    return first, sizes
@@ -0,0 +1,94 @@
+"""
+Comment change detection
+
+CommentDigestIndex 保存每条评论的摘要: comment_id -> (文本+updated_at 的64位blake2b哈希, like_count).
+写入数据库前先和索引比较, 只写新增或变化的评论:
+    new        索引里没有的评论
+    edited     文本或 updated_at 变了 (需要重新评分)
+    changed    只有 like_count 变了
+    unchanged  完全没变, 跳过
+
+索引保存为 CSV (comment_id, digest, like_count).
+"""
+
+import os
+from hashlib import blake2b
+
+import numpy as np
+import pandas as pd
+
+STATUSES = ('new', 'edited', 'changed', 'unchanged')
+
+
+def content_digests(texts, updated_at):
+    """文本和 updated_at 的64位摘要 (int64)"""
+    return np.fromiter(
+        (int.from_bytes(blake2b(f'{text}\x1f{updated}'.encode('utf-8'), digest_size=8).digest(),
+                        'little', signed=True)
+         for text, updated in zip(texts, updated_at)),
+        dtype=np.int64, count=len(texts)
+    )
+
+
+class CommentDigestIndex:
+    def __init__(self, path=None):
+        self.path = path
+        self.table = pd.DataFrame({'digest': pd.Series(dtype=np.int64),
+                                   'like_count': pd.Series(dtype=np.int64)},
+                                  index=pd.Index([], dtype=object, name='comment_id'))
+
+    def __len__(self):
+        return len(self.table)
+
+    def load(self):
+        """读取已有的索引, 文件不存在时为空"""
+        if self.path and os.path.exists(self.path):
+            self.table = pd.read_csv(self.path, index_col='comment_id',
+                                     dtype={'comment_id': str, 'digest': np.int64, 'like_count': np.int64})
+        return self
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.table.to_csv(self.path)
+
+    @staticmethod
+    def _digest_frame(df):
+        df = df.drop_duplicates('comment_id', keep='last')
+        updated = df['updated_at']
+        if isinstance(updated.dtype, pd.DatetimeTZDtype):
+            # 已解析的时间转回API的字符串格式, 摘要与解析前一致
+            updated = updated.dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+        return pd.DataFrame({
+            'digest': content_digests(df['comment_text'].fillna('').astype(str).tolist(),
+                                      updated.astype(str).tolist()),
+            'like_count': pd.to_numeric(df['like_count'], errors='coerce').fillna(0).astype(np.int64).to_numpy(),
+        }, index=pd.Index(df['comment_id'].astype(str), name='comment_id'))
+
+    def diff(self, df):
+        """比较评论 (DataFrame) 与索引, 返回与df同索引的状态Series"""
+        incoming = self._digest_frame(df)
+        known = self.table.reindex(incoming.index)
+        status = np.select(
+            [known['digest'].isna().to_numpy(),
+             (known['digest'] != incoming['digest']).to_numpy(),
+             (known['like_count'] != incoming['like_count']).to_numpy()],
+            ['new', 'edited', 'changed'],
+            default='unchanged'
+        )
+        by_id = pd.Series(status, index=incoming.index)
+        return df['comment_id'].astype(str).map(by_id)
+
+    def update(self, df):
+        """写入成功后把这些评论的摘要记进索引"""
+        incoming = self._digest_frame(df)
+        table = pd.concat([self.table, incoming])
+        self.table = table[~table.index.duplicated(keep='last')]
+
+    @staticmethod
+    def counts(status):
+        counts = status.value_counts()
+        return {name: int(counts.get(name, 0)) for name in STATUSES}
@@ -0,0 +1,255 @@
+"""
+Offline language identification for comments
+
+不依赖外部模型, 两步判断:
+1. 按文字系统 (Unicode script) 判断: 中文 / 日文 / 韩文 / 俄文 / 阿拉伯文 等
+2. 拉丁字母文本用字符 n-gram (1~3) 朴素贝叶斯模型打分 (en / es / pt / fr / de / it / nl / id / tr / vi),
+   模型由本文件里的训练文本建成, 第一次调用时建立
+
+第一名领先第二名不足 MIN_MARGIN 的文本 (如 "ok", 或各语言都说得通的短句) 标记为 'und'.
+"""
+
+import re
+import pandas as pd
+
+UNDETERMINED = 'und'
+
+# (语言, 字符范围), 按顺序匹配, 假名必须在汉字之前判断
+_SCRIPTS = [
+    ('ja', re.compile(r'[぀-ヿ]')),
+    ('ko', re.compile(r'[가-힯ᄀ-ᇿ]')),
+    ('zh', re.compile(r'[一-鿿㐀-䶿]')),
+    ('ru', re.compile(r'[Ѐ-ӿ]')),
+    ('ar', re.compile(r'[؀-ۿ]')),
+    ('hi', re.compile(r'[ऀ-ॿ]')),
+    ('bn', re.compile(r'[ঀ-৿]')),
+    ('ta', re.compile(r'[஀-௿]')),
+    ('th', re.compile(r'[฀-๿]')),
+    ('el', re.compile(r'[Ͱ-Ͽ]')),
+    ('he', re.compile(r'[֐-׿]')),
+]
+_UKRAINIAN = re.compile(r'[іїєґІЇЄҐ]')
+_LATIN = re.compile(r'[a-zA-ZÀ-ɏ]')
+_NON_LATIN = re.compile(r'[^\W\d_a-zA-ZÀ-ɏ]')
+_WORD = re.compile(r"[^\W\d_]+")
+
+# 各语言的训练文本 (常见的评论用语), 启动后第一次判断时建成字符 n-gram 模型
+_SAMPLES = {
+    'en': """Thank you so much for this video, it was really helpful and easy to understand. I have been
+        watching your channel for years and every new upload is better than the last one. This is the best
+        explanation I have found anywhere. Could you please make a follow up about the advanced features?
+        The audio was a little quiet but the content was great. I love how you explain things step by step
+        without rushing. Honestly I did not expect it to work but it worked perfectly the first time. Who
+        else is watching this in the middle of the night? What a great day for the community, congrats to
+        the whole team. Please keep making videos like this, we really appreciate the hard work. Does anyone
+        know where I can download the slides? Subscribed and shared with my friends, they will love it too.
+        This song brings back so many memories of my childhood. Absolutely amazing performance, the crowd
+        went crazy. I think the new update broke something because the app keeps crashing on my phone.
+        Check out my page for cheap deals, free gift cards and more followers, visit the link in my bio.
+        I would die for this band, been a huge fan since day one and I am still here. What happened at the
+        end? I laughed so hard my stomach hurts. lol this is so funny, nice job bro, you are awesome.
+        Good video. Nice video. Great video. Awesome video. Cool video. Very good. Very nice. So good. Not bad.
+        Bad video, meh, boring. Love it. Well done. Nice one. Good job. Great job. Amazing. Beautiful. Wow.
+        Thanks a lot. Thank you. Great content. Nice work. So cute. Too funny. Best video ever. Good stuff.""",
+    'es': """Muchas gracias por este video, me ayudó muchísimo y está muy bien explicado. Me encanta tu
+        canal, siempre subes contenido increíble. Llevo años viendo tus videos y cada vez son mejores.
+        ¿Podrías hacer un tutorial sobre las funciones avanzadas? El sonido estaba un poco bajo pero el
+        contenido es excelente. Qué buena explicación, por fin lo entendí. Saludos desde México, sigue así
+        hermano. No puedo creer que esto tenga tan pocas visitas. La canción me trae muchos recuerdos de mi
+        infancia. Ojalá hagas más videos como este, de verdad se agradece el esfuerzo. Alguien sabe dónde
+        puedo descargar el archivo? Es lo mejor que he visto en mucho tiempo. Me suscribí y lo compartí con
+        mis amigos. Qué increíble actuación, el público estaba loco. Creo que la nueva actualización tiene
+        un error porque la aplicación se cierra sola. Hola a todos, quién lo ve en 2024? Eres el mejor,
+        nunca cambies. Que video tan increible, la musica esta genial y me encanto el final. Gracias por
+        compartir, bendiciones para ti y tu familia.
+        Buen video. Muy bueno. Muy buen video. Excelente video. Qué bonito. Me gusta. Genial. Gracias.""",
+    'pt': """Muito obrigado por esse vídeo, me ajudou demais e está muito bem explicado. Eu adoro o seu
+        canal, você sempre posta conteúdo incrível. Acompanho seus vídeos há anos e cada vez ficam
+        melhores. Você poderia fazer um tutorial sobre as funções avançadas? O som estava um pouco baixo
+        mas o conteúdo é excelente. Que explicação boa, finalmente eu entendi. Abraços do Brasil, continue
+        assim mano. Não acredito que isso tem tão poucas visualizações. Essa música me traz muitas
+        lembranças da minha infância. Tomara que você faça mais vídeos assim, de verdade a gente agradece o
+        esforço. Alguém sabe onde eu posso baixar o arquivo? É a melhor coisa que eu vi em muito tempo. Me
+        inscrevi e compartilhei com meus amigos. Que apresentação incrível, o público ficou louco. Acho
+        que a nova atualização tem um erro porque o aplicativo fecha sozinho. Oi gente, quem está
+        assistindo em 2024? Você é o melhor, nunca mude. Ficou incrível, amei o final. Obrigada por
+        compartilhar, nao vejo a hora do proximo video, voce e demais. Que legal, parabéns pelo trabalho, muito
+        top, sempre assisto com a minha família.
+        Muito bom. Vídeo muito bom. Ótimo vídeo. Que lindo. Gostei muito. Top demais. Valeu. Obrigado.""",
+    'fr': """Merci beaucoup pour cette vidéo, elle m'a vraiment aidé et c'est très bien expliqué. J'adore
+        ta chaîne, tu publies toujours du contenu incroyable. Je regarde tes vidéos depuis des années et
+        elles sont de mieux en mieux. Est-ce que tu pourrais faire un tutoriel sur les fonctions avancées ?
+        Le son était un peu faible mais le contenu est excellent. Quelle bonne explication, j'ai enfin
+        compris. Salut de la France, continue comme ça. Je n'arrive pas à croire que cette vidéo a si peu
+        de vues. Cette chanson me rappelle beaucoup de souvenirs de mon enfance. J'espère que tu feras
+        d'autres vidéos comme celle-ci, on apprécie vraiment le travail. Quelqu'un sait où je peux
+        télécharger le fichier ? C'est la meilleure chose que j'ai vue depuis longtemps. Je me suis abonné
+        et je l'ai partagée avec mes amis. Quelle performance incroyable, le public était fou. Je pense que
+        la nouvelle mise à jour a un bug parce que l'application se ferme toute seule. Bonjour à tous, qui
+        regarde en 2024 ? Tu es le meilleur, ne change jamais. Trop bien, j'ai adoré la fin. Super, merci pour le
+        partage, franchement c'est génial et trop drôle, bravo à toute l'équipe.
+        Très bonne vidéo. Trop bien. Génial. Magnifique. J'aime beaucoup. Bravo. Merci beaucoup.""",
+    'de': """Vielen Dank für dieses Video, es hat mir wirklich geholfen und ist sehr gut erklärt. Ich
+        liebe deinen Kanal, du lädst immer großartige Inhalte hoch. Ich schaue deine Videos seit Jahren und
+        sie werden immer besser. Könntest du ein Tutorial über die erweiterten Funktionen machen? Der Ton
+        war etwas leise, aber der Inhalt ist hervorragend. Was für eine gute Erklärung, endlich habe ich es
+        verstanden. Grüße aus Deutschland, mach weiter so. Ich kann nicht glauben, dass das so wenige
+        Aufrufe hat. Dieses Lied weckt so viele Erinnerungen an meine Kindheit. Ich hoffe, du machst mehr
+        Videos wie dieses, wir schätzen die Arbeit wirklich. Weiß jemand, wo ich die Datei herunterladen
+        kann? Das ist das Beste, was ich seit langem gesehen habe. Ich habe abonniert und es mit meinen
+        Freunden geteilt. Was für ein unglaublicher Auftritt, das Publikum war verrückt. Ich glaube, das
+        neue Update hat einen Fehler, weil die App ständig abstürzt. Hallo zusammen, wer schaut das im Jahr
+        2024? Du bist der Beste, bleib wie du bist. Das Ende war einfach genial.
+        Sehr gutes Video. Tolles Video. Super gemacht. Echt schön. Gefällt mir sehr. Danke schön.""",
+    'it': """Grazie mille per questo video, mi ha aiutato tantissimo ed è spiegato molto bene. Adoro il
+        tuo canale, pubblichi sempre contenuti incredibili. Guardo i tuoi video da anni e sono sempre
+        migliori. Potresti fare un tutorial sulle funzioni avanzate? L'audio era un po' basso ma il
+        contenuto è ottimo. Che bella spiegazione, finalmente ho capito. Saluti dall'Italia, continua così.
+        Non riesco a credere che abbia così poche visualizzazioni. Questa canzone mi riporta tanti ricordi
+        della mia infanzia. Spero che farai altri video come questo, apprezziamo davvero il lavoro.
+        Qualcuno sa dove posso scaricare il file? È la cosa più bella che ho visto da tanto tempo. Mi sono
+        iscritto e l'ho condiviso con i miei amici. Che esibizione incredibile, il pubblico era impazzito.
+        Credo che il nuovo aggiornamento abbia un errore perché l'applicazione si chiude da sola. Ciao a
+        tutti, chi lo guarda nel 2024? Sei il migliore, non cambiare mai. Bellissimo, mi è piaciuto tanto
+        il finale.
+        Bel video. Ottimo video. Molto bello. Bravissimo. Che bello. Grazie mille. Fantastico.""",
+    'nl': """Heel erg bedankt voor deze video, hij heeft me echt geholpen en is heel goed uitgelegd. Ik hou
+        van je kanaal, je uploadt altijd geweldige inhoud. Ik kijk al jaren naar je video's en ze worden
+        steeds beter. Zou je een tutorial over de geavanceerde functies kunnen maken? Het geluid was een
+        beetje zacht maar de inhoud is uitstekend. Wat een goede uitleg, eindelijk snap ik het. Groetjes
+        uit Nederland, ga zo door. Ik kan niet geloven dat dit zo weinig weergaven heeft. Dit nummer brengt
+        zoveel herinneringen aan mijn jeugd terug. Ik hoop dat je meer video's zoals deze maakt, we
+        waarderen het werk echt. Weet iemand waar ik het bestand kan downloaden? Dit is het beste wat ik in
+        lange tijd heb gezien. Ik heb me geabonneerd en het met mijn vrienden gedeeld. Wat een ongelooflijk
+        optreden, het publiek ging helemaal los. Ik denk dat de nieuwe update een fout heeft want de app
+        sluit steeds vanzelf. Hallo allemaal, wie kijkt dit in 2024? Jij bent de beste, verander nooit.
+        Mooie video. Heel mooi. Goede video. Echt leuk. Super gedaan. Dank je wel. Prachtig.""",
+    'id': """Terima kasih banyak untuk video ini, sangat membantu dan dijelaskan dengan sangat baik. Saya
+        suka banget channel kamu, kontennya selalu keren. Saya sudah menonton video kamu bertahun-tahun dan
+        semakin bagus. Bisakah kamu membuat tutorial tentang fitur lanjutan? Suaranya agak kecil tapi
+        isinya sangat bagus. Penjelasan yang bagus sekali, akhirnya saya mengerti. Salam dari Indonesia,
+        semangat terus bang. Saya tidak percaya video ini cuma punya sedikit penonton. Lagu ini
+        mengingatkan saya pada masa kecil. Semoga kamu membuat lebih banyak video seperti ini, kami sangat
+        menghargai kerja kerasnya. Ada yang tahu di mana saya bisa mengunduh filenya? Ini yang terbaik yang
+        pernah saya lihat dalam waktu lama. Saya sudah subscribe dan membagikannya ke teman-teman.
+        Penampilan yang luar biasa, penontonnya jadi heboh. Sepertinya pembaruan terbaru ada masalah
+        karena aplikasinya sering tertutup sendiri. Halo semuanya, siapa yang nonton di tahun 2024? Kamu
+        yang terbaik, jangan pernah berubah.
+        Videonya bagus. Keren banget. Mantap. Bagus sekali. Lucu banget. Makasih banyak.""",
+    'tr': """Bu video için çok teşekkürler, gerçekten çok yardımcı oldu ve çok güzel anlatılmış.
+        Kanalını çok seviyorum, her zaman harika içerikler yüklüyorsun. Yıllardır videolarını izliyorum ve
+        her seferinde daha iyi oluyor. Gelişmiş özellikler hakkında bir eğitim yapabilir misin? Ses biraz
+        düşüktü ama içerik mükemmel. Ne güzel bir anlatım, sonunda anladım. Türkiye'den selamlar, böyle
+        devam et. Bu videonun bu kadar az izlenmesine inanamıyorum. Bu şarkı bana çocukluğumu
+        hatırlatıyor. Umarım bunun gibi daha fazla video yaparsın, emeğine gerçekten çok teşekkür ederiz.
+        Dosyayı nereden indirebileceğimi bilen var mı? Uzun zamandır gördüğüm en iyi şey bu. Abone oldum ve
+        arkadaşlarımla paylaştım. İnanılmaz bir performans, seyirciler çılgına döndü. Sanırım yeni
+        güncellemede bir hata var çünkü uygulama sürekli kapanıyor. Herkese merhaba, 2024'te kim izliyor?
+        Sen en iyisisin, asla değişme.
+        Çok güzel video. Harika. Süper olmuş. Çok iyi. Bayıldım. Teşekkürler.""",
+    'vi': """Cảm ơn bạn rất nhiều vì video này, nó thật sự rất hữu ích và giải thích rất dễ hiểu. Mình
+        rất thích kênh của bạn, lúc nào cũng có nội dung hay. Mình đã xem video của bạn nhiều năm rồi và
+        ngày càng hay hơn. Bạn có thể làm một video hướng dẫn về các tính năng nâng cao không? Âm thanh hơi
+        nhỏ nhưng nội dung rất tuyệt. Giải thích hay quá, cuối cùng mình cũng hiểu. Chào từ Việt Nam, cố
+        lên nhé. Không thể tin được video này lại có ít lượt xem như vậy. Bài hát này làm mình nhớ lại tuổi
+        thơ. Mong bạn làm thêm nhiều video như thế này, mọi người thật sự trân trọng công sức của bạn. Có
+        ai biết chỗ tải tập tin không? Đây là thứ hay nhất mình xem trong thời gian dài. Mình đã đăng ký và
+        chia sẻ cho bạn bè. Màn trình diễn tuyệt vời, khán giả phát cuồng. Mình nghĩ bản cập nhật mới bị
+        lỗi vì ứng dụng cứ tự tắt. Xin chào mọi người, ai đang xem năm 2024? Bạn là tuyệt nhất, đừng bao
+        giờ thay đổi.
+        Video hay quá. Rất hay. Tuyệt vời. Hay lắm. Cảm ơn nhiều.""",
+}
+
+NGRAM_SIZES = (1, 2, 3)
+# 最佳语言比第二名至少高出这么多 (对数似然, 自然对数) 才采用, 否则为 'und'
+MIN_MARGIN = 3.0
+# 字母少于这个数的文本 (如 "ok") 不判断
+MIN_LETTERS = 3
+_SMOOTHING = 0.5
+_model = None
+# 评论里的词重复很多, 每个词的得分只算一次
+_word_cache = {}
+_WORD_CACHE_SIZE = 200000
+
+
+def _ngrams(word):
+    """词前后加空格后的 1~3 字符 n-gram"""
+    padded = f' {word} '
+    return [padded[i:i + n] for n in NGRAM_SIZES for i in range(len(padded) - n + 1) if padded[i:i + n].strip()]
+
+
+def _build_model():
+    """返回 (languages, n-gram -> 行号, 对数概率矩阵 [n-gram, 语言])"""
+    from collections import Counter
+    import numpy as np
+    languages = list(_SAMPLES)
+    counts = {lang: Counter(g for word in _WORD.findall(text.lower()) for g in _ngrams(word))
+              for lang, text in _SAMPLES.items()}
+    vocabulary = set().union(*counts.values())
+    totals = np.array([sum(counts[lang].values()) for lang in languages], dtype=float)
+    denominators = np.log(totals + _SMOOTHING * len(vocabulary))
+    rows = {g: i for i, g in enumerate(sorted(vocabulary))}
+    matrix = np.array([[counts[lang][g] for lang in languages] for g in rows], dtype=float)
+    return languages, rows, np.log(matrix + _SMOOTHING) - denominators
+
+
+def _word_scores(word):
+    """一个词的 n-gram 对数概率之和 (各语言), 训练文本里没有的 n-gram 对各语言几乎一样, 不计入"""
+    scores = _word_cache.get(word)
+    if scores is None:
+        languages, rows, logprobs = _model
+        known = [rows[g] for g in _ngrams(word) if g in rows]
+        scores = logprobs[known].sum(axis=0)
+        if len(_word_cache) >= _WORD_CACHE_SIZE:
+            _word_cache.clear()
+        _word_cache[word] = scores
+    return scores
+
+
+def _latin_language(text, min_margin):
+    """拉丁字母文本: 各语言 n-gram 对数似然之和, 第一名领先不足 min_margin 时为 'und'"""
+    global _model
+    if _model is None:
+        _model = _build_model()
+    words = _WORD.findall(text.lower())
+    if sum(len(word) for word in words) < MIN_LETTERS:
+        return UNDETERMINED
+    scores = sum(_word_scores(word) for word in words)
+    order = scores.argsort()
+    if scores[order[-1]] - scores[order[-2]] < min_margin:
+        return UNDETERMINED
+    return _model[0][order[-1]]
+
+
+def detect_language(text, min_margin=MIN_MARGIN):
+    """返回单条文本的语言代码, 无法判断时返回 'und'"""
+    if not isinstance(text, str) or not text.strip():
+        return UNDETERMINED
+
+    # 1. 非拉丁文字: 按出现最多的文字系统判断
+    if _NON_LATIN.search(text):
+        counts = {}
+        for lang, pattern in _SCRIPTS:
+            n = len(pattern.findall(text))
+            if n:
+                counts[lang] = n
+        if 'ja' in counts:
+            counts['ja'] += counts.pop('zh', 0)
+        if counts:
+            latin = len(_LATIN.findall(text))
+            lang = max(counts, key=counts.get)
+            if counts[lang] >= latin:
+                if lang == 'ru' and _UKRAINIAN.search(text):
+                    return 'uk'
+                return lang
+
+    # 2. 拉丁文字: 字符 n-gram 模型
+    return _latin_language(text, min_margin)
+
+
+def detect_languages(texts):
+    """批量判断语言, 重复文本只判断一次, 返回与texts同索引的Series"""
+    texts = pd.Series(texts)
+    unique = pd.unique(texts.fillna(''))
+    mapping = {text: detect_language(text) for text in unique}
+    return texts.fillna('').map(mapping)
@@ -0,0 +1,525 @@
+"""
+Part 3: Streaming pipeline (collect -> score -> load)
+
+ytcoll.py 抓完全部数据再写CSV, 然后再运行 ytanalysis.py. 这里把三步串成一个流水线:
+
+    视频队列 -> [抓取workers] -> 评论页队列 -> [评分workers] -> 结果队列 -> [sink]
+
+队列都有上限, 下游慢时上游会等待 (backpressure). 抓取在线程里做 (googleapiclient是阻塞的),
+评分在进程池里做 (VADER/TextBlob 是纯Python, 受GIL限制), sink 按小批量写出.
+
+usage:
+python ytpipeline.py --channel-username GoogleDevelopers --fetch-workers 4 --score-workers 2 --sink parquet
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+from ytrecords import CommentRecord, frame_to_records, records_to_frame
+from yttrending import add_detector_arguments
+from ytcoll import (YouTubeDataCollector, create_sentiment_table, load_config, save_comment_sentiment, write_summary,
+                    EXIT_OK, EXIT_FAILED, EXIT_CONFIG_ERROR)
+
+PIPELINE_SINKS = ('csv', 'parquet', 'postgres')
+
+# 评分进程内的分析器, 每个进程创建一次
+_analyzer = None
+
+
+def score_page(records, scorer_names, detect_language=True):
+    """给一页评论评分 (在评分进程中运行), 返回带得分的DataFrame"""
+    global _analyzer
+    from ytanalysis import YouTubeSentimentAnalyzer, SCORE_TARGETS
+    if _analyzer is None:
+        _analyzer = YouTubeSentimentAnalyzer()
+
+    df = records_to_frame(records, CommentRecord)
+    df['cleaned_text'] = df['comment_text'].map(_analyzer.clean_text)
+    languages = None
+    if detect_language:
+        from ytlang import detect_languages
+        df['lang'] = detect_languages(df['cleaned_text'])
+        languages = df['lang']
+    _analyzer.score_texts(df, df['cleaned_text'], scorer_names, SCORE_TARGETS['comments'], languages)
+    df['scored_at'] = datetime.now(timezone.utc).isoformat()
+    return df
+
+
+class CsvSink:
+    """追加写入 comments_with_sentiment_<timestamp>.csv"""
+
+    def __init__(self, output_dir, timestamp):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = f"{output_dir}/comments_with_sentiment_{timestamp}.csv"
+        self.columns = None
+        self.rows = 0
+
+    def write(self, df):
+        self.rows += len(df)
+        if self.columns is None:
+            self.columns = list(df.columns)
+            df.to_csv(self.path, index=False, encoding='utf-8-sig')
+        elif list(df.columns) != self.columns:
+            # 文件头由第一批决定, 列变了不能悄悄丢掉或补空
+            raise ValueError(f"batch columns differ from the header of {self.path}: "
+                             f"missing {sorted(set(self.columns) - set(df.columns))}, "
+                             f"extra {sorted(set(df.columns) - set(self.columns))}")
+        else:
+            df.to_csv(self.path, mode='a', header=False, index=False)
+
+    def close(self):
+        return self.path
+
+
+class ParquetSink:
+    """每个批次写一个 part-NNNNN.parquet 文件 (需要 pyarrow)"""
+
+    def __init__(self, output_dir, timestamp):
+        self.path = f"{output_dir}/comments_with_sentiment_{timestamp}"
+        os.makedirs(self.path, exist_ok=True)
+        self.parts = 0
+        self.columns = None
+        self.rows = 0
+
+    def write(self, df):
+        self.parts += 1
+        self.rows += len(df)
+        self.columns = self.columns or list(df.columns)
+        df.to_parquet(f"{self.path}/part-{self.parts:05d}.parquet", index=False)
+
+    def close(self):
+        return self.path
+
+
+class PostgresSink:
+    """评论写入 youtube_comments, 得分写入 youtube_comment_sentiment"""
+
+    def __init__(self, collector, db_config, prefix='vader'):
+        import psycopg2
+        self.collector = collector
+        self.prefix = prefix
+        from ytdigest import STATUSES
+        self.changes = dict.fromkeys(STATUSES, 0)
+        self.conn = psycopg2.connect(**db_config)
+        cursor = self.conn.cursor()
+        collector._create_tables(cursor)
+        create_sentiment_table(cursor)
+        # 评论的外键依赖频道和视频
+        collector._insert_channel_data(cursor, collector.channel_data)
+        collector._insert_video_data(cursor, collector.video_data)
+        self.conn.commit()
+        cursor.close()
+
+    def write(self, df):
+        index = self.collector.digest_index
+        if index is not None:
+            # 跳过没有变化的评论; 得分在这里一起写入, 同时清除 needs_rescore
+            status = index.diff(df)
+            for name, count in index.counts(status).items():
+                self.changes[name] += count
+            df = df[status != 'unchanged']
+            if len(df) == 0:
+                return
+        cursor = self.conn.cursor()
+        raw = frame_to_records(df, CommentRecord)
+        if index is not None:
+            self.collector._upsert_comment_data(cursor, raw)
+        else:
+            self.collector._insert_comment_data(cursor, raw)
+
+        scores = df.reindex(columns=['comment_id', 'lang'] + [f'{self.prefix}_{c}' for c in
+                                                              ['compound', 'pos', 'neu', 'neg', 'sentiment']]
+                            + ['scored_at'])
+        save_comment_sentiment(cursor, frame_to_records(scores))
+        self.conn.commit()
+        cursor.close()
+        if index is not None:
+            index.update(df)
+
+    def close(self):
+        self.conn.close()
+        if self.collector.digest_index is not None:
+            self.collector.digest_index.save()
+            return {'postgres': self.changes}
+        return 'postgres'
+
+
+class TrendSink:
+    """评论到达时做评论量/情感反转检测, 告警写入文件或 youtube_alerts 表 (见 yttrending.py)"""
+
+    def __init__(self, detector, alerts, prefix='vader'):
+        self.detector = detector
+        self.alerts = alerts
+        self.column = f'{prefix}_compound'
+
+    def write(self, df):
+        self._write(self.detector.observe_frame(df, self.column))
+
+    def _write(self, alerts):
+        for alert in alerts:
+            print(f"  ⚠ {alert['kind']}: {alert['video_id']} (value {alert['value']}, baseline {alert['baseline']})")
+        self.alerts.write(alerts)
+
+    def close(self):
+        # 重排窗口里还没处理的评论
+        self._write(self.detector.flush())
+        return {'alerts': self.alerts.close(), 'count': self.alerts.written, 'late': self.detector.late}
+
+
+class SearchSink:
+    """评论加入全文索引 (ytsearch.py), 攒够 segment_rows 条写一个段"""
+
+    def __init__(self, path, prefix='vader', segment_rows=100000):
+        from ytsearch import SearchIndex
+        self.index = SearchIndex(path)
+        self.column = f'{prefix}_compound'
+        self.segment_rows = segment_rows
+        self.frames = []
+        self.rows = 0
+        self.added = 0
+
+    def write(self, df):
+        self.frames.append(df)
+        self.rows += len(df)
+        if self.rows >= self.segment_rows:
+            self.flush()
+
+    def flush(self):
+        if self.frames:
+            import pandas as pd
+            self.added += self.index.add(pd.concat(self.frames, ignore_index=True), self.column)
+            self.frames, self.rows = [], 0
+
+    def close(self):
+        self.flush()
+        return {'search_index': self.index.path, 'added': self.added}
+
+
+def close_sinks(sinks):
+    """关闭所有sink, 返回各自的 close() 结果; 关闭出错的sink记为 {'error': ...}"""
+    outputs = []
+    for sink in sinks:
+        try:
+            outputs.append(sink.close())
+        except Exception as e:
+            print(f"✗ Sink Close Error: {type(e).__name__}: {e}")
+            outputs.append({'error': f"{type(e).__name__}: {e}"})
+    return outputs
+
+
+class PipelineMetrics:
+    """吞吐量和延迟 (评论页抓取完成 -> 写入sink)"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.pages = 0
+        self.comments = 0
+        self.written = 0
+        self.latencies = []
+
+    def summary(self):
+        import numpy as np
+        elapsed = time.time() - self.started
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            'pages': self.pages,
+            'comments': self.comments,
+            'written': self.written,
+            'elapsed_seconds': round(elapsed, 3),
+            'comments_per_second': round(self.written / elapsed, 1) if elapsed > 0 else None,
+            'latency_p50_seconds': round(float(np.percentile(latencies, 50)), 3),
+            'latency_p95_seconds': round(float(np.percentile(latencies, 95)), 3),
+            'latency_max_seconds': round(float(latencies.max()), 3),
+        }
+
+
+async def run_pipeline(collector, videos, sinks, scorer_names, fetch_workers=4, score_workers=1,
+                       queue_size=32, batch_rows=1000, flush_seconds=1.0,
+                       max_comments_per_video=100, detect_language=True):
+    """运行流水线, 返回 PipelineMetrics"""
+    import pandas as pd
+
+    metrics = PipelineMetrics()
+    video_queue = asyncio.Queue()
+    page_queue = asyncio.Queue(maxsize=queue_size)
+    scored_queue = asyncio.Queue(maxsize=queue_size)
+    for video in videos:
+        video_queue.put_nowait(video)
+
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=score_workers) if score_workers > 1 else None
+
+    async def fetcher():
+        while True:
+            try:
+                video = video_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            pages = collector.iter_comment_pages(video.video_id, max_comments_per_video)
+            while True:
+                page = await asyncio.to_thread(next, pages, None)
+                if page is None:
+                    break
+                metrics.pages += 1
+                metrics.comments += len(page)
+                # 队列满时在这里等待
+                await page_queue.put((time.time(), page))
+
+    async def scorer():
+        while True:
+            item = await page_queue.get()
+            if item is None:
+                return
+            fetched_at, page = item
+            df = await loop.run_in_executor(executor, score_page, page, scorer_names, detect_language)
+            await scored_queue.put((fetched_at, df))
+
+    async def sink_writer():
+        frames, fetched = [], []
+        rows = 0
+        done = False
+        while not done:
+            try:
+                item = await asyncio.wait_for(scored_queue.get(), timeout=flush_seconds)
+                if item is None:
+                    done = True
+                else:
+                    fetched.append(item[0])
+                    frames.append(item[1])
+                    rows += len(item[1])
+            except asyncio.TimeoutError:
+                pass
+            # 攒够一批, 或者一段时间没有新数据, 就写出
+            if frames and (done or rows >= batch_rows or scored_queue.empty()):
+                batch = pd.concat(frames, ignore_index=True)
+                for sink in sinks:
+                    await asyncio.to_thread(sink.write, batch)
+                now = time.time()
+                metrics.latencies.extend(now - t for t in fetched)
+                metrics.written += len(batch)
+                print(f"  ✓ 写入 {len(batch):,} 条评论 (累计 {metrics.written:,})")
+                frames, fetched, rows = [], [], 0
+
+    async def finish_stages():
+        """抓取结束后依次给下游发结束标记"""
+        await asyncio.gather(*fetchers)
+        for _ in scorers:
+            await page_queue.put(None)
+        await asyncio.gather(*scorers)
+        await scored_queue.put(None)
+        await writer
+
+    fetchers = [asyncio.create_task(fetcher()) for _ in range(max(1, fetch_workers))]
+    scorers = [asyncio.create_task(scorer()) for _ in range(max(1, score_workers))]
+    writer = asyncio.create_task(sink_writer())
+    tasks = fetchers + scorers + [writer, asyncio.create_task(finish_stages())]
+    failed = True
+    try:
+        # 任何一个阶段出错就停止: 否则上游会一直等在已满的队列上
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        failed = False
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in (video_queue, page_queue, scored_queue):
+            while not queue.empty():
+                queue.get_nowait()
+        if executor is not None:
+            executor.shutdown(wait=not failed, cancel_futures=failed)
+    return metrics
+
+
+def parse_args(argv=None):
+    """解析命令行参数, --config中的值作为默认值"""
+    load_dotenv()
+
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument('--config')
+    pre_args, _ = pre.parse_known_args(argv)
+
+    parser = argparse.ArgumentParser(description='YouTube streaming pipeline', parents=[pre])
+    parser.add_argument('--api-key', default=os.getenv('YOUTUBE_API_KEY', 'YOUR_API_KEY_HERE'))
+    channel = parser.add_mutually_exclusive_group()
+    channel.add_argument('--channel-id', default=os.getenv('CHANNEL_ID'))
+    channel.add_argument('--channel-url', default=os.getenv('CHANNEL_URL'))
+    channel.add_argument('--channel-username', default=os.getenv('CHANNEL_USERNAME'))
+
+    parser.add_argument('--max-videos', type=int, default=int(os.getenv('MAX_VIDEOS', '50')))
+    parser.add_argument('--max-comments-per-video', type=int,
+                        default=int(os.getenv('MAX_COMMENTS_PER_VIDEO', '100')))
+    parser.add_argument('--max-videos-for-comments', type=int,
+                        default=int(os.getenv('MAX_VIDEOS_FOR_COMMENTS', '20')))
+
+    parser.add_argument('--fetch-workers', type=int, default=4, help='concurrent comment fetchers')
+    parser.add_argument('--score-workers', type=int, default=1, help='scoring processes')
+    parser.add_argument('--queue-size', type=int, default=32, help='max pages waiting between stages')
+    parser.add_argument('--batch-rows', type=int, default=1000, help='rows per sink write')
+    parser.add_argument('--comment-scorers', default='vader')
+    parser.add_argument('--no-language-detection', action='store_true')
+
+    parser.add_argument('--sink', dest='sinks', action='append', choices=PIPELINE_SINKS, default=None,
+                        help='output, can be repeated (default: csv)')
+    parser.add_argument('--output-dir', default='youtube_data')
+    parser.add_argument('--db-host', default=os.getenv('DB_HOST') or 'localhost')
+    parser.add_argument('--db-name', default=os.getenv('DB_NAME') or 'youtube_data')
+    parser.add_argument('--db-user', default=os.getenv('DB_USER') or 'postgres')
+    parser.add_argument('--db-password', default=os.getenv('DB_PASSWORD') or 'your_password')
+    parser.add_argument('--db-port', type=int, default=int(os.getenv('DB_PORT') or 5432))
+    parser.add_argument('--digest-index', help='comment digest file; the postgres sink skips unchanged comments')
+    parser.add_argument('--search-index', help='full-text index directory (ytsearch.py) to add comments to')
+    parser.add_argument('--alerts', help="trend alerts file (.csv/.jsonl), or 'postgres' for table youtube_alerts")
+    add_detector_arguments(parser)
+    parser.add_argument('--summary', help="JSON run summary file ('-' for stdout)")
+
+    config_sinks = None
+    if pre_args.config:
+        config = load_config(pre_args.config)
+        known = {action.dest for action in parser._actions}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            parser.error(f"unknown keys in {pre_args.config}: {', '.join(unknown)}")
+        if isinstance(config.get('comment_scorers'), list):
+            config['comment_scorers'] = ','.join(config['comment_scorers'])
+        # action='append' 会把命令行的 --sink 追加到默认值上, 所以 sinks 不作为默认值,
+        # 解析后再决定: 命令行 > 配置文件 > csv
+        config_sinks = config.pop('sinks', None)
+        if isinstance(config_sinks, str):
+            config_sinks = [config_sinks]
+        parser.set_defaults(**config)
+
+    args = parser.parse_args(argv)
+    args.sinks = args.sinks or config_sinks or ['csv']
+    for sink in args.sinks:
+        if sink not in PIPELINE_SINKS:
+            parser.error(f"invalid sink: {sink}")
+    args.comment_scorers = [s.strip() for s in args.comment_scorers.split(',') if s.strip()]
+    for name in ('fetch_workers', 'score_workers', 'queue_size', 'batch_rows'):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be >= 1")
+    return args
+
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+    except (OSError, ValueError) as e:
+        print(f"✗ Config Error: {e}")
+        return EXIT_CONFIG_ERROR
+
+    from ytanalysis import SCORERS
+    invalid = [name for name in args.comment_scorers if name not in SCORERS]
+    if invalid:
+        print(f"✗ Config Error: unknown scorers: {', '.join(invalid)}")
+        return EXIT_CONFIG_ERROR
+
+    summary = {'tool': 'ytpipeline', 'status': 'failed', 'exit_code': EXIT_FAILED,
+               'started_at': datetime.now().isoformat(), 'sinks': args.sinks}
+    collector = None
+
+    def finish(exit_code, status):
+        summary['exit_code'] = exit_code
+        summary['status'] = status
+        if collector is not None:
+            summary['requests'] = collector.meter.summary()
+        write_summary(summary, args.summary)
+        return exit_code
+
+    if not args.api_key or args.api_key == 'YOUR_API_KEY_HERE':
+        print("✗ Error: Please Use a valid API KEY! (YOUTUBE_API_KEY in .env or --api-key)")
+        return finish(EXIT_CONFIG_ERROR, 'config_error')
+
+    digest_index = None
+    if args.digest_index:
+        from ytdigest import CommentDigestIndex
+        digest_index = CommentDigestIndex(args.digest_index).load()
+    collector = YouTubeDataCollector(args.api_key, workers=args.fetch_workers, digest_index=digest_index)
+    channel_id = collector.resolve_channel_id(args.channel_id, args.channel_url, args.channel_username)
+    if not channel_id:
+        return finish(EXIT_FAILED, 'channel_not_found')
+
+    print("=" * 60)
+    print("YouTube Streaming Pipeline")
+    print("=" * 60)
+
+    channel_stats = collector.get_channel_stats(channel_id)
+    if not channel_stats:
+        return finish(EXIT_FAILED, 'channel_stats_failed')
+    collector.discover_videos(channel_stats.uploads_playlist, max_results=args.max_videos)
+    summary['channel_id'] = channel_id
+    summary['videos'] = len(collector.video_data)
+
+    import ytcatalog
+    timestamp = ytcatalog.new_timestamp(args.output_dir)
+    sinks = []
+    try:
+        if 'csv' in args.sinks or 'parquet' in args.sinks:
+            # 频道和视频数据照常导出
+            summary['files'] = collector.export_to_csv(args.output_dir, timestamp=timestamp)
+        if 'csv' in args.sinks:
+            sinks.append(CsvSink(args.output_dir, timestamp))
+        if 'parquet' in args.sinks:
+            sinks.append(ParquetSink(args.output_dir, timestamp))
+        primary = next((name for name in args.comment_scorers if SCORERS[name]['primary']), 'vader')
+        db_config = {
+            'host': args.db_host, 'database': args.db_name, 'user': args.db_user,
+            'password': args.db_password, 'port': args.db_port
+        }
+        if 'postgres' in args.sinks:
+            sinks.append(PostgresSink(collector, db_config, prefix=SCORERS[primary]['prefix']))
+        if args.search_index:
+            sinks.append(SearchSink(args.search_index, prefix=SCORERS[primary]['prefix']))
+        if args.alerts:
+            from yttrending import detector_from_args, open_alerts
+            detector = detector_from_args(args)
+            sinks.append(TrendSink(detector, open_alerts(args.alerts, db_config, detector.bucket_seconds),
+                                   prefix=SCORERS[primary]['prefix']))
+    except Exception as e:
+        print(f"✗ Sink Error: {type(e).__name__}: {e}")
+        return finish(EXIT_FAILED, 'sink_failed')
+
+    videos = collector.video_data[:args.max_videos_for_comments]
+    print(f"\nStreaming comments of {len(videos)} videos...")
+    try:
+        metrics = asyncio.run(run_pipeline(
+            collector, videos, sinks, args.comment_scorers,
+            fetch_workers=args.fetch_workers, score_workers=args.score_workers,
+            queue_size=args.queue_size, batch_rows=args.batch_rows,
+            max_comments_per_video=args.max_comments_per_video,
+            detect_language=not args.no_language_detection
+        ))
+    except Exception as e:
+        print(f"✗ Pipeline Error: {type(e).__name__}: {e}")
+        return finish(EXIT_FAILED, 'pipeline_failed')
+    finally:
+        summary['outputs'] = close_sinks(sinks)
+
+    summary['metrics'] = metrics.summary()
+    manifest_file = (summary.get('files') or {}).get('manifest_file')
+    if manifest_file:
+        # 评分过的评论文件记进这次导出的manifest, ytanalysis --snapshots latest 才能读到评论
+        comment_sink = next((sink for sink in sinks if isinstance(sink, CsvSink)), None) \
+            or next((sink for sink in sinks if isinstance(sink, ParquetSink)), None)
+        if comment_sink is not None and comment_sink.rows:
+            ytcatalog.add_file(manifest_file, 'comment', comment_sink.path, comment_sink.rows, comment_sink.columns,
+                               'parquet' if isinstance(comment_sink, ParquetSink) else 'csv')
+    print("\n" + "=" * 60)
+    print(f"✓ {metrics.written:,} comments scored and written")
+    print(f"  latency p50 {summary['metrics']['latency_p50_seconds']}s, "
+          f"p95 {summary['metrics']['latency_p95_seconds']}s, "
+          f"{summary['metrics']['comments_per_second']} comments/s")
+    print("=" * 60)
+    return finish(EXIT_OK, 'ok')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
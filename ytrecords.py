@@ -0,0 +1,134 @@
+"""
+Typed row records for collected data
+
+采集的每一行是一个 NamedTuple, 没有每行重复的字典键, 内存比dict少约四成.
+导出时用 records_to_frame 直接转成 DataFrame, 列顺序固定为字段顺序.
+collected_at 每个API响应取一次 (UTC), 同一页的行共用同一个字符串.
+
+记录里的时间和时长是API返回的字符串; 转成DataFrame时一次性向量化解析 (typed_columns):
+    published_at / updated_at / collected_at    datetime64[ns, UTC], 无法解析为 NaT
+    duration (ISO 8601, 如 PT1H2M3S)            另加 duration_seconds 列 (Int64, 无法解析为 <NA>)
+下游 (统计、画图、汇总表、导出) 直接用这些列, 不再逐行解析字符串.
+写数据库前用 frame_to_records 转回Python对象 (datetime 和 None).
+"""
+
+from typing import NamedTuple
+
+
+class ChannelRecord(NamedTuple):
+    channel_id: str
+    channel_name: str
+    channel_description: str
+    subscribers: int
+    total_views: int
+    total_videos: int
+    country: str
+    published_at: str
+    uploads_playlist: str
+    collected_at: str
+
+
+class VideoRecord(NamedTuple):
+    video_id: str
+    channel_id: str
+    title: str
+    description: str
+    published_at: str
+    tags: str
+    category_id: str
+    duration: str
+    definition: str
+    caption: str
+    view_count: int
+    like_count: int
+    comment_count: int
+    collected_at: str
+
+
+class CommentRecord(NamedTuple):
+    video_id: str
+    comment_id: str
+    author: str
+    comment_text: str
+    like_count: int
+    published_at: str
+    updated_at: str
+    reply_count: int
+    collected_at: str
+
+
+TIMESTAMP_COLUMNS = ('published_at', 'updated_at', 'collected_at')
+
+# P[nW][nD][T[nH][nM][n[.n]S]], YouTube 的 duration 只用到 D/H/M/S (直播为 P0D)
+DURATION_PATTERN = (r'^P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+                    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$')
+DURATION_UNITS = {'weeks': 604800, 'days': 86400, 'hours': 3600, 'minutes': 60, 'seconds': 1}
+
+
+def parse_timestamps(values):
+    """ISO 8601 字符串 (带或不带时区, 不带时按UTC) -> datetime64[ns, UTC] Series"""
+    import pandas as pd
+    return pd.to_datetime(pd.Series(values), utc=True, errors='coerce', format='ISO8601')
+
+
+def parse_durations(values):
+    """ISO 8601 时长 -> 秒数 (Int64 Series), 空值或格式不对为 <NA>"""
+    import pandas as pd
+    if not isinstance(values, pd.Series):
+        values = pd.Series(values, dtype=object)
+    # 时长的取值很少, 只解析不同的值
+    codes, uniques = pd.factorize(values)
+    parts = pd.Series(uniques, dtype='string').str.strip().str.upper().str.extract(DURATION_PATTERN)
+    seconds = sum(pd.to_numeric(parts[unit]).fillna(0) * factor for unit, factor in DURATION_UNITS.items())
+    # 'P' 或 'PT' 这样没有任何数字的也算无效
+    seconds = seconds.round().astype('Int64').where(parts.notna().any(axis=1))
+    return pd.Series(seconds.array.take(codes, allow_fill=True), index=values.index)
+
+
+def typed_columns(df):
+    """把 df 中的时间列转成 datetime64[ns, UTC], 有 duration 时加 duration_seconds (原地修改并返回 df)
+
+    已经转换过的列不会重复解析; duration_seconds 已存在时只补空值
+    """
+    import pandas as pd
+    for column in TIMESTAMP_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.DatetimeTZDtype):
+            df[column] = parse_timestamps(df[column])
+    if 'duration' in df.columns and 'duration_seconds' not in df.columns:
+        df.insert(df.columns.get_loc('duration') + 1, 'duration_seconds', parse_durations(df['duration']))
+        return df
+    if 'duration_seconds' in df.columns and df['duration_seconds'].dtype != 'Int64':
+        # 从CSV读回时为 int64 或 float64 (有空值)
+        df['duration_seconds'] = pd.to_numeric(df['duration_seconds'], errors='coerce').round().astype('Int64')
+    if 'duration' in df.columns and 'duration_seconds' in df.columns and df['duration_seconds'].hasnans:
+        # 新旧导出合并或数据库里加列之前的行: 空的 duration_seconds 从 duration 补上
+        missing = df['duration_seconds'].isna()
+        df.loc[missing, 'duration_seconds'] = parse_durations(df.loc[missing, 'duration'])
+    return df
+
+
+def frame_to_records(df, record_type=None):
+    """DataFrame -> 行元组 (record_type 给定时按其字段取列, 返回该类型的记录), 供数据库驱动使用
+
+    时间列转成 datetime.datetime, NaN / NaT / <NA> 转成 None, 其余值转成Python对象 (psycopg2 不能适配 NaT)
+    """
+    import pandas as pd
+    if record_type is not None:
+        df = df[list(record_type._fields)]
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if column.dtype.kind == 'M':
+            values = pd.Series(column.array.to_pydatetime(), index=column.index, dtype=object)
+        else:
+            values = column.astype(object)
+        columns.append(values.where(column.notna(), None).tolist())
+    rows = zip(*columns)
+    return [record_type._make(row) for row in rows] if record_type is not None else list(rows)
+
+
+def records_to_frame(records, record_type, typed=True):
+    """记录列表 -> DataFrame, 空列表时也保留列名; typed 时解析时间和时长 (见 typed_columns)"""
+    import pandas as pd
+    df = pd.DataFrame.from_records(records, columns=record_type._fields)
+    return typed_columns(df) if typed else df
@@ -0,0 +1,171 @@
+"""
+Request shaping for YouTube Data API calls
+
+- fields= 部分响应掩码, 由各采集方法实际保存的列推导, 不传输描述缩略图等用不到的字段
+- 所有请求都要求gzip压缩传输
+- 按endpoint统计请求数、失败数、传输字节数 (解压前) 和解压后的JSON大小、压缩响应数, 写入运行摘要
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 保存的列 -> API响应中 items 下的路径
+CHANNEL_COLUMNS = {
+    'channel_name': 'snippet/title',
+    'channel_description': 'snippet/description',
+    'subscribers': 'statistics/subscriberCount',
+    'total_views': 'statistics/viewCount',
+    'total_videos': 'statistics/videoCount',
+    'country': 'snippet/country',
+    'published_at': 'snippet/publishedAt',
+    'uploads_playlist': 'contentDetails/relatedPlaylists/uploads',
+}
+CHANNEL_ID_COLUMNS = {'channel_id': 'id'}
+PLAYLIST_ITEM_COLUMNS = {'video_id': 'contentDetails/videoId'}
+VIDEO_COLUMNS = {
+    'video_id': 'id',
+    'channel_id': 'snippet/channelId',
+    'title': 'snippet/title',
+    'description': 'snippet/description',
+    'published_at': 'snippet/publishedAt',
+    'tags': 'snippet/tags',
+    'category_id': 'snippet/categoryId',
+    'duration': 'contentDetails/duration',
+    'definition': 'contentDetails/definition',
+    'caption': 'contentDetails/caption',
+    'view_count': 'statistics/viewCount',
+    'like_count': 'statistics/likeCount',
+    'comment_count': 'statistics/commentCount',
+}
+COMMENT_COLUMNS = {
+    'comment_id': 'snippet/topLevelComment/id',
+    'author': 'snippet/topLevelComment/snippet/authorDisplayName',
+    'comment_text': 'snippet/topLevelComment/snippet/textDisplay',
+    'like_count': 'snippet/topLevelComment/snippet/likeCount',
+    'published_at': 'snippet/topLevelComment/snippet/publishedAt',
+    'updated_at': 'snippet/topLevelComment/snippet/updatedAt',
+    'reply_count': 'snippet/totalReplyCount',
+}
+
+
+def fields_mask(columns, paging=False):
+    """由 列->路径 映射生成 fields= 掩码, 例如 'nextPageToken,items(id,snippet(title))'"""
+    tree = {}
+    for path in columns.values():
+        node = tree
+        for key in path.split('/'):
+            node = node.setdefault(key, {})
+
+    def render(node):
+        return ','.join(key if not child else f'{key}({render(child)})' for key, child in node.items())
+
+    mask = f'items({render(tree)})'
+    return f'nextPageToken,{mask}' if paging else mask
+
+
+CHANNEL_FIELDS = fields_mask(CHANNEL_COLUMNS)
+CHANNEL_ID_FIELDS = fields_mask(CHANNEL_ID_COLUMNS)
+PLAYLIST_ITEM_FIELDS = fields_mask(PLAYLIST_ITEM_COLUMNS, paging=True)
+VIDEO_FIELDS = fields_mask(VIDEO_COLUMNS)
+COMMENT_FIELDS = fields_mask(COMMENT_COLUMNS, paging=True)
+
+
+class RequestMeter:
+    """按endpoint累计请求统计, 多个线程的客户端共用一个"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, endpoint, status, size, compressed, seconds, decoded_size=None):
+        """status 为 None 表示请求抛出了异常 (连接失败, 超时等); size 是传输的字节数 (解压前)"""
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                'requests': 0, 'errors': 0, 'exceptions': 0, 'bytes': 0, 'decoded_bytes': 0,
+                'gzip_responses': 0, 'seconds': 0.0
+            })
+            stats['requests'] += 1
+            stats['errors'] += status is None or status >= 400
+            stats['exceptions'] += status is None
+            stats['bytes'] += size
+            stats['decoded_bytes'] += size if decoded_size is None else decoded_size
+            stats['gzip_responses'] += compressed
+            stats['seconds'] += seconds
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for endpoint, stats in sorted(self.endpoints.items()):
+                stats = dict(stats, seconds=round(stats['seconds'], 3))
+                stats['bytes_per_request'] = round(stats['bytes'] / stats['requests'])
+                result[endpoint] = stats
+            return result
+
+    def report(self):
+        for endpoint, stats in self.summary().items():
+            print(f"  {endpoint}: {stats['requests']} requests ({stats['errors']} errors), "
+                  f"{stats['bytes'] / 1024:,.1f} KiB transferred, {stats['decoded_bytes'] / 1024:,.1f} KiB decoded "
+                  f"({stats['gzip_responses']} gzip)")
+
+
+_metered_http_class = None
+
+
+def metered_http(meter, **kwargs):
+    """要求gzip压缩并把每个请求记到 meter 的 httplib2.Http (httplib2 按需导入)"""
+    global _metered_http_class
+    if _metered_http_class is None:
+        import httplib2
+
+        class MeteredHttp(httplib2.Http):
+            def __init__(self, meter, **kwargs):
+                super().__init__(**kwargs)
+                self.meter = meter
+                self.wire_bytes = 0
+
+            def _conn_request(self, conn, request_uri, method, body, headers):
+                # httplib2 读完响应后就解压, 所以在读取处记录解压前的字节数 (包括重试和重定向)
+                getresponse = conn.getresponse
+
+                def metered_getresponse():
+                    response = getresponse()
+                    read = response.read
+
+                    def metered_read(*args):
+                        data = read(*args)
+                        self.wire_bytes += len(data)
+                        return data
+
+                    response.read = metered_read
+                    return response
+
+                conn.getresponse = metered_getresponse
+                try:
+                    return super()._conn_request(conn, request_uri, method, body, headers)
+                finally:
+                    del conn.getresponse
+
+            def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+                headers = dict(headers or {})
+                # Google API 只在 accept-encoding 和 user-agent 都带 gzip 时压缩响应
+                headers['accept-encoding'] = 'gzip'
+                user_agent = headers.get('user-agent', f'Python-httplib2/{httplib2.__version__}')
+                if 'gzip' not in user_agent:
+                    headers['user-agent'] = f'{user_agent} (gzip)'
+
+                endpoint = urlsplit(uri).path.rstrip('/').rsplit('/', 1)[-1] or 'unknown'
+                self.wire_bytes = 0
+                started = time.perf_counter()
+                try:
+                    response, content = super().request(uri, method=method, body=body, headers=headers, **kwargs)
+                except Exception:
+                    self.meter.record(endpoint, None, self.wire_bytes, False, time.perf_counter() - started)
+                    raise
+                self.meter.record(endpoint, response.status, self.wire_bytes,
+                                  response.get('-content-encoding') == 'gzip', time.perf_counter() - started,
+                                  decoded_size=len(content or b''))
+                return response, content
+
+        _metered_http_class = MeteredHttp
+    return _metered_http_class(meter, **kwargs)
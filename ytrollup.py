@@ -0,0 +1,150 @@
+"""
+Incremental sentiment rollups
+
+按视频 / 按天 / 按频道保存评论数、情感得分之和与得分直方图, 每次运行只把新评分的评论加进去.
+统计报告和时间序列图直接读取这些汇总表, 不需要重新扫描全部评论.
+
+目录结构:
+    <path>/meta.json          直方图分箱数, 使用的评分器
+    <path>/video.csv          每个视频一行
+    <path>/day.csv            每天一行
+    <path>/channel.csv        每个频道一行
+    <path>/comment_ids.csv    已经汇总过的 comment_id
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+
+LEVELS = {'video': 'video_id', 'day': 'day', 'channel': 'channel_id'}
+SENTIMENTS = ['positive', 'neutral', 'negative']
+
+
+class RollupStore:
+    def __init__(self, path, bins=20, prefix='vader'):
+        self.path = path
+        self.bins = bins
+        self.prefix = prefix
+        self.tables = {level: None for level in LEVELS}
+        self.seen_ids = pd.Index([], dtype=object)
+
+    @property
+    def hist_columns(self):
+        return [f'hist_{i}' for i in range(self.bins)]
+
+    def load(self):
+        """读取已有的汇总表, 目录不存在时为空"""
+        meta_file = os.path.join(self.path, 'meta.json')
+        if not os.path.exists(meta_file):
+            return self
+        with open(meta_file, encoding='utf-8') as f:
+            meta = json.load(f)
+        self.bins = meta['bins']
+        self.prefix = meta['prefix']
+        for level, key in LEVELS.items():
+            table_file = os.path.join(self.path, f'{level}.csv')
+            if os.path.exists(table_file):
+                self.tables[level] = pd.read_csv(table_file, index_col=key, dtype={key: str})
+        ids_file = os.path.join(self.path, 'comment_ids.csv')
+        if os.path.exists(ids_file):
+            self.seen_ids = pd.Index(pd.read_csv(ids_file, dtype=str)['comment_id'])
+        return self
+
+    def save(self, new_ids=None):
+        """保存汇总表; comment_ids.csv 只追加新的id"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'bins': self.bins, 'prefix': self.prefix}, f)
+        for level, table in self.tables.items():
+            if table is not None:
+                table.to_csv(os.path.join(self.path, f'{level}.csv'))
+        ids_file = os.path.join(self.path, 'comment_ids.csv')
+        if new_ids is not None and os.path.exists(ids_file):
+            pd.DataFrame({'comment_id': new_ids}).to_csv(ids_file, mode='a', header=False, index=False)
+        else:
+            pd.DataFrame({'comment_id': self.seen_ids}).to_csv(ids_file, index=False)
+
+    def is_new(self, df_comments):
+        """还没有汇总过的评论"""
+        return ~df_comments['comment_id'].astype(str).isin(self.seen_ids)
+
+    def update(self, df_comments, df_videos=None):
+        """把新评分的评论加进汇总表, 返回新增的评论数"""
+        new = df_comments[self.is_new(df_comments)]
+        new = new.drop_duplicates('comment_id')
+        if len(new) == 0:
+            return 0
+
+        compound = new[f'{self.prefix}_compound'].to_numpy(dtype=float)
+        scored = ~np.isnan(compound)
+        filled = np.where(scored, compound, 0.0)
+
+        # 每条评论对各汇总列的贡献
+        rows = pd.DataFrame({
+            'comments': 1,
+            'scored': scored.astype(int),
+            'compound_sum': filled,
+            'compound_sq_sum': filled * filled,
+            'pos_sum': new[f'{self.prefix}_pos'].fillna(0).to_numpy(dtype=float),
+            'neu_sum': new[f'{self.prefix}_neu'].fillna(0).to_numpy(dtype=float),
+            'neg_sum': new[f'{self.prefix}_neg'].fillna(0).to_numpy(dtype=float),
+        }, index=new.index)
+        sentiment = new[f'{self.prefix}_sentiment']
+        for name in SENTIMENTS:
+            rows[name] = (sentiment == name).astype(int).to_numpy()
+        bin_index = np.clip(((filled + 1) / 2 * self.bins).astype(int), 0, self.bins - 1)
+        hist = np.zeros((len(new), self.bins), dtype=int)
+        hist[np.nonzero(scored)[0], bin_index[scored]] = 1
+        rows[self.hist_columns] = hist
+
+        # 分组键
+        keys = {
+            'video': new['video_id'].astype(str).to_numpy(),
+            'day': pd.to_datetime(new['published_at'], utc=True, errors='coerce')
+                     .dt.strftime('%Y-%m-%d').fillna('unknown').to_numpy(),
+        }
+        channels = pd.Series('unknown', index=new.index)
+        if df_videos is not None and 'channel_id' in df_videos.columns:
+            mapping = df_videos.drop_duplicates('video_id').set_index('video_id')['channel_id'].astype(str)
+            channels = new['video_id'].map(mapping).fillna('unknown')
+        keys['channel'] = channels.to_numpy()
+
+        for level, key in LEVELS.items():
+            delta = rows.groupby(keys[level]).sum()
+            delta.index.name = key
+            table = self.tables[level]
+            self.tables[level] = delta if table is None else table.add(delta, fill_value=0).astype(delta.dtypes)
+
+        new_ids = pd.Index(new['comment_id'].astype(str))
+        self.seen_ids = self.seen_ids.append(new_ids)
+        self.save(new_ids)
+        return len(new)
+
+    def _with_means(self, table):
+        table = table.copy()
+        scored = table['scored'].replace(0, np.nan)
+        table['mean_compound'] = table['compound_sum'] / scored
+        table['mean_pos'] = table['pos_sum'] / scored
+        table['mean_neg'] = table['neg_sum'] / scored
+        return table
+
+    def video_stats(self):
+        return None if self.tables['video'] is None else self._with_means(self.tables['video'])
+
+    def daily(self):
+        if self.tables['day'] is None:
+            return None
+        table = self.tables['day'].drop(index='unknown', errors='ignore')
+        return self._with_means(table.sort_index())
+
+    def totals(self):
+        """全部评论的汇总 (一行 Series)"""
+        if self.tables['channel'] is None:
+            return None
+        total = self.tables['channel'].sum()
+        scored = total['scored'] or np.nan
+        total['mean_compound'] = total['compound_sum'] / scored
+        total['mean_pos'] = total['pos_sum'] / scored
+        total['mean_neg'] = total['neg_sum'] / scored
+        return total
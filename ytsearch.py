@@ -0,0 +1,404 @@
+"""
+Inverted full-text index for comments
+
+索引是一个目录, 每次 add 写一个新的段 (segment), meta.json 记录段列表. 段内全部是
+.npy 数组, 用 mmap 打开, 打开索引几乎不需要时间:
+    terms           排序后的词 (np.searchsorted 查找)
+    term_offsets    每个词在 postings 中的起止位置
+    postings        评论编号 (段内, 升序)
+    pos_offsets     每个 posting 在 positions 中的起止位置
+    positions       词在评论中的位置 (短语查询)
+    comment_id / video_id / published / compound, text_offsets + text.bin (UTF-8)
+
+查询语法: 词之间默认 AND, OR 分隔多个子句, -词 或 NOT 词 排除, "..." 为短语.
+结果可以按视频、日期范围和情感过滤, 按发布时间倒序返回.
+
+usage:
+python ytsearch.py build search_index analysis_results/comments_with_sentiment.csv
+python ytsearch.py query search_index '"battery life" refund -shipping' --sentiment negative --start 2024-01-01
+python ytsearch.py merge search_index
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+TOKEN_RE = r'\w+'
+# 超长的词 (URL片段、无空格的长句) 不进索引, 位置仍然保留, 短语不会跨过它们匹配
+MAX_TERM_LENGTH = 40
+SENTIMENT_THRESHOLD = 0.05
+SENTIMENTS = ('positive', 'neutral', 'negative')
+
+ARRAYS = ('terms', 'term_offsets', 'postings', 'pos_offsets', 'positions',
+          'comment_id', 'video_id', 'published', 'compound', 'text_offsets')
+
+
+def tokenize(text):
+    return re.findall(TOKEN_RE, str(text).lower())
+
+
+def _expand(starts, ends):
+    """多个 [start, end) 区间展开成下标数组"""
+    counts = ends - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64), counts
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(total), counts
+
+
+def build_segment(path, df, compound_column=None):
+    """把评论 DataFrame 写成一个段目录"""
+    n = len(df)
+    texts = df['comment_text'].fillna('').astype(str)
+    tokens = texts.str.lower().str.findall(TOKEN_RE)
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=n)
+    flat = np.array(list(chain.from_iterable(tokens)), dtype=object)
+    docs = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    positions = np.arange(len(flat), dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    codes, terms = pd.factorize(flat, sort=True)
+    long = np.fromiter(map(len, terms), dtype=np.int64, count=len(terms)) > MAX_TERM_LENGTH
+    if long.any():
+        keep = ~long[codes]
+        codes = (np.cumsum(~long) - 1)[codes[keep]]
+        terms = terms[~long]
+        docs, positions = docs[keep], positions[keep]
+    order = np.lexsort((positions, docs, codes))
+    codes, docs, positions = codes[order], docs[order], positions[order]
+
+    # 同一 (词, 评论) 的第一个位置开始一个 posting
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = (codes[1:] != codes[:-1]) | (docs[1:] != docs[:-1])
+    starts = np.flatnonzero(first)
+
+    published = pd.to_datetime(df['published_at'], utc=True, errors='coerce', format='ISO8601')
+    seconds = published.to_numpy(dtype='datetime64[ns]').view(np.int64) // 10 ** 9
+    seconds[published.isna().to_numpy()] = np.iinfo(np.int64).min
+    if compound_column and compound_column in df.columns:
+        compound = pd.to_numeric(df[compound_column], errors='coerce').to_numpy(dtype=np.float32)
+    else:
+        compound = np.full(n, np.nan, dtype=np.float32)
+    encoded = [text.encode('utf-8') for text in texts]
+
+    arrays = {
+        'terms': np.asarray(terms, dtype=str) if len(terms) else np.zeros(0, dtype='U1'),
+        'term_offsets': np.concatenate([[0], np.cumsum(np.bincount(codes[starts], minlength=len(terms)))]),
+        'postings': docs[starts].astype(np.int32),
+        'pos_offsets': np.append(starts, len(codes)).astype(np.int64),
+        'positions': positions.astype(np.int32),
+        'comment_id': df['comment_id'].astype(str).to_numpy(dtype=str),
+        'video_id': df['video_id'].astype(str).to_numpy(dtype=str),
+        'published': seconds,
+        'compound': compound,
+        'text_offsets': np.concatenate([[0], np.cumsum([len(b) for b in encoded], dtype=np.int64)]),
+    }
+
+    # 先写临时目录再改名, 中断时不会留下半个段
+    tmp = path + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f'{name}.npy'), array)
+    with open(os.path.join(tmp, 'text.bin'), 'wb') as f:
+        f.write(b''.join(encoded))
+    os.replace(tmp, path)
+
+
+class Segment:
+    def __init__(self, path):
+        self.path = path
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+        size = os.path.getsize(os.path.join(path, 'text.bin'))
+        self.text = np.memmap(os.path.join(path, 'text.bin'), dtype=np.uint8, mode='r') if size else b''
+
+    def __len__(self):
+        return len(self.comment_id)
+
+    def _range(self, term):
+        i = int(np.searchsorted(self.terms, term))
+        if i < len(self.terms) and self.terms[i] == term:
+            return int(self.term_offsets[i]), int(self.term_offsets[i + 1])
+        return 0, 0
+
+    def docs(self, term):
+        lo, hi = self._range(term)
+        return np.asarray(self.postings[lo:hi])
+
+    def phrase(self, terms):
+        """包含连续词序列 terms 的评论"""
+        candidates = None
+        for term in terms:
+            docs = self.docs(term)
+            candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+            if len(candidates) == 0:
+                return candidates
+        if len(terms) == 1:
+            return candidates
+
+        matched = None
+        for k, term in enumerate(terms):
+            lo, hi = self._range(term)
+            entries = lo + np.flatnonzero(np.isin(self.postings[lo:hi], candidates, assume_unique=True))
+            index, counts = _expand(np.asarray(self.pos_offsets[entries]), np.asarray(self.pos_offsets[entries + 1]))
+            # (评论, 短语起始位置) 编成一个整数
+            keys = (np.repeat(np.asarray(self.postings[entries], dtype=np.int64), counts) << 32) \
+                + np.asarray(self.positions[index], dtype=np.int64) - k + len(terms)
+            matched = keys if matched is None else np.intersect1d(matched, keys)
+            if len(matched) == 0:
+                break
+        return np.unique(matched >> 32)
+
+    def text_of(self, doc):
+        return bytes(self.text[int(self.text_offsets[doc]):int(self.text_offsets[doc + 1])]).decode('utf-8')
+
+    def contains(self, comment_ids):
+        return np.isin(comment_ids, self.comment_id)
+
+
+def parse_query(query):
+    """查询字符串 -> [(包含的词组列表, 排除的词组列表), ...] (每个子句之间为 OR)"""
+    clauses, include, exclude = [], [], []
+    negate = False
+    for raw in re.findall(r'-?"[^"]*"|\S+', query):
+        if raw == 'OR':
+            clauses.append((include, exclude))
+            include, exclude = [], []
+            continue
+        if raw in ('AND', 'NOT'):
+            negate = raw == 'NOT'
+            continue
+        if raw.startswith('-') and len(raw) > 1:
+            negate, raw = True, raw[1:]
+        terms = tokenize(raw.strip('"'))
+        if terms:
+            (exclude if negate else include).append(terms)
+        negate = False
+    clauses.append((include, exclude))
+    if not all(include for include, _ in clauses):
+        raise ValueError('every OR clause needs at least one term that is not excluded')
+    return clauses
+
+
+def _time_bound(value):
+    if value is None:
+        return None
+    stamp = pd.Timestamp(value)
+    stamp = stamp.tz_localize('UTC') if stamp.tzinfo is None else stamp.tz_convert('UTC')
+    return stamp.value // 10 ** 9
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self._meta_mtime = None
+        self._segments = []
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def _read_meta(self):
+        if not os.path.exists(self._meta_path()):
+            return {'segments': [], 'next_segment': 1}
+        with open(self._meta_path(), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self, meta):
+        tmp = self._meta_path() + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, self._meta_path())
+
+    @property
+    def segments(self):
+        """meta.json 变化时 (其它进程写入了新段) 重新打开段"""
+        mtime = os.path.getmtime(self._meta_path()) if os.path.exists(self._meta_path()) else None
+        if mtime != self._meta_mtime:
+            self._segments = [Segment(os.path.join(self.path, entry['name']))
+                              for entry in self._read_meta()['segments']]
+            self._meta_mtime = mtime
+        return self._segments
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def add(self, df, compound_column=None):
+        """索引中还没有的评论写成一个新段, 返回新增的评论数"""
+        if df is None or len(df) == 0:
+            return 0
+        df = df.drop_duplicates('comment_id', keep='last')
+        ids = df['comment_id'].astype(str).to_numpy(dtype=str)
+        known = np.zeros(len(df), dtype=bool)
+        for segment in self.segments:
+            known |= segment.contains(ids)
+        df = df[~known]
+        if len(df) == 0:
+            return 0
+
+        os.makedirs(self.path, exist_ok=True)
+        meta = self._read_meta()
+        name = f"seg_{meta['next_segment']:05d}"
+        build_segment(os.path.join(self.path, name), df, compound_column)
+        meta['segments'].append({'name': name, 'comments': len(df), 'created_at': pd.Timestamp.now().isoformat()})
+        meta['next_segment'] += 1
+        self._write_meta(meta)
+        return len(df)
+
+    def merge(self):
+        """把所有段合并成一个段, 返回合并前的段数"""
+        segments = self.segments
+        if len(segments) < 2:
+            return len(segments)
+        frames = []
+        for segment in segments:
+            texts = bytes(segment.text)
+            offsets = np.asarray(segment.text_offsets)
+            published = np.asarray(segment.published)
+            frames.append(pd.DataFrame({
+                'comment_id': np.asarray(segment.comment_id),
+                'video_id': np.asarray(segment.video_id),
+                'published_at': pd.to_datetime(np.where(published == np.iinfo(np.int64).min, np.nan, published),
+                                               unit='s', utc=True).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'compound': np.asarray(segment.compound),
+                'comment_text': [texts[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:])],
+            }))
+        meta = self._read_meta()
+        name = f"seg_{meta['next_segment']:05d}"
+        merged = pd.concat(frames, ignore_index=True)
+        build_segment(os.path.join(self.path, name), merged, 'compound')
+        old = [entry['name'] for entry in meta['segments']]
+        meta['segments'] = [{'name': name, 'comments': len(merged), 'created_at': pd.Timestamp.now().isoformat()}]
+        meta['next_segment'] += 1
+        self._write_meta(meta)
+        self._segments = []
+        for entry in old:
+            shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+        return len(old)
+
+    def _match(self, segment, clauses):
+        result = None
+        for include, exclude in clauses:
+            # 先算最短的 posting 列表, 交集越早越小
+            groups = sorted((segment.phrase(terms) for terms in include), key=len)
+            docs = groups[0]
+            for other in groups[1:]:
+                docs = np.intersect1d(docs, other, assume_unique=True)
+            for terms in exclude:
+                if len(docs) == 0:
+                    break
+                docs = np.setdiff1d(docs, segment.phrase(terms), assume_unique=True)
+            result = docs if result is None else np.union1d(result, docs)
+        return result
+
+    def search(self, query, video_id=None, start=None, end=None, sentiment=None, limit=20, offset=0):
+        """返回 {'total', 'items', 'elapsed_ms'}; start/end 为日期或时间 (end 不包含)"""
+        started = time.perf_counter()
+        clauses = parse_query(query)
+        if sentiment is not None and sentiment not in SENTIMENTS:
+            raise ValueError(f"sentiment must be one of: {', '.join(SENTIMENTS)}")
+        lower, upper = _time_bound(start), _time_bound(end)
+
+        hits, times = [], []
+        for number, segment in enumerate(self.segments):
+            docs = self._match(segment, clauses)
+            if video_id is not None and len(docs):
+                docs = docs[np.asarray(segment.video_id[docs]) == video_id]
+            published = np.asarray(segment.published[docs])
+            keep = np.ones(len(docs), dtype=bool)
+            if lower is not None:
+                keep &= published >= lower
+            if upper is not None:
+                keep &= published < upper
+            if sentiment is not None and len(docs):
+                compound = np.asarray(segment.compound[docs])
+                if sentiment == 'positive':
+                    keep &= compound >= SENTIMENT_THRESHOLD
+                elif sentiment == 'negative':
+                    keep &= compound <= -SENTIMENT_THRESHOLD
+                else:
+                    keep &= np.abs(compound) < SENTIMENT_THRESHOLD
+            hits.append(np.stack([np.full(int(keep.sum()), number), docs[keep]], axis=1))
+            times.append(published[keep])
+
+        hits = np.concatenate(hits) if hits else np.zeros((0, 2), dtype=np.int64)
+        times = np.concatenate(times) if times else np.zeros(0, dtype=np.int64)
+        # 只对需要返回的前 offset + limit 条排序
+        from ytanalytics import top_k
+        page = top_k(times.astype(float), offset + limit)[offset:]
+        items = []
+        for number, doc in hits[page]:
+            segment = self.segments[number]
+            compound = float(segment.compound[doc])
+            published = int(segment.published[doc])
+            items.append({
+                'comment_id': str(segment.comment_id[doc]),
+                'video_id': str(segment.video_id[doc]),
+                'published_at': None if published == np.iinfo(np.int64).min
+                else pd.Timestamp(published, unit='s', tz='UTC').isoformat(),
+                'compound': None if compound != compound else round(compound, 4),
+                'comment_text': segment.text_of(doc),
+            })
+        return {'total': len(hits), 'items': items,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='YouTube comment full-text index')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='把评论CSV加入索引 (已索引的评论会跳过)')
+    build.add_argument('index')
+    build.add_argument('comments', nargs='+', help='评论CSV (comment_data_*.csv 或 comments_with_sentiment.csv)')
+    build.add_argument('--compound-column', default='vader_compound')
+    build.add_argument('--chunk-size', type=int, default=500000, help='每个段最多的评论数')
+    query = sub.add_parser('query', help='查询')
+    query.add_argument('index')
+    query.add_argument('query')
+    query.add_argument('--video-id')
+    query.add_argument('--start', help='YYYY-MM-DD (包含)')
+    query.add_argument('--end', help='YYYY-MM-DD (不包含)')
+    query.add_argument('--sentiment', choices=SENTIMENTS)
+    query.add_argument('--limit', type=int, default=20)
+    merge = sub.add_parser('merge', help='合并所有段')
+    merge.add_argument('index')
+    args = parser.parse_args(argv)
+
+    index = SearchIndex(args.index)
+    if args.command == 'build':
+        started = time.time()
+        added = 0
+        for path in args.comments:
+            for chunk in pd.read_csv(path, dtype={'comment_id': str, 'video_id': str}, chunksize=args.chunk_size):
+                added += index.add(chunk, args.compound_column)
+        print(f"✓ 新增 {added:,} 条评论 ({time.time() - started:.1f}s), 索引共 {len(index):,} 条, "
+              f"{len(index.segments)} 个段")
+        return 0
+
+    if args.command == 'merge':
+        merged = index.merge()
+        print(f"✓ 合并了 {merged} 个段, 索引共 {len(index):,} 条")
+        return 0
+
+    try:
+        result = index.search(args.query, video_id=args.video_id, start=args.start, end=args.end,
+                              sentiment=args.sentiment, limit=args.limit)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 2
+    print(f"{result['total']:,} 条匹配 ({result['elapsed_ms']} ms)")
+    for item in result['items']:
+        compound = '' if item['compound'] is None else f"{item['compound']:+.3f}"
+        print(f"  {item['published_at']}  {item['video_id']}  {compound:>7}  {item['comment_text'][:100]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
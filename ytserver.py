@@ -0,0 +1,490 @@
+"""
+Part 4: Query API server
+
+启动时加载一次分析结果 (ytanalysis.py 导出的 CSV, 或 PostgreSQL 表), 建好内存索引,
+按频道 / 视频 / 天提供情感和互动数据的 JSON 查询. 查询结果有LRU缓存, 列表接口分页,
+/metrics 给出每个接口的延迟分位数和缓存命中率. 只用标准库的 http.server, 不依赖外部服务.
+
+接口:
+    GET /health
+    GET /channels                           ?limit=&offset=
+    GET /channels/<channel_id>
+    GET /videos                             ?channel_id=&sort=&order=asc|desc&limit=&offset=
+    GET /videos/<video_id>
+    GET /videos/<video_id>/comments         ?sentiment=&lang=&limit=&offset=
+    GET /days                               ?channel_id=&video_id=&start=YYYY-MM-DD&end=YYYY-MM-DD
+    GET /search                             ?q=&video_id=&start=&end=&sentiment=&limit=&offset=
+    GET /metrics
+
+usage:
+python ytserver.py --data-dir analysis_results --port 8000
+python ytserver.py --source postgres --port 8000
+python ytserver.py --data-dir analysis_results --search-index search_index
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from ytcoll import load_config, EXIT_OK, EXIT_FAILED, EXIT_CONFIG_ERROR
+
+SENTIMENTS = ['positive', 'neutral', 'negative']
+VIDEO_SORTS = ('published_at', 'duration_seconds', 'view_count', 'like_count', 'comment_count', 'engagement_rate',
+               'comments', 'mean_compound', 'negative_share')
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class QueryError(Exception):
+    """请求参数错误或资源不存在, 带HTTP状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _records(df):
+    """DataFrame -> JSON可序列化的记录列表 (NaN/inf 变成 None)"""
+    df = df.replace([np.inf, -np.inf], np.nan)
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _sentiment_sums(df):
+    """每行一条评论 -> 可相加的情感汇总列"""
+    compound = df['compound'].to_numpy(dtype=float)
+    scored = ~np.isnan(compound)
+    sums = pd.DataFrame({
+        'comments': 1,
+        'scored': scored.astype(int),
+        'compound_sum': np.where(scored, compound, 0.0),
+    }, index=df.index)
+    for name in SENTIMENTS:
+        sums[name] = (df['sentiment'] == name).astype(int).to_numpy()
+    return sums
+
+
+def _with_shares(table):
+    """由汇总列计算平均得分和各情感占比"""
+    table = table.copy()
+    scored = table['scored'].replace(0, np.nan)
+    table['mean_compound'] = table['compound_sum'] / scored
+    for name in SENTIMENTS:
+        table[f'{name}_share'] = table[name] / scored
+    return table.drop(columns=['compound_sum'])
+
+
+class QueryStore:
+    """分析结果和内存索引 (加载后只读, 多线程共享)"""
+
+    def __init__(self, df_videos, df_comments, df_channels=None):
+        self._build(df_videos, df_comments, df_channels)
+
+    @classmethod
+    def from_csv(cls, data_dir='analysis_results', prefix='vader'):
+        """读取 ytanalysis.py export_results 的输出"""
+        df_videos = pd.read_csv(f'{data_dir}/videos_with_analysis.csv', dtype={'video_id': str, 'channel_id': str})
+        df_comments = pd.read_csv(f'{data_dir}/comments_with_sentiment.csv',
+                                  dtype={'video_id': str, 'comment_id': str})
+        df_comments = df_comments.rename(columns={f'{prefix}_compound': 'compound',
+                                                  f'{prefix}_sentiment': 'sentiment'})
+        return cls(df_videos, df_comments)
+
+    @classmethod
+    def from_postgres(cls, db_config):
+        """读取 youtube_* 表; 有 youtube_comment_sentiment (ytpipeline.py) 时带上得分"""
+        import psycopg2
+        conn = psycopg2.connect(**db_config)
+        try:
+            df_channels = pd.read_sql("SELECT * FROM youtube_channels", conn)
+            df_videos = pd.read_sql("SELECT * FROM youtube_videos", conn)
+            try:
+                df_comments = pd.read_sql("""
+                    SELECT c.*, s.lang, s.compound, s.sentiment
+                    FROM youtube_comments c
+                    LEFT JOIN youtube_comment_sentiment s ON s.comment_id = c.comment_id
+                """, conn)
+            except Exception:
+                conn.rollback()
+                df_comments = pd.read_sql("SELECT * FROM youtube_comments", conn)
+        finally:
+            conn.close()
+        return cls(df_videos, df_comments, df_channels)
+
+    def _build(self, df_videos, df_comments, df_channels):
+        comments = df_comments.copy()
+        for column in ('compound', 'sentiment', 'lang'):
+            if column not in comments.columns:
+                comments[column] = np.nan
+        comments['compound'] = pd.to_numeric(comments['compound'], errors='coerce')
+        comments['video_id'] = comments['video_id'].astype(str)
+        comments['day'] = (pd.to_datetime(comments['published_at'], utc=True, errors='coerce')
+                           .dt.strftime('%Y-%m-%d').fillna('unknown'))
+        # 按视频排序, 每个视频的评论是一段连续的行
+        comments = comments.sort_values(['video_id', 'published_at'], ascending=[True, False],
+                                        kind='stable').reset_index(drop=True)
+        video_ids = comments['video_id'].to_numpy()
+        unique, starts = np.unique(video_ids, return_index=True)
+        ends = np.append(starts[1:], len(comments))
+        self.comment_slices = {video: (start, end) for video, start, end in zip(unique, starts, ends)}
+        self.comments = comments
+
+        videos = df_videos.drop_duplicates('video_id', keep='last').copy()
+        videos['video_id'] = videos['video_id'].astype(str)
+        videos['channel_id'] = videos['channel_id'].astype(str)
+        views = pd.to_numeric(videos['view_count'], errors='coerce').replace(0, np.nan)
+        videos['engagement_rate'] = (pd.to_numeric(videos['like_count'], errors='coerce')
+                                     + pd.to_numeric(videos['comment_count'], errors='coerce')) / views * 100
+        video_columns = ['video_id', 'channel_id', 'title', 'published_at', 'duration', 'duration_seconds',
+                         'view_count', 'like_count', 'comment_count', 'engagement_rate']
+        videos = videos[[c for c in video_columns if c in videos.columns]].set_index('video_id')
+
+        sums = _sentiment_sums(comments)
+        per_video = sums.groupby(video_ids).sum()
+        per_video = per_video.reindex(videos.index.union(per_video.index), fill_value=0)
+        per_video.index.name = 'video_id'
+        self.video_sums = per_video
+        self.videos = videos.join(_with_shares(per_video), how='right')
+        self.videos['channel_id'] = self.videos['channel_id'].fillna('unknown')
+
+        # 频道汇总由视频汇总相加
+        channel_of = self.videos['channel_id']
+        per_channel = per_video.groupby(channel_of.reindex(per_video.index).to_numpy()).sum()
+        engagement = self.videos.groupby('channel_id').agg(
+            videos=('comments', 'size'),
+            view_count=('view_count', 'sum'),
+            like_count=('like_count', 'sum'),
+            comment_count=('comment_count', 'sum'),
+        )
+        channels = engagement.join(_with_shares(per_channel))
+        channels['engagement_rate'] = ((channels['like_count'] + channels['comment_count'])
+                                       / channels['view_count'].replace(0, np.nan) * 100)
+        if df_channels is not None and len(df_channels):
+            names = df_channels.drop_duplicates('channel_id', keep='last').set_index('channel_id')
+            channels = channels.join(names[['channel_name', 'subscribers']])
+        channels.index.name = 'channel_id'
+        self.channels = channels
+        self.channel_videos = {channel: group.index.to_numpy()
+                               for channel, group in self.videos.groupby('channel_id')}
+
+        # 天 x 视频 的汇总, 按频道/视频筛选后再按天相加
+        daily = sums.groupby([video_ids, comments['day'].to_numpy()]).sum()
+        daily.index.names = ['video_id', 'day']
+        self.daily = daily
+
+    # ---------- 查询 ----------
+
+    def health(self):
+        return {'status': 'ok', 'channels': len(self.channels), 'videos': len(self.videos),
+                'comments': len(self.comments)}
+
+    def list_channels(self, limit, offset):
+        return _page(self.channels.reset_index(), limit, offset)
+
+    def channel(self, channel_id):
+        if channel_id not in self.channels.index:
+            raise QueryError(404, f'channel not found: {channel_id}')
+        return _records(self.channels.loc[[channel_id]].reset_index())[0]
+
+    def list_videos(self, channel_id, sort, ascending, limit, offset):
+        videos = self.videos
+        if channel_id is not None:
+            if channel_id not in self.channel_videos:
+                raise QueryError(404, f'channel not found: {channel_id}')
+            videos = videos.loc[self.channel_videos[channel_id]]
+        if sort not in videos.columns:
+            # 旧的导出没有 duration_seconds
+            raise QueryError(400, f'sort column not in data: {sort}')
+        videos = videos.sort_values(sort, ascending=ascending, na_position='last', kind='stable')
+        return _page(videos.reset_index(), limit, offset)
+
+    def video(self, video_id):
+        if video_id not in self.videos.index:
+            raise QueryError(404, f'video not found: {video_id}')
+        return _records(self.videos.loc[[video_id]].reset_index())[0]
+
+    def video_comments(self, video_id, sentiment, lang, limit, offset):
+        if video_id not in self.videos.index:
+            raise QueryError(404, f'video not found: {video_id}')
+        start, end = self.comment_slices.get(video_id, (0, 0))
+        comments = self.comments.iloc[start:end]
+        if sentiment is not None:
+            comments = comments[comments['sentiment'] == sentiment]
+        if lang is not None:
+            comments = comments[comments['lang'] == lang]
+        columns = [c for c in ('comment_id', 'author', 'comment_text', 'like_count', 'published_at',
+                               'lang', 'compound', 'sentiment') if c in comments.columns]
+        return _page(comments[columns], limit, offset)
+
+    def days(self, channel_id, video_id, start, end):
+        daily = self.daily
+        if video_id is not None:
+            if video_id not in self.videos.index:
+                raise QueryError(404, f'video not found: {video_id}')
+            daily = daily[daily.index.get_level_values('video_id') == video_id]
+        elif channel_id is not None:
+            if channel_id not in self.channel_videos:
+                raise QueryError(404, f'channel not found: {channel_id}')
+            daily = daily[daily.index.get_level_values('video_id').isin(self.channel_videos[channel_id])]
+        table = daily.groupby(level='day').sum().drop(index='unknown', errors='ignore').sort_index()
+        if start is not None:
+            table = table[table.index >= start]
+        if end is not None:
+            table = table[table.index <= end]
+        return {'items': _records(_with_shares(table).reset_index())}
+
+
+def _page(df, limit, offset):
+    return {'total': len(df), 'limit': limit, 'offset': offset,
+            'items': _records(df.iloc[offset:offset + limit])}
+
+
+class QueryService:
+    """路由 + LRU结果缓存 + 延迟统计"""
+
+    def __init__(self, store, cache_size=1024, window=10000, search=None):
+        self.store = store
+        self.search = search
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._window = window
+        self._errors = {}
+        self._server_errors = {}
+        self.execute = lru_cache(maxsize=cache_size)(self._execute)
+
+    def handle(self, target):
+        """处理一个请求路径, 返回 (状态码, JSON字节)"""
+        started = time.perf_counter()
+        parts = urlsplit(target)
+        path = tuple(p for p in parts.path.split('/') if p)
+        route = _route_name(path)
+        try:
+            if path == ('metrics',):
+                status, body = 200, json.dumps(self.metrics()).encode('utf-8')
+            elif path == ('search',):
+                # 索引会被流水线增量写入, 搜索结果不缓存
+                status, body = self._execute(path, tuple((k, v[-1]) for k, v in parse_qs(parts.query).items()))
+            else:
+                # 同名参数只取最后一个, 参数排序后作为缓存键
+                query = tuple(sorted((k, v[-1]) for k, v in parse_qs(parts.query).items()))
+                status, body = self.execute(path, query)
+        except Exception as e:
+            # 意外错误在这里而不是 _execute 里处理: lru_cache 不缓存抛出的异常, 下次请求会重试
+            print(f"✗ {target}: {type(e).__name__}: {e}", file=sys.stderr)
+            status = 500
+            body = json.dumps({'error': f'internal error: {type(e).__name__}'}).encode('utf-8')
+        self._record(route, status, time.perf_counter() - started)
+        return status, body
+
+    def _execute(self, path, query):
+        """执行查询; QueryError 变成对应状态码的结果 (会被缓存), 其他异常由 handle 变成500"""
+        try:
+            result = self._dispatch(path, dict(query))
+            return 200, json.dumps(result, ensure_ascii=False, default=str).encode('utf-8')
+        except QueryError as e:
+            return e.status, json.dumps({'error': str(e)}).encode('utf-8')
+
+    def _dispatch(self, path, params):
+        store = self.store
+        if path in ((), ('health',)):
+            return store.health()
+        if path == ('channels',):
+            return store.list_channels(*_paging(params))
+        if len(path) == 2 and path[0] == 'channels':
+            return store.channel(path[1])
+        if path == ('videos',):
+            sort = params.get('sort', 'published_at')
+            if sort not in VIDEO_SORTS:
+                raise QueryError(400, f"sort must be one of: {', '.join(VIDEO_SORTS)}")
+            order = params.get('order', 'desc')
+            if order not in ('asc', 'desc'):
+                raise QueryError(400, 'order must be asc or desc')
+            return store.list_videos(params.get('channel_id'), sort, order == 'asc', *_paging(params))
+        if len(path) == 2 and path[0] == 'videos':
+            return store.video(path[1])
+        if len(path) == 3 and path[0] == 'videos' and path[2] == 'comments':
+            sentiment = params.get('sentiment')
+            if sentiment is not None and sentiment not in SENTIMENTS:
+                raise QueryError(400, f"sentiment must be one of: {', '.join(SENTIMENTS)}")
+            return store.video_comments(path[1], sentiment, params.get('lang'), *_paging(params))
+        if path == ('days',):
+            return store.days(params.get('channel_id'), params.get('video_id'),
+                              params.get('start'), params.get('end'))
+        if path == ('search',):
+            if self.search is None:
+                raise QueryError(404, 'search index not configured (--search-index)')
+            if not params.get('q'):
+                raise QueryError(400, 'q is required')
+            limit, offset = _paging(params)
+            try:
+                return self.search.search(params['q'], video_id=params.get('video_id'),
+                                          start=params.get('start'), end=params.get('end'),
+                                          sentiment=params.get('sentiment'), limit=limit, offset=offset)
+            except ValueError as e:
+                raise QueryError(400, str(e))
+        raise QueryError(404, f"unknown endpoint: /{'/'.join(path)}")
+
+    def _record(self, route, status, seconds):
+        with self._lock:
+            self._latencies.setdefault(route, deque(maxlen=self._window)).append(seconds)
+            if status >= 400:
+                self._errors[route] = self._errors.get(route, 0) + 1
+            if status >= 500:
+                self._server_errors[route] = self._server_errors.get(route, 0) + 1
+
+    def metrics(self):
+        with self._lock:
+            latencies = {route: np.array(values) for route, values in self._latencies.items()}
+            errors = dict(self._errors)
+            server_errors = dict(self._server_errors)
+        cache = self.execute.cache_info()
+        lookups = cache.hits + cache.misses
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'cache': {'hits': cache.hits, 'misses': cache.misses, 'size': cache.currsize,
+                      'max_size': cache.maxsize,
+                      'hit_rate': round(cache.hits / lookups, 3) if lookups else None},
+            'routes': {
+                route: {
+                    'requests': len(values),
+                    'errors': errors.get(route, 0),
+                    'server_errors': server_errors.get(route, 0),
+                    'p50_ms': round(float(np.percentile(values, 50)) * 1000, 3),
+                    'p95_ms': round(float(np.percentile(values, 95)) * 1000, 3),
+                    'p99_ms': round(float(np.percentile(values, 99)) * 1000, 3),
+                    'max_ms': round(float(values.max()) * 1000, 3),
+                }
+                for route, values in sorted(latencies.items())
+            },
+        }
+
+
+def _paging(params):
+    try:
+        limit = int(params.get('limit', DEFAULT_LIMIT))
+        offset = int(params.get('offset', 0))
+    except ValueError:
+        raise QueryError(400, 'limit and offset must be integers')
+    if not 1 <= limit <= MAX_LIMIT or offset < 0:
+        raise QueryError(400, f'limit must be 1..{MAX_LIMIT} and offset >= 0')
+    return limit, offset
+
+
+def _route_name(path):
+    """延迟统计按接口分组, 路径中的ID替换为占位符"""
+    if not path or path[0] not in ('health', 'channels', 'videos', 'days', 'search', 'metrics'):
+        return '/' if not path else '/{unknown}'
+    if len(path) >= 2 and path[0] in ('channels', 'videos'):
+        return '/' + '/'.join((path[0], '{id}') + path[2:])
+    return '/' + '/'.join(path)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        status, body = self.service.handle(self.path)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=8000):
+    """创建 (未启动的) HTTP服务器, port=0 时随机端口"""
+    handler = type('BoundQueryHandler', (QueryHandler,), {'service': service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def parse_args(argv=None):
+    """解析命令行参数, --config中的值作为默认值"""
+    load_dotenv()
+
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument('--config')
+    pre_args, _ = pre.parse_known_args(argv)
+
+    parser = argparse.ArgumentParser(description='YouTube analysis query server', parents=[pre])
+    parser.add_argument('--source', choices=['csv', 'postgres'], default='csv')
+    parser.add_argument('--data-dir', default='analysis_results', help='ytanalysis.py output directory')
+    parser.add_argument('--prefix', default='vader', help='scorer prefix of the sentiment columns (csv)')
+    parser.add_argument('--db-host', default=os.getenv('DB_HOST') or 'localhost')
+    parser.add_argument('--db-name', default=os.getenv('DB_NAME') or 'youtube_data')
+    parser.add_argument('--db-user', default=os.getenv('DB_USER') or 'postgres')
+    parser.add_argument('--db-password', default=os.getenv('DB_PASSWORD') or 'your_password')
+    parser.add_argument('--db-port', type=int, default=int(os.getenv('DB_PORT') or 5432))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--cache-size', type=int, default=1024, help='cached query results')
+    parser.add_argument('--search-index', help='full-text index directory (ytsearch.py) for /search')
+
+    if pre_args.config:
+        config = load_config(pre_args.config)
+        known = {action.dest for action in parser._actions}
+        unknown = sorted(set(config) - known)
+        if unknown:
+            parser.error(f"unknown keys in {pre_args.config}: {', '.join(unknown)}")
+        parser.set_defaults(**config)
+
+    args = parser.parse_args(argv)
+    if args.cache_size < 0:
+        parser.error('--cache-size must be >= 0')
+    return args
+
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+    except (OSError, ValueError) as e:
+        print(f"✗ Config Error: {e}")
+        return EXIT_CONFIG_ERROR
+
+    started = time.time()
+    try:
+        if args.source == 'csv':
+            store = QueryStore.from_csv(args.data_dir, args.prefix)
+        else:
+            store = QueryStore.from_postgres({
+                'host': args.db_host, 'database': args.db_name, 'user': args.db_user,
+                'password': args.db_password, 'port': args.db_port
+            })
+    except Exception as e:
+        print(f"✗ Load Error: {type(e).__name__}: {e}")
+        return EXIT_FAILED
+    health = store.health()
+    print(f"✓ Loaded {health['channels']} channels, {health['videos']} videos, "
+          f"{health['comments']} comments in {time.time() - started:.2f}s")
+
+    search = None
+    if args.search_index:
+        from ytsearch import SearchIndex
+        search = SearchIndex(args.search_index)
+        print(f"✓ Search index {args.search_index}: {len(search):,} comments")
+    server = make_server(QueryService(store, cache_size=args.cache_size, search=search), args.host, args.port)
+    print(f"✓ Serving on http://{args.host}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+Incremental topic clustering of comments
+
+文本用 HashingVectorizer 变成哈希词袋 (不需要词表, 内存固定), 用累计的文档频率算 TF-IDF,
+再用 MiniBatchKMeans.partial_fit 按块聚类. 每块处理完只保留聚类中心和文档频率,
+所以几百万条评论也只占用固定内存.
+
+哈希列没有词名, 每块抽样一部分评论记录 列 -> 词, 用于输出每个主题的关键词.
+模型用 joblib 保存, 下次运行加载后继续 partial_fit 新评论并给它们分配主题.
+模型记录训练过的 comment_id (64位哈希), 同一条评论只训练一次, 重复运行不会重复计数.
+
+usage:
+python yttopics.py fit analysis_results/comments_with_sentiment.csv --topics 20 --model topics.joblib
+python yttopics.py assign analysis_results/comments_with_sentiment.csv --model topics.joblib \
+    --output analysis_results/comment_topics.csv
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# 至少两个字母的词, 数字和单个字母对主题没有意义
+TOKEN_PATTERN = r'(?u)\b[^\W\d_]{2,}\b'
+
+
+class TopicModel:
+    def __init__(self, n_topics=20, n_features=2 ** 18, batch_size=4096, name_docs=2000, random_state=0):
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.n_topics = n_topics
+        self.name_docs = name_docs
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features, alternate_sign=False, norm=None, stop_words='english',
+            token_pattern=TOKEN_PATTERN, dtype=np.float32
+        )
+        self.kmeans = MiniBatchKMeans(n_clusters=n_topics, batch_size=batch_size, n_init=3,
+                                      random_state=random_state)
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.term_names = {}
+        self.seen_ids = np.empty(0, dtype=np.uint64)
+        self.fitted = False
+
+    def _name_terms(self, texts):
+        """记录抽样评论里出现的 哈希列 -> 词"""
+        analyze = self.vectorizer.build_analyzer()
+        tokens = {token for text in texts[:self.name_docs] for token in analyze(text)}
+        tokens = sorted(tokens)
+        if tokens:
+            columns = self.vectorizer.transform(tokens).indices
+            for column, token in zip(columns.tolist(), tokens):
+                self.term_names.setdefault(column, token)
+
+    def _tfidf(self, counts):
+        """对数词频 * 平滑IDF, 按行L2归一化"""
+        from sklearn.preprocessing import normalize
+        X = counts.copy()
+        idf = np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1
+        X.data = np.log1p(X.data) * idf[X.indices].astype(np.float32)
+        return normalize(X)
+
+    def unseen(self, ids):
+        """ids 中还没有训练过的评论 (布尔数组, 同一块里重复的id只算第一次)"""
+        hashes = _hash_ids(ids)
+        return ~np.isin(hashes, self.seen_ids) & ~pd.Series(hashes).duplicated().to_numpy()
+
+    def partial_fit(self, texts, ids=None):
+        """用一块评论更新文档频率和聚类中心; 给出 ids (comment_id) 时跳过已训练过的评论"""
+        if ids is not None:
+            new = self.unseen(ids)
+            self.seen_ids = np.union1d(self.seen_ids, _hash_ids(ids)[new])
+            texts = texts[new]
+            if len(texts) == 0:
+                return self
+        texts = texts.fillna('').astype(str).tolist()
+        counts = self.vectorizer.transform(texts)
+        counts.sum_duplicates()
+        self.doc_freq += np.bincount(counts.indices, minlength=len(self.doc_freq))
+        self.n_docs += counts.shape[0]
+        self._name_terms(texts)
+
+        # 没有有效词的评论不参与聚类
+        X = self._tfidf(counts)[np.diff(counts.indptr) > 0]
+        # MiniBatchKMeans 第一次 partial_fit 需要至少 n_topics 条样本
+        if X.shape[0] >= self.n_topics or (self.fitted and X.shape[0] > 0):
+            self.kmeans.partial_fit(X)
+            self.fitted = True
+        return self
+
+    def fit(self, chunks):
+        """chunks: 评论文本 Series, 或 (文本, comment_id) 元组的可迭代对象"""
+        for chunk in chunks:
+            if isinstance(chunk, tuple):
+                self.partial_fit(*chunk)
+            else:
+                self.partial_fit(chunk)
+        if not self.fitted:
+            raise ValueError(f"not enough non-empty comments to fit {self.n_topics} topics")
+        return self
+
+    def predict(self, texts):
+        """每条评论的主题编号, 没有有效词的评论为 -1"""
+        counts = self.vectorizer.transform(texts.fillna('').astype(str).tolist())
+        labels = np.full(counts.shape[0], -1, dtype=np.int64)
+        nonempty = np.diff(counts.indptr) > 0
+        if nonempty.any():
+            labels[nonempty] = self.kmeans.predict(self._tfidf(counts)[nonempty])
+        return labels
+
+    def top_terms(self, k=10):
+        """每个主题中心权重最大的 k 个 (有词名的) 词"""
+        terms = []
+        for center in self.kmeans.cluster_centers_:
+            order = np.argsort(center)[::-1]
+            names = []
+            for column in order[:k * 20]:
+                if center[column] <= 0:
+                    break
+                name = self.term_names.get(int(column))
+                if name is not None:
+                    names.append(name)
+                    if len(names) == k:
+                        break
+            terms.append(names)
+        return terms
+
+    def save(self, path):
+        import joblib
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        import joblib
+        model = joblib.load(path)
+        if not hasattr(model, 'seen_ids'):
+            # 旧版本保存的模型没有记录训练过的评论
+            model.seen_ids = np.empty(0, dtype=np.uint64)
+        return model
+
+
+def _hash_ids(ids):
+    """comment_id -> uint64 哈希 (与行号无关)"""
+    return pd.util.hash_pandas_object(pd.Series(ids, dtype=str).reset_index(drop=True), index=False).to_numpy()
+
+
+def topic_table(model, labels, k=10):
+    """每个主题的评论数、占比和关键词"""
+    counts = np.bincount(labels[labels >= 0], minlength=model.n_topics)
+    total = max(int(counts.sum()), 1)
+    return pd.DataFrame({
+        'topic_id': np.arange(model.n_topics),
+        'comments': counts,
+        'share': np.round(counts / total, 4),
+        'terms': [' '.join(terms) for terms in model.top_terms(k)],
+    })
+
+
+def video_topics(video_ids, labels):
+    """每个视频评论最多的主题及其占比, 以 video_id 为索引"""
+    df = pd.DataFrame({'video_id': np.asarray(video_ids), 'topic_id': labels})
+    df = df[df['topic_id'] >= 0]
+    counts = df.groupby(['video_id', 'topic_id']).size().rename('comments')
+    totals = counts.groupby(level='video_id').sum()
+    dominant = counts.sort_values(ascending=False, kind='stable').groupby(level='video_id').head(1)
+    dominant = dominant.reset_index(level='topic_id')
+    return pd.DataFrame({
+        'dominant_topic': dominant['topic_id'],
+        'dominant_topic_share': np.round(dominant['comments'] / totals.reindex(dominant.index), 4),
+        'topics': counts.groupby(level='video_id').size().reindex(dominant.index),
+    })
+
+
+def _text_column(path):
+    columns = pd.read_csv(path, nrows=0).columns
+    return 'cleaned_text' if 'cleaned_text' in columns else 'comment_text'
+
+
+def _read_chunks(path, columns, chunk_size):
+    return pd.read_csv(path, usecols=columns, dtype=str, chunksize=chunk_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='YouTube comment topic clustering')
+    sub = parser.add_subparsers(dest='command', required=True)
+    fit = sub.add_parser('fit', help='按块训练 (已有模型时继续训练)')
+    fit.add_argument('comments', help='评论CSV (cleaned_text 或 comment_text 列)')
+    fit.add_argument('--model', required=True, help='模型文件 (joblib)')
+    fit.add_argument('--topics', type=int, default=20)
+    fit.add_argument('--chunk-size', type=int, default=50000)
+    assign = sub.add_parser('assign', help='给评论分配主题')
+    assign.add_argument('comments')
+    assign.add_argument('--model', required=True)
+    assign.add_argument('--output', required=True, help='输出CSV (comment_id, video_id, topic_id)')
+    assign.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    text = _text_column(args.comments)
+    if args.command == 'fit':
+        if os.path.exists(args.model):
+            model = TopicModel.load(args.model)
+            print(f"✓ 加载模型 {args.model} (已训练 {model.n_docs:,} 条评论)")
+        else:
+            model = TopicModel(n_topics=args.topics)
+        columns = [text] + (['comment_id'] if 'comment_id' in pd.read_csv(args.comments, nrows=0).columns else [])
+        try:
+            model.fit((chunk[text], chunk['comment_id']) if 'comment_id' in chunk.columns else chunk[text]
+                      for chunk in _read_chunks(args.comments, columns, args.chunk_size))
+        except ValueError as e:
+            print(f"✗ {e}")
+            return 1
+        model.save(args.model)
+        print(f"✓ 模型已保存: {args.model} (累计 {model.n_docs:,} 条评论)")
+        for topic_id, terms in enumerate(model.top_terms()):
+            print(f"  {topic_id:3d}: {' '.join(terms)}")
+        return 0
+
+    model = TopicModel.load(args.model)
+    counts = np.zeros(model.n_topics, dtype=np.int64)
+    first = True
+    for chunk in _read_chunks(args.comments, ['comment_id', 'video_id', text], args.chunk_size):
+        labels = model.predict(chunk[text])
+        counts += np.bincount(labels[labels >= 0], minlength=model.n_topics)
+        chunk[['comment_id', 'video_id']].assign(topic_id=labels).to_csv(
+            args.output, mode='w' if first else 'a', header=first, index=False)
+        first = False
+    print(f"✓ 主题已写入 {args.output}")
+    for topic_id, (count, terms) in enumerate(zip(counts, model.top_terms())):
+        print(f"  {topic_id:3d}  {count:8,}  {' '.join(terms)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
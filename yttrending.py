@@ -0,0 +1,385 @@
+"""
+Trending and anomaly detection over comment streams
+
+每个视频维护指数加权的均值和方差 (EWMA / EWMVar), 每条评论 O(1) 更新:
+- 评论量: 按 bucket_seconds 分桶计数, 桶结束时更新计数的EWMA; 当前桶的计数
+  超过 均值 + spike_z * 标准差 时报 volume_spike (每个桶最多一次)
+- 情感: compound 的快/慢两条EWMA, 两者符号相反且相差超过 flip_delta 时报 sentiment_flip
+
+评论不一定按时间到达 (ytcoll 按 relevance 排序抓取), 所以每个视频的评论先进一个按发布时间排序的缓冲,
+比该视频见过的最新评论早 reorder_seconds 以上时才处理; 流结束时 flush() 处理剩下的.
+比已处理的评论还早的 (迟到超过窗口) 只参与情感检测, 计入 late.
+
+同一个视频同一种告警在同一个桶内只写一次, 已写入文件/表的告警不会因重复运行再写一遍.
+
+告警写入 CSV / JSONL 文件, 或 PostgreSQL 表 youtube_alerts (--alerts postgres).
+ytpipeline.py 和 ytanalysis.py 用 --alerts 在评论到达时检测; replay 子命令按发布时间
+重放历史评论, 用于调整阈值.
+
+usage:
+python yttrending.py replay analysis_results/comments_with_sentiment.csv --alerts alerts.csv
+python yttrending.py replay comments.csv --bucket-minutes 30 --spike-z 4 --flip-delta 0.6
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import sys
+from datetime import datetime, timezone
+
+ALERT_FIELDS = ['detected_at', 'video_id', 'kind', 'event_time', 'value', 'baseline', 'zscore', 'comments']
+
+
+class VideoState:
+    """单个视频的检测状态"""
+    __slots__ = ('bucket', 'bucket_count', 'buckets', 'rate_mean', 'rate_var', 'spiked',
+                 'comments', 'scored', 'fast', 'slow', 'slow_var', 'last_flip')
+
+    def __init__(self):
+        self.bucket = None
+        self.bucket_count = 0
+        self.buckets = 0
+        self.rate_mean = 0.0
+        self.rate_var = 0.0
+        self.spiked = False
+        self.comments = 0
+        self.scored = 0
+        self.fast = 0.0
+        self.slow = 0.0
+        self.slow_var = 0.0
+        self.last_flip = -1
+
+
+def _ew_update(mean, var, x, alpha):
+    """指数加权均值和方差的增量更新"""
+    diff = x - mean
+    increment = alpha * diff
+    return mean + increment, (1 - alpha) * (var + diff * increment)
+
+
+class TrendDetector:
+    def __init__(self, bucket_seconds=3600, rate_alpha=0.3, spike_z=3.0, min_spike_comments=10,
+                 warmup_buckets=3, fast_alpha=0.2, slow_alpha=0.02, flip_delta=0.5,
+                 warmup_comments=20, flip_cooldown=50, max_gap_buckets=48, reorder_seconds=86400):
+        self.bucket_seconds = bucket_seconds
+        self.rate_alpha = rate_alpha
+        self.spike_z = spike_z
+        self.min_spike_comments = min_spike_comments
+        self.warmup_buckets = warmup_buckets
+        self.fast_alpha = fast_alpha
+        self.slow_alpha = slow_alpha
+        self.flip_delta = flip_delta
+        self.warmup_comments = warmup_comments
+        self.flip_cooldown = flip_cooldown
+        self.max_gap_buckets = max_gap_buckets
+        self.reorder_seconds = reorder_seconds
+        self.states = {}
+        # video_id -> [(timestamp, 序号, compound)] 最小堆, 以及该视频见过的最新时间
+        self.pending = {}
+        self.watermarks = {}
+        self._sequence = 0
+        self.late = 0
+
+    def _close_buckets(self, state, bucket):
+        """关闭当前桶, 中间没有评论的桶按0计"""
+        if state.buckets == 0:
+            # 第一个桶直接作为初始均值, 避免从0开始时基线偏低
+            state.rate_mean = float(state.bucket_count)
+        else:
+            state.rate_mean, state.rate_var = _ew_update(state.rate_mean, state.rate_var,
+                                                         state.bucket_count, self.rate_alpha)
+        gap = bucket - state.bucket - 1
+        if gap > self.max_gap_buckets:
+            # 长时间没有评论: 直接按衰减系数缩小, 不逐桶循环
+            decay = (1 - self.rate_alpha) ** gap
+            state.rate_mean *= decay
+            state.rate_var *= decay
+        else:
+            for _ in range(gap):
+                state.rate_mean, state.rate_var = _ew_update(state.rate_mean, state.rate_var, 0.0,
+                                                             self.rate_alpha)
+        state.buckets += gap + 1
+        state.bucket = bucket
+        state.bucket_count = 0
+        state.spiked = False
+
+    def observe(self, video_id, timestamp, compound=None):
+        """接收一条评论 (timestamp 为 epoch 秒), 返回因此产生的告警列表
+
+        reorder_seconds > 0 时评论先进缓冲, 告警可能在之后的评论或 flush() 时才产生
+        """
+        if self.reorder_seconds <= 0:
+            return self._process(video_id, timestamp, compound)
+        heap = self.pending.setdefault(video_id, [])
+        heapq.heappush(heap, (timestamp, self._sequence, compound))
+        self._sequence += 1
+        watermark = max(self.watermarks.get(video_id, timestamp), timestamp)
+        self.watermarks[video_id] = watermark
+        alerts = []
+        while heap and heap[0][0] <= watermark - self.reorder_seconds:
+            timestamp, _, compound = heapq.heappop(heap)
+            alerts.extend(self._process(video_id, timestamp, compound))
+        return alerts
+
+    def flush(self):
+        """处理缓冲中剩下的评论 (流结束时调用), 返回告警列表"""
+        alerts = []
+        for video_id, heap in self.pending.items():
+            while heap:
+                timestamp, _, compound = heapq.heappop(heap)
+                alerts.extend(self._process(video_id, timestamp, compound))
+        self.pending.clear()
+        return alerts
+
+    def _process(self, video_id, timestamp, compound):
+        """按时间顺序处理一条评论"""
+        state = self.states.get(video_id)
+        if state is None:
+            state = self.states[video_id] = VideoState()
+        alerts = []
+
+        bucket = int(timestamp // self.bucket_seconds)
+        if state.bucket is None:
+            state.bucket = bucket
+        elif bucket > state.bucket:
+            self._close_buckets(state, bucket)
+        if bucket < state.bucket:
+            # 迟到 (属于已关闭的桶) 的评论只参与情感检测
+            self.late += 1
+        else:
+            state.bucket_count += 1
+            if not state.spiked and state.buckets >= self.warmup_buckets \
+                    and state.bucket_count >= self.min_spike_comments:
+                # 标准差至少取泊松噪声 sqrt(均值), 避免平稳视频方差接近0时误报
+                std = max(math.sqrt(state.rate_var), math.sqrt(max(state.rate_mean, 1.0)))
+                zscore = (state.bucket_count - state.rate_mean) / std
+                if zscore >= self.spike_z:
+                    state.spiked = True
+                    alerts.append(self._alert(video_id, 'volume_spike', timestamp, state.bucket_count,
+                                              state.rate_mean, zscore, state.comments + 1))
+
+        state.comments += 1
+        if compound is not None and compound == compound:
+            state.scored += 1
+            if state.scored == 1:
+                # 以第一个有效得分初始化 (前面没有得分的评论不算)
+                state.fast = state.slow = compound
+            else:
+                state.fast += self.fast_alpha * (compound - state.fast)
+                state.slow, state.slow_var = _ew_update(state.slow, state.slow_var, compound, self.slow_alpha)
+            if state.scored >= self.warmup_comments \
+                    and state.scored - state.last_flip >= self.flip_cooldown \
+                    and state.fast * state.slow < 0 \
+                    and abs(state.fast - state.slow) >= self.flip_delta:
+                state.last_flip = state.scored
+                std = math.sqrt(state.slow_var)
+                zscore = (state.fast - state.slow) / std if std > 0 else None
+                alerts.append(self._alert(video_id, 'sentiment_flip', timestamp, state.fast,
+                                          state.slow, zscore, state.comments))
+        return alerts
+
+    def observe_frame(self, df, compound_column='vader_compound', time_column='published_at'):
+        """按发布时间顺序接收一批评论 (DataFrame), 返回告警列表"""
+        import numpy as np
+        import pandas as pd
+        times = pd.to_datetime(df[time_column], utc=True, errors='coerce', format='ISO8601')
+        valid = times.notna().to_numpy()
+        seconds = times.to_numpy(dtype='datetime64[ns]').view(np.int64) / 1e9
+        order = np.argsort(np.where(valid, seconds, np.inf), kind='stable')[:int(valid.sum())]
+        videos = df['video_id'].astype(str).to_numpy()
+        if compound_column in df.columns:
+            compounds = pd.to_numeric(df[compound_column], errors='coerce').to_numpy(dtype=float)
+        else:
+            compounds = np.full(len(df), np.nan)
+
+        alerts = []
+        for i in order:
+            alerts.extend(self.observe(videos[i], seconds[i], compounds[i]))
+        return alerts
+
+    @staticmethod
+    def _alert(video_id, kind, timestamp, value, baseline, zscore, comments):
+        return {
+            'detected_at': datetime.now(timezone.utc).isoformat(),
+            'video_id': video_id,
+            'kind': kind,
+            'event_time': datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat(),
+            'value': round(float(value), 4),
+            'baseline': round(float(baseline), 4),
+            'zscore': None if zscore is None else round(float(zscore), 3),
+            'comments': comments,
+        }
+
+
+def alert_key(alert, bucket_seconds):
+    """告警的去重键: (video_id, kind, 事件所在的桶)"""
+    event_time = alert['event_time']
+    if isinstance(event_time, str):
+        event_time = datetime.fromisoformat(event_time)
+    if event_time.tzinfo is None:
+        event_time = event_time.replace(tzinfo=timezone.utc)
+    return str(alert['video_id']), alert['kind'], int(event_time.timestamp() // bucket_seconds)
+
+
+class _AlertWriter:
+    """只写入还没有写过的告警 (按 alert_key 去重)"""
+
+    def __init__(self, bucket_seconds):
+        self.bucket_seconds = bucket_seconds
+        self.written = 0
+        self.duplicates = 0
+        self.keys = set()
+
+    def _new(self, alerts):
+        fresh = []
+        for alert in alerts:
+            key = alert_key(alert, self.bucket_seconds)
+            if key in self.keys:
+                self.duplicates += 1
+            else:
+                self.keys.add(key)
+                fresh.append(alert)
+        return fresh
+
+
+class AlertFile(_AlertWriter):
+    """追加写入告警: .jsonl 为每行一个JSON, 其它为CSV"""
+
+    def __init__(self, path, bucket_seconds=3600):
+        super().__init__(bucket_seconds)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.keys.update(alert_key(alert, bucket_seconds) for alert in self._read())
+
+    def _read(self):
+        if self.path.endswith('.jsonl'):
+            with open(self.path, encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        import csv
+        with open(self.path, encoding='utf-8', newline='') as f:
+            return list(csv.DictReader(f))
+
+    def write(self, alerts):
+        alerts = self._new(alerts)
+        if not alerts:
+            return
+        if self.path.endswith('.jsonl'):
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for alert in alerts:
+                    f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+        else:
+            import csv
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, 'a', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=ALERT_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(alerts)
+        self.written += len(alerts)
+
+    def close(self):
+        return self.path
+
+
+class AlertTable(_AlertWriter):
+    """告警写入 PostgreSQL 表 youtube_alerts (event_time 为UTC)"""
+
+    def __init__(self, db_config, bucket_seconds=3600):
+        import psycopg2
+        super().__init__(bucket_seconds)
+        self.conn = psycopg2.connect(**db_config)
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS youtube_alerts (
+                id SERIAL PRIMARY KEY,
+                detected_at TIMESTAMP,
+                video_id VARCHAR(255),
+                kind VARCHAR(32),
+                event_time TIMESTAMP,
+                value REAL,
+                baseline REAL,
+                zscore REAL,
+                comments INTEGER
+            )
+        """)
+        cursor.execute("SELECT video_id, kind, event_time FROM youtube_alerts")
+        self.keys.update(alert_key({'video_id': video_id, 'kind': kind, 'event_time': event_time}, bucket_seconds)
+                         for video_id, kind, event_time in cursor.fetchall())
+        self.conn.commit()
+        cursor.close()
+
+    def write(self, alerts):
+        alerts = self._new(alerts)
+        if not alerts:
+            return
+        from psycopg2.extras import execute_values
+        cursor = self.conn.cursor()
+        execute_values(cursor, f"INSERT INTO youtube_alerts ({', '.join(ALERT_FIELDS)}) VALUES %s",
+                       [tuple(alert[field] for field in ALERT_FIELDS) for alert in alerts])
+        self.conn.commit()
+        cursor.close()
+        self.written += len(alerts)
+
+    def close(self):
+        self.conn.close()
+        return 'youtube_alerts'
+
+
+def open_alerts(target, db_config=None, bucket_seconds=3600):
+    """target 为 'postgres' 时写入 youtube_alerts 表, 否则写文件; bucket_seconds 用于去重"""
+    if target == 'postgres':
+        return AlertTable(db_config, bucket_seconds)
+    return AlertFile(target, bucket_seconds)
+
+
+def detector_from_args(args):
+    return TrendDetector(bucket_seconds=args.bucket_minutes * 60, spike_z=args.spike_z,
+                         min_spike_comments=args.min_spike_comments, flip_delta=args.flip_delta,
+                         reorder_seconds=args.reorder_hours * 3600)
+
+
+def add_detector_arguments(parser):
+    """检测阈值参数 (replay 子命令, ytpipeline.py, ytanalysis.py 共用)"""
+    parser.add_argument('--bucket-minutes', type=float, default=60, help='评论量分桶 (分钟)')
+    parser.add_argument('--spike-z', type=float, default=3.0, help='评论量告警阈值 (z分数)')
+    parser.add_argument('--min-spike-comments', type=int, default=10, help='一个桶内至少多少条评论才报评论量告警')
+    parser.add_argument('--flip-delta', type=float, default=0.5, help='情感反转告警阈值 (快慢EWMA之差)')
+    parser.add_argument('--reorder-hours', type=float, default=24,
+                        help='乱序到达的评论按发布时间重排的窗口 (小时), 更早的评论只参与情感检测')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='YouTube comment trend detection')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('replay', help='按发布时间重放历史评论')
+    p.add_argument('comments', help='带得分的评论CSV (如 comments_with_sentiment.csv)')
+    p.add_argument('--compound-column', default='vader_compound')
+    p.add_argument('--alerts', help='告警输出文件 (.csv 或 .jsonl)')
+    add_detector_arguments(p)
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    df = pd.read_csv(args.comments, dtype={'video_id': str})
+    detector = detector_from_args(args)
+    alerts = detector.observe_frame(df, args.compound_column) + detector.flush()
+    if args.alerts:
+        AlertFile(args.alerts, detector.bucket_seconds).write(alerts)
+
+    counts = {}
+    for alert in alerts:
+        counts[alert['kind']] = counts.get(alert['kind'], 0) + 1
+    print(f"✓ 重放 {len(df):,} 条评论 ({len(detector.states)} 个视频): "
+          f"{counts.get('volume_spike', 0)} volume_spike, {counts.get('sentiment_flip', 0)} sentiment_flip")
+    for alert in alerts[:20]:
+        print(f"  {alert['event_time']}  {alert['video_id']}  {alert['kind']}  "
+              f"value {alert['value']} baseline {alert['baseline']} z {alert['zscore']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())